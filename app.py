@@ -1,16 +1,20 @@
 from gevent import monkey
 monkey.patch_all()
 
-from flask import Flask, render_template, request
+from flask import Flask, Response, abort, render_template, request, send_file
 from flask_socketio import SocketIO, emit
-import json
 import os
+import events
+import jobs
+import metrics
+import results
 import scraper
 import time
-import uuid
 import logging
-from werkzeug.utils import secure_filename
+import upload_store
 
+# Start a fresh log.txt for this server; job workers append to it
+scraper.configure_logging(filemode='w')
 # Silence noisy loggers
 logging.getLogger('trafilatura').setLevel(logging.CRITICAL)
 logging.getLogger('webdriver_manager').setLevel(logging.CRITICAL)
@@ -20,72 +24,272 @@ app.config['SECRET_KEY'] = 'secret!' # Required for SocketIO
 # Wrap the app with SocketIO
 socketio = SocketIO(app, async_mode='gevent')
 
-UPLOAD_FOLDER = 'uploads'
+UPLOAD_FOLDER = upload_store.DEFAULT_UPLOAD_DIR
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Largest PDF accepted, and seconds an unused upload (and its cached extraction) is kept
+app.config['SCRAPER_MAX_UPLOAD_BYTES'] = int(os.environ.get('SCRAPER_MAX_UPLOAD_BYTES', upload_store.DEFAULT_MAX_UPLOAD_BYTES))
+app.config['SCRAPER_UPLOAD_TTL'] = int(os.environ.get('SCRAPER_UPLOAD_TTL', upload_store.DEFAULT_UPLOAD_TTL))
+# Request bodies are at most one whole PDF, plus room for the multipart envelope of /scrape_pdf
+app.config['MAX_CONTENT_LENGTH'] = app.config['SCRAPER_MAX_UPLOAD_BYTES'] + 1024 * 1024
+# Number of sources from one request that are scraped at the same time
+app.config['SCRAPER_PARALLEL_SOURCES'] = int(os.environ.get('SCRAPER_PARALLEL_SOURCES', 4))
+# Keep-alive connections per host in each job worker's HTTP session
+app.config['SCRAPER_POOL_SIZE'] = int(os.environ.get('SCRAPER_POOL_SIZE', 16))
+# Politeness: requests per second per host (robots.txt Crawl-delay and 429s slow it further), and retries with backoff
+app.config['SCRAPER_HOST_RATE'] = float(os.environ.get('SCRAPER_HOST_RATE', scraper.DEFAULT_HOST_RATE))
+app.config['SCRAPER_RETRIES'] = int(os.environ.get('SCRAPER_RETRIES', scraper.DEFAULT_RETRIES))
+# On-disk page cache; set SCRAPER_CACHE_DIR to an empty string to disable it
+app.config['SCRAPER_CACHE_DIR'] = os.environ.get('SCRAPER_CACHE_DIR', scraper.DEFAULT_CACHE_DIR)
+app.config['SCRAPER_CACHE_TTL'] = int(os.environ.get('SCRAPER_CACHE_TTL', scraper.DEFAULT_CACHE_TTL))
+# Incremental mode only streams articles that are new or changed since the last scrape
+app.config['SCRAPER_INCREMENTAL'] = os.environ.get('SCRAPER_INCREMENTAL', '0') == '1'
+app.config['SCRAPER_STATE_DB'] = os.environ.get('SCRAPER_STATE_DB', scraper.DEFAULT_STATE_PATH)
+# Scrapes run as queued jobs in separate worker processes, so the web process only relays their output
+app.config['SCRAPER_JOBS_DB'] = os.environ.get('SCRAPER_JOBS_DB', jobs.DEFAULT_JOBS_PATH)
+app.config['SCRAPER_JOB_WORKERS'] = int(os.environ.get('SCRAPER_JOB_WORKERS', jobs.DEFAULT_JOB_WORKERS))
+# Each job's items are written here as JSONL, and downloaded from /results/<job_id>.json(l)
+app.config['SCRAPER_RESULTS_DIR'] = os.environ.get('SCRAPER_RESULTS_DIR', results.DEFAULT_RESULTS_DIR)
+app.config['SCRAPER_TEAM_ID'] = os.environ.get('SCRAPER_TEAM_ID', 'aline123')
+# Seconds a job keeps running after its client disconnects, waiting for it to reattach
+app.config['SCRAPER_JOB_DETACH_GRACE'] = int(os.environ.get('SCRAPER_JOB_DETACH_GRACE', 30))
+# Extraction processes per job worker, so CPU work doesn't block fetching; by default the cores are split between workers
+app.config['SCRAPER_EXTRACT_WORKERS'] = int(os.environ.get(
+    'SCRAPER_EXTRACT_WORKERS', max(1, scraper.DEFAULT_EXTRACT_WORKERS // max(1, app.config['SCRAPER_JOB_WORKERS']))))
+# 'none', 'chapter' or 'pages': stream large PDFs as several items instead of one
+app.config['SCRAPER_PDF_SPLIT'] = os.environ.get('SCRAPER_PDF_SPLIT', 'none')
+# Headless Chrome instances shared by all job workers, and pages served before a restart
+app.config['SCRAPER_MAX_BROWSERS'] = int(os.environ.get('SCRAPER_MAX_BROWSERS', scraper.DEFAULT_MAX_BROWSERS))
+app.config['SCRAPER_BROWSER_MAX_PAGES'] = int(os.environ.get('SCRAPER_BROWSER_MAX_PAGES', scraper.DEFAULT_MAX_PAGES_PER_BROWSER))
+# Bounds on the static crawl of a site's listing pages (section hops from the start page, total pages)
+app.config['SCRAPER_CRAWL_DEPTH'] = int(os.environ.get('SCRAPER_CRAWL_DEPTH', scraper.DEFAULT_CRAWL_DEPTH))
+app.config['SCRAPER_CRAWL_PAGES'] = int(os.environ.get('SCRAPER_CRAWL_PAGES', scraper.DEFAULT_CRAWL_PAGES))
+# 'memory', 'bloom' or 'disk': how each scrape remembers the articles it already found
+app.config['SCRAPER_DEDUP'] = os.environ.get('SCRAPER_DEDUP', 'memory')
+# Results stream to the browser in zlib-compressed frames; set to 0 for plain JSON frames
+app.config['SCRAPER_STREAM_COMPRESSION'] = os.environ.get('SCRAPER_STREAM_COMPRESSION', '1') == '1'
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Each worker keeps one pooled session, so its scrapes reuse connections and Cloudflare cookies.
+jobs.start_workers(
+    app.config['SCRAPER_JOB_WORKERS'],
+    path=app.config['SCRAPER_JOBS_DB'],
+    session_options={
+        'pool_size': app.config['SCRAPER_POOL_SIZE'],
+        'host_rate': app.config['SCRAPER_HOST_RATE'],
+        'retries': app.config['SCRAPER_RETRIES'],
+        'cache_dir': app.config['SCRAPER_CACHE_DIR'],
+        'cache_ttl': app.config['SCRAPER_CACHE_TTL'],
+    },
+    pool_options={
+        'extract_workers': app.config['SCRAPER_EXTRACT_WORKERS'],
+        'max_browsers': app.config['SCRAPER_MAX_BROWSERS'],
+        'browser_max_pages': app.config['SCRAPER_BROWSER_MAX_PAGES'],
+    },
+    results_dir=app.config['SCRAPER_RESULTS_DIR'],
+)
+job_queue = jobs.JobQueue(app.config['SCRAPER_JOBS_DB'])
+# The job each connected client is watching, by socket ID
+watched_jobs = {}
+
+uploads = upload_store.UploadStore(UPLOAD_FOLDER, max_bytes=app.config['SCRAPER_MAX_UPLOAD_BYTES'],
+                                   ttl=app.config['SCRAPER_UPLOAD_TTL'])
+# Extracted PDF sections are cached by content hash, so a PDF uploaded again isn't extracted again.
+PDF_SECTIONS_FOLDER = os.path.join(UPLOAD_FOLDER, 'sections')
+
+def clean_uploads():
+    """Deletes expired uploads now and then, for as long as the server runs."""
+    while True:
+        uploads.cleanup()
+        socketio.sleep(min(3600, app.config['SCRAPER_UPLOAD_TTL']))
+
+socketio.start_background_task(clean_uploads)
+
+def purge_jobs():
+    """Deletes finished jobs, their frames and their result files once they are past retention,
+    for as long as the server runs. start_workers already purged once at startup."""
+    while True:
+        socketio.sleep(jobs.JOB_PURGE_INTERVAL)
+        job_queue.purge()
+        results.purge_results(app.config['SCRAPER_RESULTS_DIR'], jobs.JOB_RETENTION)
+
+socketio.start_background_task(purge_jobs)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-# PDF upload remains a standard HTTP endpoint
+@app.errorhandler(upload_store.UploadError)
+def handle_upload_error(error):
+    return {'error': str(error)}, error.status
+
+@app.errorhandler(413)
+def handle_too_large(error):
+    return handle_upload_error(uploads.too_large())
+
+# PDF upload remains a standard HTTP endpoint, for small files in a single request
 @app.route('/scrape_pdf', methods=['POST'])
 def scrape_pdf_endpoint():
     pdf_file = request.files.get('pdf_file')
-    if pdf_file and pdf_file.filename and pdf_file.filename.lower().endswith('.pdf'):
-        original_filename = secure_filename(pdf_file.filename)
-        # Create a unique filename that embeds the original name for later retrieval
-        filename = f"{uuid.uuid4()}__{original_filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        pdf_file.save(filepath)
-        return {'pdf_id': filename}
-    return {'error': 'No PDF file found or file is not a PDF'}, 400
-
-def run_scraper_in_background(sid, sources):
-    """A wrapper to run the scraper and emit messages over WebSocket."""
+    if not pdf_file:
+        raise upload_store.UploadError('No PDF file found or file is not a PDF')
+    return {'pdf_id': uploads.save(pdf_file.stream, pdf_file.filename)}
+
+# Resumable uploads: POST the name and size, then PUT the bytes in chunks at increasing offsets.
+# After a failed chunk, GET the upload to learn where to continue from.
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    upload_id = uploads.create(data.get('filename'), data.get('size'))
+    return {'upload_id': upload_id, 'received': 0, 'chunk_size': upload_store.UPLOAD_CHUNK_SIZE}
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    return uploads.status(upload_id)
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        raise upload_store.UploadError('Missing chunk offset')
+    return uploads.append(upload_id, offset, request.stream)
+
+def job_result_path(job_id):
+    try:
+        path = results.result_path(app.config['SCRAPER_RESULTS_DIR'], job_id)
+    except ValueError:
+        abort(404)
+    if not os.path.exists(path):
+        abort(404)
+    return os.path.abspath(path)
+
+@app.route('/results/<job_id>.jsonl')
+def download_results_jsonl(job_id):
+    """A job's items as JSON Lines, readable while the job is still running.
+    Supports Range requests, so an interrupted download can resume where it stopped."""
+    return send_file(job_result_path(job_id), mimetype='application/x-ndjson', as_attachment=True,
+                     download_name=f"{job_id}.jsonl", conditional=True, max_age=0)
+
+@app.route('/results/<job_id>.json')
+def download_results_json(job_id):
+    """A job's items in the knowledgebase format, streamed in chunks straight from the result file."""
+    return Response(results.iter_json_document(job_result_path(job_id), app.config['SCRAPER_TEAM_ID']),
+                    mimetype='application/json',
+                    headers={'Content-Disposition': 'attachment; filename=output.json'})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Counters and latency histograms of every job worker, in the Prometheus text format."""
+    snapshot = metrics.merge_snapshots(job_queue.worker_metrics() + [metrics.snapshot()])
+    return Response(metrics.render_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>/metrics')
+def job_metrics(job_id):
+    """Where a finished job spent its time: its spans and counters, as JSON and as a summary table."""
+    status = job_queue.status(job_id)
+    if status is None:
+        abort(404)
+    snapshot = job_queue.job_metrics(job_id)
+    return {'job_id': job_id, 'status': status, 'metrics': snapshot,
+            'summary': metrics.format_summary(snapshot) if snapshot else []}
+
+def emit_frame(sid, seq, compressed, data):
+    """Relays a stored frame of events to a client as-is; the browser decodes it."""
+    socketio.emit('events', {'seq': seq, 'compressed': bool(compressed), 'data': data}, to=sid)
+
+def stream_job(sid, job_id, after=0):
+    """Relays a job's event frames to one client, from sequence number `after` until the job finishes
+    or the client starts watching something else."""
     with app.app_context():
         try:
-            for message in scraper.run_scraper(sources):
-                if message and message.startswith('___JSON_ITEM___'):
-                    payload = message[15:]
-                    if payload:
-                        try:
-                            json_data = json.loads(payload)
-                            socketio.emit('json_item', json_data, to=sid)
-                        except json.JSONDecodeError:
-                            socketio.emit('log_message', {'data': f"FATAL: Server failed to decode item data."}, to=sid)
-                elif message:
-                    socketio.emit('log_message', {'data': message}, to=sid)
-            
-            socketio.emit('scrape_complete', {'data': 'Scraping process finished.'}, to=sid)
+            seq = after
+            while watched_jobs.get(sid) == job_id:
+                frames = job_queue.frames(job_id, after=seq)
+                for seq, compressed, data in frames:
+                    emit_frame(sid, seq, compressed, data)
+                if frames:
+                    continue
+                status = job_queue.status(job_id)
+                if status in jobs.FINISHED_STATUSES:
+                    # The worker stores its last frame before marking the job finished.
+                    for seq, compressed, data in job_queue.frames(job_id, after=seq, limit=-1):
+                        emit_frame(sid, seq, compressed, data)
+                    socketio.emit('scrape_complete', {'data': 'Scraping process finished.', 'status': status}, to=sid)
+                    if watched_jobs.get(sid) == job_id:
+                        del watched_jobs[sid]
+                    return
+                socketio.sleep(jobs.JOB_POLL_INTERVAL)
 
         except Exception as e:
-            app.logger.error(f"An error occurred in background task: {e}", exc_info=True)
+            app.logger.error(f"An error occurred while streaming job {job_id}: {e}", exc_info=True)
             socketio.emit('log_message', {'data': f"FATAL: A server error occurred in the background task: {e}"}, to=sid)
 
+def watch_job(sid, job_id, after=0):
+    watched_jobs[sid] = job_id
+    socketio.start_background_task(stream_job, sid=sid, job_id=job_id, after=after)
+
+def cancel_if_abandoned(job_id):
+    """Cancels a job if no client has reattached to it within the grace period."""
+    socketio.sleep(app.config['SCRAPER_JOB_DETACH_GRACE'])
+    if job_id not in watched_jobs.values():
+        job_queue.cancel(job_id)
+
 @socketio.on('scrape_request')
 def handle_scrape_request(data):
-    """Handles the scraping request, starting a background task."""
+    """Handles the scraping request by queueing a job and streaming its output back."""
     sid = request.sid
     urls = data.get('urls', '').split()
-    pdf_id = data.get('pdf_id')
+    # Several PDFs can be scraped at once; they are processed in parallel like URLs.
+    pdf_ids = list(data.get('pdf_ids') or [])
+    if data.get('pdf_id'):
+        pdf_ids.append(data['pdf_id'])
     
     sources = []
     if urls:
         sources.extend(urls)
     
-    if pdf_id:
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], pdf_id)
-        if os.path.exists(filepath):
+    for pdf_id in pdf_ids:
+        filepath = uploads.path(pdf_id)
+        if filepath:
             sources.append(filepath)
+        else:
+            emit('log_message', {'data': f"Could not find uploaded PDF {pdf_id}; it may have expired. Please upload it again."})
+
+    log_level = data.get('log_level')
+    job_id = job_queue.submit(sources, {
+        'parallel_sources': app.config['SCRAPER_PARALLEL_SOURCES'],
+        'incremental': app.config['SCRAPER_INCREMENTAL'],
+        'state_path': app.config['SCRAPER_STATE_DB'],
+        'pdf_split': app.config['SCRAPER_PDF_SPLIT'],
+        'pdf_cache_dir': PDF_SECTIONS_FOLDER,
+        'crawl_depth': app.config['SCRAPER_CRAWL_DEPTH'],
+        'crawl_pages': app.config['SCRAPER_CRAWL_PAGES'],
+        'dedup_backend': app.config['SCRAPER_DEDUP'],
+        'log_level': log_level if log_level in events.LOG_LEVELS else events.DEFAULT_LOG_LEVEL,
+        # Browsers without DecompressionStream ask for plain frames.
+        'compress': app.config['SCRAPER_STREAM_COMPRESSION'] and data.get('compress', True) is not False,
+    })
+    emit('job_started', {'job_id': job_id})
+    watch_job(sid, job_id)
+
+@socketio.on('attach_job')
+def handle_attach_job(data):
+    """Reattaches a client to a job it started earlier, replaying its messages after `after`."""
+    job_id = data.get('job_id')
+    if not job_id or job_queue.status(job_id) is None:
+        emit('job_not_found', {'job_id': job_id})
+        return
+    watch_job(request.sid, job_id, after=int(data.get('after', 0)))
+
+@socketio.on('cancel_job')
+def handle_cancel_job(data):
+    job_id = data.get('job_id')
+    if job_id:
+        job_queue.cancel(job_id)
 
-    socketio.start_background_task(
-        run_scraper_in_background, 
-        sid=sid, 
-        sources=sources
-    )
+@socketio.on('disconnect')
+def handle_disconnect():
+    job_id = watched_jobs.pop(request.sid, None)
+    if job_id:
+        socketio.start_background_task(cancel_if_abandoned, job_id)
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,93 @@
+"""Micro-benchmark for article extraction.
+
+Compares the old three-parse pipeline (trafilatura.extract, a BeautifulSoup
+html.parser tree for the <title>, then markdownify over the text) against
+extraction.extract_article, which parses each document once.
+
+The default corpus is synthetic: pages that imitate six blog layouts, generated
+by benchmarks/blog_pages.py. Pass --corpus to run on real captured pages instead.
+
+Usage: python benchmarks/bench_extract.py [--rounds N] [--corpus DIR]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import trafilatura
+from markdownify import markdownify as md
+
+from extraction import extract_article
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'blog_pages')
+
+def legacy_extract(page_content):
+    """The extraction pipeline scraper.py used before extract_article."""
+    content = trafilatura.extract(page_content)
+    if not content:
+        return {}
+    title_soup = BeautifulSoup(page_content, 'html.parser')
+    title = title_soup.title.string if title_soup.title else "No Title Found"
+    return {"title": title, "content": md(content, heading_style="ATX"), "text_length": len(content)}
+
+def measure(func, pages, rounds):
+    """Returns CPU seconds per document and the largest peak allocation for a single document."""
+    # Warm up imports and trafilatura's lazily-built state outside the measurement.
+    for page in pages:
+        func(page)
+
+    cpu_start = time.process_time()
+    for _ in range(rounds):
+        for page in pages:
+            func(page)
+    cpu_per_doc = (time.process_time() - cpu_start) / (rounds * len(pages))
+
+    tracemalloc.start()
+    peak = 0
+    for page in pages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func(page)
+        page_peak = tracemalloc.get_traced_memory()[1]
+        peak = max(peak, page_peak - before)
+    tracemalloc.stop()
+    return cpu_per_doc, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-parse article extraction against the legacy pipeline.")
+    parser.add_argument("--rounds", type=int, default=5, help="Passes over the corpus for the CPU measurement.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directory of HTML pages (default: the synthetic layouts from blog_pages.py).")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, '*.html')))
+    if not paths:
+        sys.exit(f"No .html files found in {args.corpus}")
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    print(f"Corpus: {len(pages)} pages, {sum(len(p) for p in pages) / 1024:.0f} KB")
+
+    pipelines = (
+        ("legacy (3 parses)", legacy_extract),
+        ("extract_article (1 parse)", extract_article),
+        ("extract_article + metadata", lambda page: extract_article(page, with_metadata=True)),
+    )
+    results = []
+    for name, func in pipelines:
+        cpu, peak = measure(func, pages, args.rounds)
+        results.append((cpu, peak))
+        # Both pipelines should extract the same text (body and comments); markdown adds a little.
+        chars = sum(len(func(page).get('content', '')) for page in pages)
+        print(f"{name:<28} {cpu * 1000:8.2f} ms/doc CPU   {peak / 1024:8.0f} KB peak allocation/doc   {chars:8d} chars")
+
+    (legacy_cpu, legacy_peak), (new_cpu, new_peak) = results[:2]
+    print(f"CPU saved: {(1 - new_cpu / legacy_cpu) * 100:.0f}%   Peak allocation saved: {(1 - new_peak / legacy_peak) * 100:.0f}%")
+
+if __name__ == "__main__":
+    main()
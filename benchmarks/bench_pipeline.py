@@ -0,0 +1,201 @@
+"""End-to-end benchmark of the scraping pipeline against offline fixture sites.
+
+Serves the generated sites from benchmarks/fixture_site.py and runs each workload
+(sitemap site, paginated blog, link-heavy index, large PDFs) under each pipeline
+configuration. Every run happens in a fresh process, so its peak RSS is its own.
+Reports pages/sec, items/sec, fetch and extract latency and peak RSS, and compares
+them with a saved baseline.
+
+Extraction produces the markdown body in the same pass as the main-content
+extraction (see extraction.extract_article), so "extract" covers both. For PDFs,
+"extract" is the wait for each section's text.
+
+Usage:
+  python benchmarks/bench_pipeline.py                  # run, compare with the baseline if there is one
+  python benchmarks/bench_pipeline.py --save-baseline  # run and record the results as the new baseline
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_site import serve_fixture_sites, write_pdf, DEFAULT_ARTICLES, DEFAULT_PDF_PAGES
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'pipeline.json')
+# A result this much worse than the baseline counts as a regression.
+DEFAULT_TOLERANCE = 0.2
+PDF_COUNT = 2
+
+CONFIGS = {
+    'serial': {'concurrency': 1, 'parallel_sources': 1, 'extract_workers': 0},
+    'threaded': {'concurrency': 8, 'parallel_sources': 1, 'extract_workers': 0},
+    'pooled': {'concurrency': 8, 'parallel_sources': 4, 'extract_workers': os.cpu_count() or 1},
+}
+
+# Metric name -> whether a higher value is better.
+COMPARED_METRICS = {'pages_per_sec': True, 'items_per_sec': True, 'peak_rss_mb': False}
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def timed(samples, func):
+    """Wraps `func` so each call's duration is appended to `samples`."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+def timed_iter(samples, func):
+    """Wraps a generator function so the time spent producing each value is appended to `samples`."""
+    def wrapper(*args, **kwargs):
+        iterator = func(*args, **kwargs)
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return
+            samples.append(time.perf_counter() - start)
+            yield value
+    return wrapper
+
+def run_workload(sources, config):
+    """Runs one scrape in this process and returns its measurements. Called in a fresh child process."""
+    import extraction
+    import scraper
+
+    stages = {'fetch': [], 'extract': []}
+    scraper.SessionManager.fetch = timed(stages['fetch'], scraper.SessionManager.fetch)
+    scraper.run_extraction = timed(stages['extract'], scraper.run_extraction)
+    scraper.iter_cached_pdf_sections = timed_iter(stages['extract'], scraper.iter_cached_pdf_sections)
+    scraper.configure_extraction_pool(config['extract_workers'])
+
+    items = 0
+    start = time.perf_counter()
+    for event in scraper.run_scraper(sources, concurrency=config['concurrency'],
+                                     parallel_sources=config['parallel_sources'], cache_dir=None,
+                                     host_rate=0, pdf_split='pages', structured=True):
+        if isinstance(event, dict):
+            items += 1
+    elapsed = time.perf_counter() - start
+
+    # Wait for the extraction processes, so their peak RSS is counted below.
+    pool = extraction.get_extraction_pool()
+    if pool is not None:
+        pool.shutdown(wait=True)
+    peak_kb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+               + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    result = {'seconds': elapsed, 'items': items, 'peak_rss_mb': peak_kb / 1024}
+    for stage, samples in stages.items():
+        result[f'{stage}_p50_ms'] = percentile(samples, 0.5) * 1000
+        result[f'{stage}_p95_ms'] = percentile(samples, 0.95) * 1000
+    return result
+
+def run_in_child(sources, config):
+    # The child runs in a scratch directory, so nothing the run writes lands in the working tree.
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-workload', json.dumps([sources, config])],
+            cwd=workdir, check=True, capture_output=True, text=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_benchmarks(articles, pdf_pages, configs, workloads):
+    servers = serve_fixture_sites(articles)
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        pdfs = [write_pdf(os.path.join(pdf_dir, f"fixture-{i}.pdf"), pdf_pages, seed=i) for i in range(PDF_COUNT)]
+        sources = {
+            'sitemap': [servers['sitemap'].base_url + '/'],
+            'paginated': [servers['paginated'].base_url + '/blog/'],
+            'index': [servers['index'].base_url + '/'],
+            'pdf': pdfs,
+        }
+        results = {}
+        for config_name in configs:
+            for workload in workloads:
+                served_before = sum(server.requests for server in servers.values())
+                result = run_in_child(sources[workload], CONFIGS[config_name])
+                # Web pages are counted by the fixture servers; a PDF's pages by its page count.
+                pages = pdf_pages * PDF_COUNT if workload == 'pdf' else \
+                    sum(server.requests for server in servers.values()) - served_before
+                result['pages'] = pages
+                result['pages_per_sec'] = pages / result['seconds']
+                result['items_per_sec'] = result['items'] / result['seconds']
+                results[f"{config_name}/{workload}"] = result
+                print(f"{config_name + '/' + workload:<20} {result['pages_per_sec']:8.1f} pages/s "
+                      f"{result['items_per_sec']:8.1f} items/s  "
+                      f"fetch p50/p95 {result['fetch_p50_ms']:6.1f}/{result['fetch_p95_ms']:6.1f} ms  "
+                      f"extract p50/p95 {result['extract_p50_ms']:6.1f}/{result['extract_p95_ms']:6.1f} ms  "
+                      f"peak RSS {result['peak_rss_mb']:6.0f} MB", flush=True)
+    for server in servers.values():
+        server.shutdown()
+    return results
+
+def compare(results, baseline, tolerance):
+    """Returns a description of every metric that is more than `tolerance` worse than the baseline."""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{key} {metric}: {old:.1f} -> {new:.1f} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraping pipeline against offline fixture sites.")
+    parser.add_argument("--articles", type=int, default=DEFAULT_ARTICLES, help="Articles on each fixture site.")
+    parser.add_argument("--pdf-pages", type=int, default=DEFAULT_PDF_PAGES, help="Pages in each generated PDF.")
+    parser.add_argument("--configs", default=','.join(CONFIGS), help="Comma-separated pipeline configurations to run.")
+    parser.add_argument("--workloads", default='sitemap,paginated,index,pdf', help="Comma-separated workloads to run.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file holding the baseline results.")
+    parser.add_argument("--save-baseline", action="store_true", help="Save these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown or growth before a result counts as a regression.")
+    parser.add_argument("--run-workload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_workload:
+        sources, config = json.loads(args.run_workload)
+        print(json.dumps(run_workload(sources, config)))
+        return
+
+    results = run_benchmarks(args.articles, args.pdf_pages, args.configs.split(','), args.workloads.split(','))
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("Regressions against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
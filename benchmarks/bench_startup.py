@@ -0,0 +1,84 @@
+"""Cold-start benchmark for the CLI and the web and job worker processes.
+
+Runs each entry point in fresh interpreters with `-X importtime` and reports the
+median wall time, the median time spent importing, and which heavy backends
+(Selenium, PyMuPDF, trafilatura, cloudscraper, BeautifulSoup, markdownify) were
+imported at all, by the process or its extraction workers. A PDF-only CLI run
+should not import the web-scraping backends.
+
+Usage: python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixture_site import write_pdf
+
+HEAVY_MODULES = ('selenium', 'fitz', 'trafilatura', 'cloudscraper', 'bs4', 'markdownify')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def scenarios(pdf_path):
+    """(name, argv) pairs; argv is run with `python -X importtime`."""
+    return (
+        ("import scraper", ['-c', 'import scraper']),
+        # The command as users run it, default flags and extraction pool included.
+        ("scraper.py file.pdf", [os.path.join(ROOT, 'scraper.py'), pdf_path]),
+        ("job worker (import jobs)", ['-c', 'import jobs']),
+        # gunicorn imports the app module in each worker it boots.
+        ("web worker (import app)", ['-c', 'import app']),
+    )
+
+def run_once(argv):
+    """Returns (wall seconds, import seconds, top-level modules imported) for one fresh run.
+    Each run gets an empty working directory, so the CLI's default page and PDF caches start cold."""
+    env = dict(os.environ, PYTHONPATH=ROOT, SCRAPER_JOB_WORKERS='1', SCRAPER_CACHE_DIR='')
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime'] + argv, cwd=workdir, env=env,
+                                   capture_output=True, text=True)
+        wall = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(f"{' '.join(argv)} failed:\n{completed.stderr[-2000:]}")
+    import_us = 0
+    modules = set()
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        modules.add(name.split('.')[0])
+        # Top-level imports (one space of indentation) include everything they imported.
+        if len(indent) == 1:
+            import_us += cumulative
+    return wall, import_us / 1e6, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the scraper's entry points.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh runs per entry point; the median is reported.")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="Pages in the PDF the CLI run scrapes.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        pdf_path = write_pdf(os.path.join(pdf_dir, 'startup.pdf'), args.pdf_pages)
+        print(f"{'entry point':<28}{'wall ms':>10}{'imports ms':>12}  heavy backends imported")
+        for name, argv in scenarios(pdf_path):
+            walls, imports, loaded = [], [], set()
+            for _ in range(args.runs):
+                wall, import_seconds, modules = run_once(argv)
+                walls.append(wall)
+                imports.append(import_seconds)
+                loaded |= modules
+            heavy = ', '.join(module for module in HEAVY_MODULES if module in loaded) or '-'
+            print(f"{name:<28}{statistics.median(walls) * 1000:>10.0f}{statistics.median(imports) * 1000:>12.0f}  {heavy}",
+                  flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Generates the synthetic article pages in benchmarks/fixtures/blog_pages.
+
+These are not captured pages. Each one imitates the markup structure of one kind of
+blog (WordPress, Substack, Ghost, a Next.js site, a docs site and a bare page): its
+wrappers and class names, navigation and sidebar link lists, reader comments, and
+the inline <style> and <script> bulk that makes real pages large. The article text
+is filler built from a fixed word list, and the sizes of the CSS and JS blocks are
+set per layout, so the corpus is repeatable and has no copyrighted content.
+
+bench_extract.py runs both extraction pipelines over these pages.
+
+Usage: python benchmarks/blog_pages.py [--out DIR] [--seed N]
+"""
+import argparse
+import os
+import random
+
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'blog_pages')
+DEFAULT_SEED = 7
+
+WORDS = (
+    "interview candidate system design queue latency cache shard replica consistency "
+    "algorithm graph tree heap binary search recursion dynamic programming offer recruiter "
+    "engineer backend frontend database index transaction lock throughput bottleneck "
+    "profile benchmark memory allocation garbage collector thread process socket request "
+    "response protocol network packet retry backoff timeout deadline schedule worker"
+).split()
+
+CODE_SAMPLE = ("<pre><code>def solve(nums):\n    seen = {}\n    for i, n in enumerate(nums):\n"
+               "        if n in seen:\n            return seen[n], i\n        seen[n] = i\n</code></pre>")
+
+class PageWriter:
+    """Builds the pieces of a page from one seeded random source."""
+
+    def __init__(self, seed=DEFAULT_SEED):
+        self.rng = random.Random(seed)
+
+    def sentence(self):
+        words = [self.rng.choice(WORDS) for _ in range(self.rng.randint(8, 22))]
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self):
+        return " ".join(self.sentence() for _ in range(self.rng.randint(3, 7)))
+
+    def article(self, sections):
+        """Headings, paragraphs with inline links and bold text, lists and code blocks."""
+        out = []
+        for i in range(sections):
+            out.append(f"<h2>{self.sentence()[:-1].title()}</h2>")
+            for _ in range(self.rng.randint(2, 4)):
+                out.append(f"<p>{self.paragraph()} <a href='/blog/related-{i}'>related</a> <strong>{self.sentence()}</strong></p>")
+            if i % 2 == 0:
+                out.append("<ul>" + "".join(f"<li>{self.sentence()}</li>" for _ in range(4)) + "</ul>")
+            if i % 3 == 0:
+                out.append(CODE_SAMPLE)
+        return "\n".join(out)
+
+    def comments(self, count):
+        return "<section class='comments'>" + "".join(
+            f"<div class='comment'><span class='author'>user{i}</span><p>{self.sentence()}</p></div>" for i in range(count)
+        ) + "</section>"
+
+def nav(links):
+    return "<nav><ul>" + "".join(f"<li><a href='/category/topic-{i}'>Topic {i}</a></li>" for i in range(links)) + "</ul></nav>"
+
+def script(kb):
+    return "<script>" + ("window.__d=window.__d||[];__d.push({a:1,b:'x'});" * (kb * 20)) + "</script>"
+
+def style(kb):
+    return "<style>" + (".c{margin:0;padding:0;color:#333}" * (kb * 30)) + "</style>"
+
+LAYOUTS = {
+    "wordpress_post.html": lambda w, t: (
+        f"<!DOCTYPE html><html><head><title>{t} | Engineering Blog</title><meta name='author' content='Sam Rivera'>"
+        f"<meta property='article:published_time' content='2024-03-11T09:00:00Z'>{style(20)}</head><body>"
+        f"<header>{nav(60)}</header><div id='content'><article class='post'><h1 class='entry-title'>{t}</h1>"
+        f"<div class='entry-content'>{w.article(8)}</div></article><aside class='sidebar'>{nav(30)}</aside>"
+        f"{w.comments(25)}</div><footer>{nav(20)}</footer>{script(40)}</body></html>"),
+    "substack_post.html": lambda w, t: (
+        f"<!DOCTYPE html><html><head><title>{t} - by Alex Chen</title><meta property='og:title' content='{t}'>"
+        f"<meta name='author' content='Alex Chen'>{style(30)}{script(80)}</head><body><div class='main'>"
+        f"<div class='post'><h1 class='post-title'>{t}</h1><h3 class='subtitle'>{w.sentence()}</h3>"
+        f"<div class='available-content'><div class='body markup'>{w.article(12)}</div></div></div>"
+        f"<div class='subscribe-widget'><p>Subscribe for more</p></div>{w.comments(40)}</div>{script(60)}</body></html>"),
+    "ghost_post.html": lambda w, t: (
+        f"<!DOCTYPE html><html lang='en'><head><title>{t}</title><meta property='article:published_time' content='2023-11-02'>"
+        f"{style(10)}</head><body class='post-template'><header class='site-header'>{nav(15)}</header>"
+        f"<main id='site-main'><article class='article'><header class='article-header'><h1 class='article-title'>{t}</h1>"
+        f"<div class='byline'>Jordan Lee</div></header><section class='gh-content'>{w.article(6)}</section></article></main>"
+        f"<footer>{nav(10)}</footer></body></html>"),
+    "nextjs_post.html": lambda w, t: (
+        f"<!DOCTYPE html><html><head><title>{t} | Product Blog</title>{style(40)}</head><body><div id='__next'>"
+        f"<div class='layout'>{nav(25)}<main><div class='prose'><h1>{t}</h1>{w.article(10)}</div></main></div></div>"
+        f"<script id='__NEXT_DATA__' type='application/json'>{{\"props\":{{\"pageProps\":{{\"slug\":\"x\"}}}}}}</script>"
+        f"{script(120)}</body></html>"),
+    "docs_style_post.html": lambda w, t: (
+        f"<!DOCTYPE html><html><head><title>{t}</title></head><body><div class='wrapper'><aside class='toc'>{nav(80)}</aside>"
+        f"<div class='content'><h1>{t}</h1>{w.article(16)}</div></div>{script(20)}</body></html>"),
+    "minimal_post.html": lambda w, t: (
+        f"<html><head><title>{t}</title></head><body><h1>{t}</h1>{w.article(4)}<p><a href='/'>Back home</a></p></body></html>"),
+}
+
+def write_blog_pages(out_dir=DEFAULT_OUT_DIR, seed=DEFAULT_SEED):
+    """Writes one page per layout into `out_dir`. Returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    writer = PageWriter(seed)
+    paths = []
+    for name, layout in LAYOUTS.items():
+        title = writer.sentence()[:-1].title()
+        path = os.path.join(out_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(layout(writer, title))
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic blog pages bench_extract.py runs on.")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="Directory to write the pages to.")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the filler text.")
+    args = parser.parse_args()
+    for path in write_blog_pages(args.out, args.seed):
+        print(path)
+
+if __name__ == "__main__":
+    main()
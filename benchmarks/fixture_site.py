@@ -0,0 +1,200 @@
+"""Offline fixture sites for benchmarking the scraper pipeline.
+
+Serves generated sites from local HTTP servers, one per site so each gets its
+own host (and robots.txt) like a real blog would:
+
+  sitemap    robots.txt -> sitemap index -> two sitemaps listing /blog/<slug>/ posts
+  paginated  /blog/ with "Older posts" pagination, no sitemap
+  index      one link-heavy page pointing at /articles/<n> pages, no sitemap
+
+and writes large generated PDFs. Every page is generated from a fixed seed,
+so runs are repeatable, and rendered once up front so serving is cheap.
+
+Usage: python benchmarks/fixture_site.py [--articles N]   (serves until Ctrl-C)
+"""
+import argparse
+import itertools
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ARTICLES = 200
+DEFAULT_POSTS_PER_PAGE = 10
+DEFAULT_PDF_PAGES = 300
+
+WORDS = (
+    "scraper latency throughput request response cache session header parser tree document "
+    "article sitemap crawl frontier queue worker process thread socket budget index token "
+    "content markdown paragraph heading section chapter extraction pipeline benchmark fixture "
+    "the a of to and in is that for it with as on be at by this from or an are which was"
+).split()
+
+def paragraph(rng, sentences):
+    text = []
+    for _ in range(sentences):
+        words = rng.choices(WORDS, k=rng.randint(8, 20))
+        text.append(" ".join(words).capitalize() + ".")
+    return " ".join(text)
+
+def article_page(site, path, number, title):
+    """A blog post with the usual chrome around it: navigation, sidebar, comments, footer."""
+    rng = random.Random(f"{site}:{number}")
+    body = []
+    for section in range(rng.randint(3, 6)):
+        body.append(f"<h2>Section {section + 1} of {title}</h2>")
+        body.extend(f"<p>{paragraph(rng, rng.randint(3, 7))}</p>" for _ in range(rng.randint(2, 4)))
+    nav = "".join(f'<li><a href="/about-{i}/">About {i}</a></li>' for i in range(8))
+    related = "".join(f'<li><a href="/tag/topic-{rng.randint(1, 30)}/">Topic</a></li>' for _ in range(10))
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title}</title>
+<meta name="author" content="Fixture Author {number % 7}">
+<link rel="canonical" href="{path}">
+<style>body {{ font-family: sans-serif; }} .sidebar {{ float: right; }}</style>
+<script>window.analytics = {{ page: "{path}" }};</script></head>
+<body><header><nav><ul>{nav}</ul></nav></header>
+<main><article><h1>{title}</h1><p class="byline">Post {number} on {site}</p>
+{''.join(body)}
+</article></main>
+<aside class="sidebar"><h3>Related</h3><ul>{related}</ul></aside>
+<section class="comments"><p>{paragraph(rng, 2)}</p></section>
+<footer><p>Copyright fixture site. All rights reserved.</p></footer></body></html>"""
+
+def listing_page(title, links, next_url=None):
+    items = "".join(f'<li><a href="{href}">{text}</a></li>' for href, text in links)
+    older = f'<a class="next" href="{next_url}">Older posts</a>' if next_url else ''
+    return f"""<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body><header><a href="/">Home</a> <a href="/about-us/">About us</a></header>
+<h1>{title}</h1><ul>{items}</ul>{older}</body></html>"""
+
+def sitemap_site(articles):
+    pages = {'/robots.txt': ('text/plain', "User-agent: *\nAllow: /\nSitemap: {base}/sitemap_index.xml\n")}
+    locs = []
+    for number in range(articles):
+        path = f"/blog/fixture-post-{number}/"
+        pages[path] = ('text/html', article_page('sitemap', path, number, f"Sitemap post {number}"))
+        locs.append(f"<url><loc>{{base}}{path}</loc><lastmod>2024-01-{number % 28 + 1:02d}</lastmod></url>")
+    half = len(locs) // 2
+    for index, chunk in enumerate((locs[:half], locs[half:])):
+        pages[f'/sitemap-posts-{index}.xml'] = (
+            'application/xml',
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">' + "".join(chunk) + '</urlset>')
+    pages['/sitemap_index.xml'] = (
+        'application/xml',
+        '<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        '<sitemap><loc>{base}/sitemap-posts-0.xml</loc></sitemap>'
+        '<sitemap><loc>{base}/sitemap-posts-1.xml</loc></sitemap></sitemapindex>')
+    return pages
+
+def paginated_site(articles, per_page=DEFAULT_POSTS_PER_PAGE):
+    pages = {'/robots.txt': ('text/plain', "User-agent: *\nAllow: /\n")}
+    page_count = (articles + per_page - 1) // per_page
+    for page in range(1, page_count + 1):
+        links = []
+        for number in range((page - 1) * per_page, min(page * per_page, articles)):
+            path = f"/blog/paginated-post-{number}/"
+            pages[path] = ('text/html', article_page('paginated', path, number, f"Paginated post {number}"))
+            links.append((path, f"Paginated post {number}"))
+        next_url = f"/blog/page/{page + 1}/" if page < page_count else None
+        listing = listing_page(f"Blog, page {page}", links, next_url)
+        pages['/blog/' if page == 1 else f"/blog/page/{page}/"] = ('text/html', listing)
+    return pages
+
+def index_site(articles):
+    pages = {'/robots.txt': ('text/plain', "User-agent: *\nAllow: /\n")}
+    links = []
+    for number in range(articles):
+        path = f"/articles/{number}"
+        pages[path] = ('text/html', article_page('index', path, number, f"Indexed article {number}"))
+        links.append((path, f"Indexed article {number}"))
+    pages['/'] = ('text/html', listing_page("All articles", links))
+    return pages
+
+def write_pdf(path, page_count, seed=0):
+    """Writes a PDF of `page_count` pages of generated text, with a chapter outline every 20 pages."""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    toc = []
+    for number in range(page_count):
+        page = doc.new_page()
+        if number % 20 == 0:
+            toc.append([1, f"Chapter {number // 20 + 1}", number + 1])
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), "\n\n".join(paragraph(rng, 5) for _ in range(4)), fontsize=9)
+    doc.set_toc(toc)
+    doc.save(path)
+    doc.close()
+    return path
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serves one generated site. `requests` counts the requests it has answered."""
+
+    daemon_threads = True
+
+    def __init__(self, pages):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.pages = {path: (content_type, body.replace('{base}', self.base_url).encode('utf-8'))
+                      for path, (content_type, body) in pages.items()}
+        self._counter = itertools.count()
+        self.requests = 0
+
+    def count_request(self):
+        self.requests = next(self._counter) + 1
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the scraper's pooled sessions behave as they would against a real site.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; don't let Nagle's algorithm hold the body back.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.count_request()
+        page = self.server.pages.get(self.path.split('?', 1)[0])
+        if page is None:
+            content_type, body, status = 'text/html', b'<html><body>Not found</body></html>', 404
+        else:
+            (content_type, body), status = page, 200
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixture_sites(articles=DEFAULT_ARTICLES):
+    """Starts one server per fixture site in background threads. Returns {name: FixtureServer}."""
+    servers = {
+        'sitemap': FixtureServer(sitemap_site(articles)),
+        'paginated': FixtureServer(paginated_site(articles)),
+        'index': FixtureServer(index_site(articles)),
+    }
+    for server in servers.values():
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixture sites until interrupted.")
+    parser.add_argument("--articles", type=int, default=DEFAULT_ARTICLES, help="Articles on each site.")
+    parser.add_argument("--pdf-dir", help="Also write a generated PDF of --pdf-pages pages here.")
+    parser.add_argument("--pdf-pages", type=int, default=DEFAULT_PDF_PAGES, help="Pages in the generated PDF.")
+    args = parser.parse_args()
+    if args.pdf_dir:
+        os.makedirs(args.pdf_dir, exist_ok=True)
+        print(write_pdf(os.path.join(args.pdf_dir, f"fixture-{args.pdf_pages}-pages.pdf"), args.pdf_pages))
+    servers = serve_fixture_sites(args.articles)
+    print(f"sitemap:   {servers['sitemap'].base_url}/")
+    print(f"paginated: {servers['paginated'].base_url}/blog/")
+    print(f"index:     {servers['index'].base_url}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
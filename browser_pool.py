@@ -0,0 +1,207 @@
+import atexit
+import fcntl
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# Hard cap on Chrome instances per process (or, with shared slots, across processes),
+# and pages a browser serves before it is recycled.
+DEFAULT_MAX_BROWSERS = 2
+DEFAULT_MAX_PAGES_PER_BROWSER = 25
+# Seconds an unused browser is kept warm. With shared slots, this is also the longest another
+# process waits for a slot held by an idle browser.
+DEFAULT_BROWSER_IDLE_TIMEOUT = 60
+# How often a process waiting for a shared browser slot tries again, in seconds.
+SLOT_POLL_INTERVAL = 0.5
+
+def create_driver():
+    """Launches a headless Chrome using modern Selenium Manager.
+    This is used to scrape JavaScript-driven websites that don't return static HTML."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--log-level=3')
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    # Lets SPA link discovery read the JSON responses the page fetches.
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    # On Heroku, the buildpack sets the Chrome binary location. Selenium Manager
+    # will automatically detect this and download the matching chromedriver.
+    if "GOOGLE_CHROME_BIN" in os.environ:
+        options.binary_location = os.environ.get("GOOGLE_CHROME_BIN")
+
+    # This simple initialization lets Selenium Manager handle the driver.
+    service = ChromeService(log_output=os.devnull)
+    return webdriver.Chrome(service=service, options=options)
+
+class BrowserSlots:
+    """Caps Chrome instances across processes, e.g. every job worker of the web app.
+
+    Each of `count` slots is a lock file in `directory`; a process holds a slot's flock
+    for as long as the browser it launched lives. The OS drops the lock when a process
+    dies, so a crashed worker never leaks a slot.
+    """
+
+    def __init__(self, directory, count=DEFAULT_MAX_BROWSERS):
+        self.directory = directory
+        self.count = max(1, count)
+        os.makedirs(directory, exist_ok=True)
+
+    def acquire(self):
+        """Blocks until a slot is free. Returns a handle to pass to release()."""
+        while True:
+            for number in range(self.count):
+                handle = open(os.path.join(self.directory, f"slot-{number}.lock"), 'a')
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return handle
+                except BlockingIOError:
+                    handle.close()
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    @staticmethod
+    def release(handle):
+        if handle is not None:
+            # Closing the file drops its lock.
+            handle.close()
+
+class BrowserPool:
+    """Hands out warm headless browsers and bounds how many Chrome processes exist at once.
+
+    Launching Chrome is the slowest single step of a scrape, so released browsers are
+    kept idle for the next caller, for up to `idle_timeout` seconds. A browser is
+    health-checked before it is reused and quit after serving `max_pages` leases, which
+    keeps Chrome's memory growth in check. With `shared_slots` (see BrowserSlots), every
+    browser also holds one of the slots shared with other processes.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_BROWSERS, max_pages=DEFAULT_MAX_PAGES_PER_BROWSER, factory=create_driver,
+                 shared_slots=None, idle_timeout=DEFAULT_BROWSER_IDLE_TIMEOUT):
+        self.max_size = max(1, max_size)
+        self.max_pages = max(1, max_pages)
+        self.factory = factory
+        self.shared_slots = shared_slots
+        self.idle_timeout = idle_timeout
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        # (driver, pages served, monotonic time it went idle)
+        self._idle = []
+        # Shared slot handle of every live browser, by driver.
+        self._held = {}
+        self._closed = False
+        self._reaper = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lease(self):
+        """Yields a browser for exclusive use. Blocks while `max_size` browsers are busy."""
+        with self._slots:
+            driver, pages = self._checkout()
+            try:
+                yield driver
+            finally:
+                self._checkin(driver, pages + 1)
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                driver, pages, _ = self._idle.pop()
+            if self._is_healthy(driver):
+                return driver, pages
+            self._quit(driver)
+        slot = None
+        if self.shared_slots:
+            with metrics.span('browser_slot_wait'):
+                slot = self.shared_slots.acquire()
+        try:
+            with metrics.span('browser_launch'):
+                driver = self.factory()
+        except Exception:
+            BrowserSlots.release(slot)
+            raise
+        with self._lock:
+            self._held[id(driver)] = slot
+        return driver, 0
+
+    def _checkin(self, driver, pages):
+        if self._closed or pages >= self.max_pages:
+            self._quit(driver)
+            return
+        try:
+            # Don't leak one site's session into the next lease. A crashed browser fails here and is dropped.
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+        except Exception:
+            self._quit(driver)
+            return
+        with self._lock:
+            self._idle.append((driver, pages, time.monotonic()))
+            if self.idle_timeout is not None and self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_idle, daemon=True)
+                self._reaper.start()
+
+    def _reap_idle(self):
+        """Quits browsers that have been idle for longer than `idle_timeout`, for the life of the pool."""
+        while not self._closed:
+            time.sleep(max(1, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            with self._lock:
+                expired = [entry for entry in self._idle if entry[2] < cutoff]
+                self._idle = [entry for entry in self._idle if entry[2] >= cutoff]
+            for driver, _, _ in expired:
+                self._quit(driver)
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            return driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Failed to quit browser: {e}")
+        with self._lock:
+            slot = self._held.pop(id(driver), None)
+        BrowserSlots.release(slot)
+
+    def close(self):
+        """Quits every idle browser. Leased browsers are quit when they are returned."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for driver, _, _ in idle:
+            self._quit(driver)
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_settings = {'max_size': DEFAULT_MAX_BROWSERS, 'max_pages': DEFAULT_MAX_PAGES_PER_BROWSER, 'slots_dir': None}
+
+def configure_browser_pool(max_size=DEFAULT_MAX_BROWSERS, max_pages=DEFAULT_MAX_PAGES_PER_BROWSER, slots_dir=None):
+    """Sets the size of the process-wide browser pool. Takes effect the next time the pool is created.
+    With `slots_dir`, `max_size` caps browsers across every process configured with the same directory."""
+    with _pool_lock:
+        _pool_settings.update(max_size=max_size, max_pages=max_pages, slots_dir=slots_dir)
+
+def get_browser_pool():
+    """Returns the process-wide browser pool shared by every scrape, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            settings = dict(_pool_settings)
+            slots_dir = settings.pop('slots_dir')
+            shared_slots = BrowserSlots(slots_dir, settings['max_size']) if slots_dir else None
+            _pool = BrowserPool(shared_slots=shared_slots, **settings)
+            atexit.register(_pool.close)
+        return _pool
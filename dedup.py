@@ -0,0 +1,194 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from frontier import is_pagination_url, is_section_url
+from state_store import content_hash
+
+# 'memory' keeps exact digests in a set, 'bloom' uses a fixed-size bloom filter and
+# 'disk' keeps exact digests in SQLite, for crawls too large to hold in memory.
+DEDUP_BACKENDS = ('memory', 'bloom', 'disk')
+# None stores the on-disk set in a temporary file that is removed when the run ends.
+DEFAULT_DEDUP_PATH = None
+# Bloom filter sizing: expected keys, and the chance that a new key is mistaken for a seen one.
+DEFAULT_BLOOM_CAPACITY = 1_000_000
+DEFAULT_BLOOM_ERROR_RATE = 1e-6
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid'}
+
+def canonical_url(url):
+    """Normalizes a URL for comparison: http and https, `www.`, default ports, letter case of the
+    host, trailing and doubled slashes, fragments, tracking parameters and query order are ignored."""
+    parsed_url = urlparse(url.strip())
+    host = (parsed_url.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parsed_url.port
+    except ValueError:
+        port = None
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    path = re.sub(r'/{2,}', '/', parsed_url.path).rstrip('/') or '/'
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed_url.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ))
+    scheme = 'https' if parsed_url.scheme in ('http', 'https') else parsed_url.scheme
+    return urlunparse((scheme, host, path, '', query, ''))
+
+def _digest(key):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+class MemorySet:
+    """Exact set of 16-byte key digests."""
+
+    def __init__(self):
+        self._digests = set()
+
+    def add(self, digest):
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+        return True
+
+    def close(self):
+        self._digests.clear()
+
+class BloomFilter:
+    """Fixed-size set of key digests. Memory stays flat no matter how many keys are added;
+    in exchange, about `error_rate` of new keys are wrongly reported as already seen."""
+
+    def __init__(self, capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, digest):
+        # Double hashing: two 64-bit halves of the digest generate every probe position.
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        added = False
+        for i in range(self.hash_count):
+            bit = (first + i * second) % self.size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                added = True
+        return added
+
+    def close(self):
+        self._bits = bytearray()
+
+class DiskSet:
+    """Exact set of key digests kept in SQLite. The file is emptied when the set is opened,
+    since it only dedups a single run (the state store is what remembers earlier runs)."""
+
+    def __init__(self, path=DEFAULT_DEDUP_PATH):
+        self._temp_path = None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='scrape_dedup_', suffix='.sqlite')
+            os.close(fd)
+            self._temp_path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._db.execute("DELETE FROM seen")
+
+    def add(self, digest):
+        return self._db.execute("INSERT OR IGNORE INTO seen (digest) VALUES (?)", (digest,)).rowcount == 1
+
+    def close(self):
+        self._db.close()
+        if self._temp_path:
+            os.remove(self._temp_path)
+
+class Deduplicator:
+    """Run-wide record of the articles already claimed, shared by every source of a run.
+
+    URLs are compared by their canonical form (see canonical_url), including the
+    <link rel=canonical> a page declares, and extracted articles by a hash of their
+    title and content, so mirrors and syndicated copies are only emitted once.
+    Many themes point every post's canonical at the home page or a listing page, so
+    only a canonical that could name another article counts (see is_alias_canonical).
+    A syndicated copy's canonical names the original on another site; it counts when
+    that site is one of the run's sources (see add_source).
+    """
+
+    def __init__(self, backend='memory', path=DEFAULT_DEDUP_PATH, capacity=DEFAULT_BLOOM_CAPACITY,
+                 error_rate=DEFAULT_BLOOM_ERROR_RATE):
+        if backend == 'bloom':
+            self._seen = BloomFilter(capacity, error_rate)
+        elif backend == 'disk':
+            self._seen = DiskSet(path)
+        elif backend == 'memory':
+            self._seen = MemorySet()
+        else:
+            raise ValueError(f"Unknown dedup backend: {backend}")
+        self._lock = threading.Lock()
+        # Start and listing pages of the run, in canonical form, and the hosts of its sources.
+        # There are few of them, so sets are fine.
+        self._listing_urls = set()
+        self._source_hosts = set()
+
+    def _claim(self, key):
+        digest = _digest(key)
+        with self._lock:
+            return self._seen.add(digest)
+
+    def claim_url(self, url):
+        """True the first time a URL (in canonical form) is claimed during the run."""
+        return self._claim('url:' + canonical_url(url))
+
+    def claim_content(self, item):
+        """True the first time an article with this title and content is claimed during the run."""
+        return self._claim('content:' + content_hash(item))
+
+    def add_listing_url(self, url):
+        """Records a start or listing page of the run; a canonical pointing at it is never an alias."""
+        with self._lock:
+            self._listing_urls.add(canonical_url(url))
+
+    def add_source(self, url):
+        """Records a website source of the run. Its start page is a listing page, and canonicals
+        pointing at its host can name the original of a syndicated copy."""
+        self.add_listing_url(url)
+        with self._lock:
+            self._source_hosts.add(urlparse(canonical_url(url)).netloc)
+
+    def is_alias_canonical(self, canonical, url):
+        """True if the canonical URL the page at `url` declares can name another copy of the same
+        article: a different page, on the same host or another source's, that isn't the home page,
+        a start or listing page of the run, or a section or pagination URL."""
+        if not canonical:
+            return False
+        target, own = canonical_url(canonical), canonical_url(url)
+        parsed_target = urlparse(target)
+        if target == own:
+            return False
+        if parsed_target.netloc != urlparse(own).netloc:
+            with self._lock:
+                if parsed_target.netloc not in self._source_hosts:
+                    return False
+        if parsed_target.path == '/' or is_section_url(target) or is_pagination_url(target):
+            return False
+        with self._lock:
+            return target not in self._listing_urls
+
+    def claim_article(self, item, canonical=''):
+        """True unless the article was already found during the run: either the same content was
+        claimed, or its page's canonical is an alias (see is_alias_canonical) of a page already claimed."""
+        if self.is_alias_canonical(canonical, item['source_url']) and not self.claim_url(canonical):
+            return False
+        return self.claim_content(item)
+
+    def close(self):
+        with self._lock:
+            self._seen.close()
@@ -0,0 +1,94 @@
+import json
+import re
+import time
+import zlib
+
+LOG_LEVELS = ('debug', 'info', 'warning', 'error')
+DEFAULT_LOG_LEVEL = 'info'
+# A frame is sent once it holds this many events or this many bytes, or its oldest event is this old.
+FRAME_MAX_EVENTS = 500
+FRAME_MAX_BYTES = 256 * 1024
+FRAME_MAX_AGE = 0.25
+
+# Per-link progress lines: useful when debugging a site, noise on a large crawl.
+DEBUG_PREFIXES = (
+    'Processing link:', 'Processing Selenium link:', 'Crawling listing page:', 'Reading sitemap:',
+    'Scraping from sitemap URL:', 'Unchanged since last run:', 'Duplicate of an article',
+)
+ERROR_PREFIXES = ('FATAL', 'A critical error')
+WARNING_PATTERN = re.compile(r'^(Could not|Error)|\bfailed\b|error occurred', re.IGNORECASE)
+SOURCE_TAG = re.compile(r'^\[[^\]]*\] ')
+
+def log_level(message):
+    """Classifies a scraper log line as 'debug', 'info', 'warning' or 'error'."""
+    text = SOURCE_TAG.sub('', message, count=1)
+    if text.startswith(ERROR_PREFIXES):
+        return 'error'
+    if text.startswith(DEBUG_PREFIXES):
+        return 'debug'
+    if WARNING_PATTERN.search(text):
+        return 'warning'
+    return 'info'
+
+def decode_frame(data, compressed):
+    """Returns the events of a frame: ['log', level, text] and ['item', {...}] lists."""
+    if compressed:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+class FrameBatcher:
+    """Packs structured scraper events (log strings and item dicts) into frames.
+
+    Each event is serialized exactly once, here; the web process relays the frame bytes
+    as-is and the browser decodes them. Logs below `min_level` are dropped, and frames
+    are zlib-compressed when `compress` is set.
+    """
+
+    def __init__(self, min_level=DEFAULT_LOG_LEVEL, compress=True, max_events=FRAME_MAX_EVENTS,
+                 max_bytes=FRAME_MAX_BYTES, max_age=FRAME_MAX_AGE):
+        self.min_rank = LOG_LEVELS.index(min_level) if min_level in LOG_LEVELS else LOG_LEVELS.index(DEFAULT_LOG_LEVEL)
+        self.compress = compress
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._parts = []
+        self._size = 0
+        self._started = None
+
+    def add(self, event):
+        """Adds a log line or an item. Returns True once the frame should be flushed."""
+        if isinstance(event, dict):
+            part = json.dumps(['item', event])
+        else:
+            level = log_level(event)
+            if LOG_LEVELS.index(level) < self.min_rank:
+                return self.ready()
+            part = json.dumps(['log', level, event])
+        if not self._parts:
+            self._started = time.monotonic()
+        self._parts.append(part)
+        self._size += len(part)
+        return self.ready()
+
+    def time_left(self):
+        """Seconds until the pending frame is due because of its age, or None if no events are pending."""
+        if not self._parts:
+            return None
+        return max(0.0, self._started + self.max_age - time.monotonic())
+
+    def ready(self):
+        return bool(self._parts) and (
+            len(self._parts) >= self.max_events or self._size >= self.max_bytes
+            or time.monotonic() - self._started >= self.max_age
+        )
+
+    def flush(self):
+        """Returns the pending events as (data, compressed), or None if there are none."""
+        if not self._parts:
+            return None
+        data = ('[' + ','.join(self._parts) + ']').encode('utf-8')
+        self._parts = []
+        self._size = 0
+        if self.compress:
+            return zlib.compress(data, 6), True
+        return data, False
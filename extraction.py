@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Number of extraction processes; 0 runs extraction inline on the calling thread.
+DEFAULT_EXTRACT_WORKERS = os.cpu_count() or 1
+
+_pool = None
+_pool_workers = DEFAULT_EXTRACT_WORKERS
+_pool_lock = threading.Lock()
+
+def extract_article(page_content, url=None, with_metadata=False):
+    """Extracts an article page with a single parse.
+
+    The HTML is parsed once with lxml. The title and author are read straight from
+    that tree, and trafilatura extracts the markdown body from the same tree (via
+    include_formatting), so there is no BeautifulSoup pass for the title and no
+    markdownify pass over the text. Reader comments follow the body, as they did with
+    trafilatura.extract, and `text_length` counts plain text, not markdown syntax.
+    `with_metadata` additionally runs trafilatura's metadata extraction for a cleaner
+    title, author and publication date; it is noticeably slower because of the date search.
+    Returns the title, markdown content, author, date and <link rel=canonical> URL,
+    or {} if the page has no main content.
+    """
+    import trafilatura
+    from trafilatura.xml import xmltotxt
+
+    tree = trafilatura.load_html(page_content)
+    if tree is None:
+        return {}
+    title = (tree.findtext('.//title') or '').strip()
+    author = tree.xpath('string(//meta[@name="author"]/@content)').strip()
+    canonical = tree.xpath('string(//link[@rel="canonical"]/@href)').strip()
+
+    document = trafilatura.bare_extraction(tree, url=url, with_metadata=with_metadata, include_formatting=True)
+    if document is None or not document.text:
+        return {}
+    content = document.text
+    text_length = len(xmltotxt(document.body, False))
+    if document.comments:
+        content = f"{content}\n{document.comments}"
+        text_length += len(document.comments) + 1
+    return {
+        "title": document.title or title or "No Title Found",
+        "content": content,
+        "author": document.author or author,
+        "date": document.date or "",
+        "canonical": canonical,
+        "text_length": text_length,
+    }
+
+def configure_extraction_pool(workers):
+    """Sets the number of extraction processes. Takes effect the next time the pool is created."""
+    global _pool_workers
+    with _pool_lock:
+        _pool_workers = max(0, workers)
+
+def extraction_worker_count():
+    """Number of processes the extraction pool runs with (0 when extraction is inline)."""
+    return _pool_workers
+
+def get_extraction_pool():
+    """Returns the process-wide extraction pool, creating it on first use. None when extraction runs inline."""
+    global _pool
+    if _pool_workers == 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Forking keeps workers from re-running the entry-point module, which
+            # configures logging and, under gunicorn, the whole web app. Each worker imports
+            # trafilatura (or PyMuPDF) with its first task, so a PDF-only run never loads trafilatura.
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context('fork'))
+        return _pool
+
+def shutdown_extraction_pool():
+    """Stops the extraction processes. A new pool is created if extraction is needed again."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def submit_extraction(func, *args):
+    """Schedules a CPU-bound extraction function on the process pool and returns its Future.
+    When extraction runs inline, the function runs immediately and the Future is already done."""
+    global _pool
+    pool = get_extraction_pool()
+    if pool is None:
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    try:
+        return pool.submit(func, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool and retry once.
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return get_extraction_pool().submit(func, *args)
+
+def run_extraction(func, *args):
+    """Runs a CPU-bound extraction function in the process pool and waits for its result.
+
+    Only the calling thread (or greenlet, under gevent) waits; other fetches keep
+    running while the document is parsed in another process.
+    """
+    try:
+        return submit_extraction(func, *args).result()
+    except BrokenProcessPool:
+        # The pool broke while this job was running; the next submit replaces it.
+        return submit_extraction(func, *args).result()
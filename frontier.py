@@ -0,0 +1,96 @@
+import re
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+# How many section hops (e.g. home page -> /category/x) the crawl follows from the start URL.
+# Pages of one paginated listing share its depth, so archives are bounded by the page budget instead.
+DEFAULT_CRAWL_DEPTH = 1
+# Listing pages fetched per source, pagination included.
+DEFAULT_CRAWL_PAGES = 50
+
+PAGINATION_PATH = re.compile(r'/page/\d+/?$')
+# Not ?p=N: that is WordPress's default permalink for a single post.
+PAGINATION_QUERY = re.compile(r'(?:^|&)(?:page|paged|pg)=\d+(?:&|$)')
+NEXT_LABELS = {'next', 'next page', 'older', 'older posts', 'older entries', 'more posts',
+               '»', '›', '→', 'next »', 'next ›', 'next →'}
+# Last path segments of listing pages, and parents of taxonomy pages (/category/<name>).
+LISTING_SEGMENTS = {'blog', 'posts', 'articles', 'news', 'archive', 'archives'}
+TAXONOMY_SEGMENTS = {'category', 'categories', 'tag', 'tags', 'topic', 'topics'}
+
+def is_pagination_url(url):
+    """Recognizes /page/N paths and ?page=N style query strings."""
+    parsed_url = urlparse(url)
+    return bool(PAGINATION_PATH.search(parsed_url.path) or PAGINATION_QUERY.search(parsed_url.query))
+
+def is_section_url(url):
+    """Recognizes blog indexes and category/tag/archive pages, which list more articles."""
+    segments = [segment for segment in urlparse(url).path.lower().split('/') if segment]
+    if not segments:
+        return False
+    return segments[-1] in LISTING_SEGMENTS or (len(segments) >= 2 and segments[-2] in TAXONOMY_SEGMENTS)
+
+def listing_links(soup, page_url):
+    """Yields (url, is_pagination) for links on a listing page that lead to more listing pages."""
+    for tag in soup.find_all(['a', 'link'], href=True):
+        rel = [value.lower() for value in tag.get('rel') or []]
+        # Keep the query string: it is what tells ?page=2 apart from ?page=3.
+        href = urljoin(page_url, tag['href']).split('#', 1)[0]
+        if 'next' in rel:
+            yield href, True
+        elif tag.name != 'a':
+            continue
+        elif is_pagination_url(href) or tag.get_text(' ', strip=True).lower() in NEXT_LABELS:
+            yield href, True
+        elif is_section_url(href):
+            yield href, False
+
+def _visit_key(url):
+    parsed_url = urlparse(url)
+    return parsed_url.path.rstrip('/') + ('?' + parsed_url.query if parsed_url.query else '')
+
+def iter_listing_pages(session, url, log, max_depth=DEFAULT_CRAWL_DEPTH, max_pages=DEFAULT_CRAWL_PAGES, timeout=2):
+    """Crawls a site's listing pages breadth-first, starting at `url`.
+
+    Follows pagination (rel=next, "Next"/"Older posts" links, /page/N and ?page=N) and
+    links to section pages on the same host, up to `max_depth` section hops and
+    `max_pages` fetched pages. Yields (page_url, soup) for every page as soon as it is
+    fetched, so the caller can start on its links while the crawl continues.
+    A failure to fetch the start page is raised; later pages are logged and skipped.
+    """
+    from bs4 import BeautifulSoup
+
+    host = urlparse(url).netloc
+    visited = {host: {_visit_key(url)}}
+    frontier = deque([(url, 0)])
+    fetched = 0
+    while frontier and fetched < max_pages:
+        page_url, depth = frontier.popleft()
+        if fetched:
+            log(f"Crawling listing page: {page_url}")
+        try:
+            page = session.fetch(page_url, timeout=timeout)
+        except Exception as e:
+            if not fetched:
+                raise
+            log(f"Could not fetch listing page {page_url}. Reason: {e}")
+            continue
+        fetched += 1
+        soup = BeautifulSoup(page.text, 'html.parser')
+        yield page_url, soup
+
+        for link, is_pagination in listing_links(soup, page_url):
+            link_depth = depth if is_pagination else depth + 1
+            link_host = urlparse(link).netloc
+            if link_depth > max_depth or link_host != host:
+                continue
+            seen = visited.setdefault(link_host, set())
+            key = _visit_key(link)
+            if key in seen:
+                continue
+            seen.add(key)
+            frontier.append((link, link_depth))
+
+    if frontier:
+        log(f"Stopped crawling after {fetched} listing pages; {len(frontier)} more were not visited.")
+    else:
+        log(f"Crawled {fetched} listing pages.")
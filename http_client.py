@@ -0,0 +1,386 @@
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse, urlunparse
+
+import metrics
+
+# Keep-alive connections held open per host, and the default cap on concurrent requests per host.
+DEFAULT_POOL_SIZE = 16
+DEFAULT_PER_HOST_CONCURRENCY = 4
+# Request starts per second allowed per host (0 means unlimited). Slowed further by robots.txt
+# Crawl-delay and by 429/503 responses, and sped back up as requests succeed.
+DEFAULT_HOST_RATE = 8
+# Retries for timeouts, connection errors and retryable statuses, with jittered exponential backoff.
+DEFAULT_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+# Retry-After and Crawl-delay values above these are treated as "give up" and clamped, respectively.
+MAX_RETRY_AFTER = 120
+MAX_CRAWL_DELAY = 30
+# Timeouts grow to this many times a host's typical latency, up to MAX_TIMEOUT seconds.
+TIMEOUT_LATENCY_FACTOR = 4
+MAX_TIMEOUT = 30
+# How long a host's robots.txt is trusted before it is read again.
+ROBOTS_TTL = 3600
+
+def crawl_delay_from_robots(robots_txt):
+    """Returns the Crawl-delay robots.txt sets for all user agents ('*'), or 0."""
+    applies = False
+    in_agents = False
+    for line in robots_txt.splitlines():
+        key, _, value = line.split('#', 1)[0].partition(':')
+        key, value = key.strip().lower(), value.strip()
+        if key == 'user-agent':
+            # Consecutive User-agent lines share one group of rules.
+            applies = (applies and in_agents) or value == '*'
+            in_agents = True
+            continue
+        in_agents = False
+        if applies and key == 'crawl-delay':
+            try:
+                return min(MAX_CRAWL_DELAY, max(0.0, float(value)))
+            except ValueError:
+                return 0
+    return 0
+
+def retry_after_seconds(response):
+    """Seconds a 429/503 response asks us to wait, from a delta or an HTTP date. None if it doesn't say."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: a random wait up to BACKOFF_BASE * 2**attempt, capped."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def _download(response, out, chunk_size):
+    """Copies a streamed response body into `out` as fast as the network delivers it."""
+    for chunk in response.iter_content(chunk_size):
+        metrics.count('http_bytes', len(chunk))
+        out.write(chunk)
+
+class HostState:
+    """Politeness bookkeeping for one host."""
+
+    def __init__(self, limit, interval):
+        self.semaphore = threading.BoundedSemaphore(limit)
+        self.lock = threading.Lock()
+        self.base_interval = interval
+        self.interval = interval
+        self.next_start = 0.0
+        self.latency = None
+
+class HostScheduler:
+    """Schedules requests per host: caps concurrency, spaces out request starts, pauses a host
+    that answers 429/503, and derives timeouts from the latency each host has shown so far.
+
+    The spacing adapts: it doubles every time a host throttles us and decays back to the
+    configured rate (or the robots.txt Crawl-delay, if slower) as requests succeed.
+    """
+
+    def __init__(self, limit=DEFAULT_PER_HOST_CONCURRENCY, rate=DEFAULT_HOST_RATE):
+        self.limit = max(1, limit)
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = HostState(self.limit, self.interval)
+            return state
+
+    @contextmanager
+    def slot(self, url):
+        """Waits for a free slot and for the host's next allowed start time."""
+        state = self.host(url)
+        with state.semaphore:
+            with state.lock:
+                start = max(time.monotonic(), state.next_start)
+                state.next_start = start + state.interval
+            delay = start - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield state
+
+    def set_crawl_delay(self, url, seconds):
+        state = self.host(url)
+        with state.lock:
+            state.base_interval = max(self.interval, seconds)
+            state.interval = max(state.interval, state.base_interval)
+
+    def throttled(self, url, pause):
+        """The host told us to slow down: hold every request to it for `pause` seconds and halve the rate."""
+        state = self.host(url)
+        with state.lock:
+            state.interval = min(MAX_CRAWL_DELAY, max(state.interval * 2, BACKOFF_BASE))
+            state.next_start = max(state.next_start, time.monotonic() + pause)
+
+    def observe(self, url, seconds):
+        """Records a successful request's latency and eases the rate back up."""
+        state = self.host(url)
+        with state.lock:
+            state.latency = seconds if state.latency is None else 0.8 * state.latency + 0.2 * seconds
+            state.interval = max(state.base_interval, state.interval * 0.9)
+
+    def timeout(self, url, requested):
+        """The caller's timeout, raised for hosts that are usually slower than it allows."""
+        latency = self.host(url).latency
+        if latency is None:
+            return requested
+        return max(requested, min(MAX_TIMEOUT, latency * TIMEOUT_LATENCY_FACTOR))
+
+class Page:
+    """The body of a fetched URL, and whether it was served from the response cache."""
+
+    def __init__(self, url, content, encoding=None, from_cache=False):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+class SessionManager:
+    """Shares one pooled cloudscraper session across a whole run.
+
+    Creating a scraper per request repeats the Cloudflare challenge and throws away
+    the TCP/TLS connections. A single session keeps connections alive per host and
+    reuses the challenge cookies for every later request.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY, cache=None,
+                 host_rate=DEFAULT_HOST_RATE, retries=DEFAULT_RETRIES):
+        self.pool_size = max(1, pool_size)
+        self.cache = cache
+        self.retries = max(0, retries)
+        self.scheduler = HostScheduler(per_host_concurrency, host_rate)
+        self._session = None
+        self._lock = threading.Lock()
+        self._robots = {}
+        self._robots_locks = {}
+
+    @property
+    def session(self):
+        """The underlying cloudscraper session, created on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        # cloudscraper (and requests under it) is slow to import, so it loads with the first session.
+        import cloudscraper
+        from cloudscraper import CipherSuiteAdapter
+        from requests.adapters import HTTPAdapter
+
+        session = cloudscraper.create_scraper()
+        # cloudscraper mounts its own TLS adapter for https; keep its SSL context and only widen the pool.
+        tls_adapter = session.get_adapter('https://')
+        session.mount('https://', CipherSuiteAdapter(
+            ssl_context=tls_adapter.ssl_context,
+            source_address=tls_adapter.source_address,
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+        ))
+        session.mount('http://', HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size))
+        return session
+
+    def get(self, url, timeout, **kwargs):
+        """Performs a GET on the shared session under the host's politeness schedule.
+
+        Timeouts, connection errors and 429/5xx responses are retried with jittered
+        exponential backoff. A 429/503 pauses the whole host for its Retry-After. The last
+        response is returned even if it is an error; the last exception is raised.
+        """
+        import requests
+
+        if urlparse(url).path != '/robots.txt':
+            self._apply_crawl_delay(url, timeout)
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+            waiting_since = time.monotonic()
+            with self.scheduler.slot(url):
+                # Time spent on politeness (concurrency cap, rate, Crawl-delay) rather than on the network.
+                metrics.observe('host_wait', time.monotonic() - waiting_since)
+                # A request that timed out before gets more time on its next attempt.
+                request_timeout = self.scheduler.timeout(url, timeout) * (2 if attempt else 1)
+                started = time.monotonic()
+                metrics.count('http_requests')
+                try:
+                    with metrics.span('http_request'):
+                        response = self.session.get(url, timeout=request_timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                self.scheduler.observe(url, time.monotonic() - started)
+                if response.status_code >= 400:
+                    metrics.count('http_errors')
+                return response
+
+            wait = retry_after_seconds(response) if response is not None else None
+            if attempt == self.retries or (wait is not None and wait > MAX_RETRY_AFTER):
+                metrics.count('http_errors')
+                if error:
+                    raise error
+                return response
+            metrics.count('http_retries')
+            if response is not None:
+                response.close()
+            if wait is not None or (response is not None and response.status_code in (429, 503)):
+                self.scheduler.throttled(url, wait if wait is not None else backoff_delay(attempt))
+            else:
+                time.sleep(backoff_delay(attempt))
+
+    def robots_txt(self, url, timeout=2):
+        """Returns the robots.txt of the URL's host, read at most once per ROBOTS_TTL.
+        A missing robots.txt reads as ''. Raises if it couldn't be fetched."""
+        import requests
+
+        parsed_url = urlparse(url)
+        host = parsed_url.netloc
+        with self._lock:
+            host_lock = self._robots_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            entry = self._robots.get(host)
+            if entry and time.monotonic() - entry[1] < ROBOTS_TTL:
+                if isinstance(entry[0], Exception):
+                    raise entry[0]
+                return entry[0]
+            robots_url = urlunparse((parsed_url.scheme, host, '/robots.txt', '', '', ''))
+            try:
+                text = self.fetch(robots_url, timeout=timeout).text
+            except requests.HTTPError as e:
+                text = '' if e.response is not None and e.response.status_code in (401, 403, 404, 410) else e
+            except Exception as e:
+                text = e
+            self._robots[host] = (text, time.monotonic())
+            self.scheduler.set_crawl_delay(url, 0 if isinstance(text, Exception) else crawl_delay_from_robots(text))
+            if isinstance(text, Exception):
+                raise text
+            return text
+
+    def _apply_crawl_delay(self, url, timeout):
+        try:
+            self.robots_txt(url, timeout)
+        except Exception:
+            pass
+
+    def fetch(self, url, timeout):
+        """Fetches a URL through the response cache, if there is one.
+
+        Fresh entries are served without touching the network. Stale ones are
+        revalidated with If-None-Match/If-Modified-Since, and a 304 is served from disk.
+        Raises for non-2xx responses, like `raise_for_status`.
+        """
+        with metrics.span('fetch'):
+            return self._fetch(url, timeout)
+
+    def _fetch(self, url, timeout):
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and entry.is_fresh(self.cache.ttl):
+            try:
+                page = Page(url, entry.read(), entry.encoding, from_cache=True)
+                metrics.count('cache_hits')
+                return page
+            except OSError:
+                entry = None
+
+        headers = entry.conditional_headers() if entry else {}
+        response = self.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and entry:
+            try:
+                content = entry.read()
+            except OSError:
+                # The body was evicted between lookup and read; fetch it again unconditionally.
+                return self.fetch_uncached(url, timeout)
+            self.cache.refresh(url)
+            metrics.count('cache_revalidated')
+            return Page(url, content, entry.encoding, from_cache=True)
+
+        response.raise_for_status()
+        if self.cache:
+            metrics.count('cache_misses')
+            self.cache.store(url, response)
+        metrics.count('http_bytes', len(response.content))
+        return Page(url, response.content, response.encoding)
+
+    def stream(self, url, timeout, chunk_size=64 * 1024):
+        """Yields a URL's body in chunks, going through the response cache like `fetch`.
+
+        Used for sitemaps, which can be tens of megabytes and are read only as fast as the
+        caller fetches the pages they list. The body is downloaded whole at network speed,
+        into the cache (or a temporary file without one), and then read back from disk, so
+        the connection is never left idle long enough for the server to cut it short.
+        The per-host slot is only held while the request is sent.
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and entry.is_fresh(self.cache.ttl):
+            metrics.count('cache_hits')
+            yield from entry.iter_chunks(chunk_size)
+            return
+
+        headers = entry.conditional_headers() if entry else {}
+        response = self.get(url, timeout=timeout, headers=headers, stream=True)
+        spool = None
+        try:
+            if response.status_code == 304 and entry:
+                self.cache.refresh(url)
+                metrics.count('cache_revalidated')
+            else:
+                response.raise_for_status()
+                if self.cache:
+                    metrics.count('cache_misses')
+                    with self.cache.open_writer(url, response) as writer:
+                        _download(response, writer, chunk_size)
+                        entry = writer.commit()
+                else:
+                    spool = tempfile.TemporaryFile()
+                    _download(response, spool, chunk_size)
+        except BaseException:
+            if spool:
+                spool.close()
+            raise
+        finally:
+            response.close()
+
+        if spool is None:
+            yield from entry.iter_chunks(chunk_size)
+            return
+        with spool:
+            spool.seek(0)
+            yield from iter(lambda: spool.read(chunk_size), b'')
+
+    def fetch_uncached(self, url, timeout):
+        """Fetches a URL straight from the network, refreshing the cache entry if there is a cache."""
+        response = self.get(url, timeout=timeout)
+        response.raise_for_status()
+        if self.cache:
+            self.cache.store(url, response)
+        metrics.count('http_bytes', len(response.content))
+        return Page(url, response.content, response.encoding)
+
+    def close(self):
+        """Closes all pooled connections. The session is recreated if used again."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -0,0 +1,401 @@
+import argparse
+import atexit
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from queue import Empty, Full, Queue
+
+import metrics
+import scraper
+from events import FrameBatcher, DEFAULT_LOG_LEVEL
+from results import ResultWriter, result_path, purge_results, DEFAULT_RESULTS_DIR
+from state_store import StateStore, DEFAULT_STATE_PATH
+
+DEFAULT_JOBS_PATH = 'scrape_jobs.sqlite'
+DEFAULT_JOB_WORKERS = 2
+# How often idle workers look for jobs and watchers look for new frames, in seconds.
+JOB_POLL_INTERVAL = 0.25
+# Finished jobs and their frames are deleted after this many seconds, checked every JOB_PURGE_INTERVAL seconds.
+JOB_RETENTION = 24 * 3600
+JOB_PURGE_INTERVAL = 3600
+# How often a busy worker publishes its metrics for the web process's /metrics, in seconds.
+METRICS_INTERVAL = 5
+# How often a running job checks whether it was cancelled, however slowly the scraper is producing events.
+CANCEL_CHECK_INTERVAL = 1
+# Events the scraper may run ahead of run_job before it has to wait.
+PUMP_MAX_PENDING = 1000
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+class JobQueue:
+    """Persistent queue of scrape jobs, plus the stream of event frames each job produced.
+
+    Backed by one SQLite file that the web process and the worker processes open
+    independently: the web process submits, watches and cancels jobs, and workers
+    claim queued jobs and append their frames (see events.FrameBatcher). Frames are
+    kept after a job finishes, so a client can reattach and replay a job's whole stream.
+    Workers also publish their metrics here, and each finished job keeps the metrics it recorded.
+    """
+
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                sources TEXT NOT NULL,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                worker_pid INTEGER,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                metrics TEXT
+            )
+        """)
+        try:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN metrics TEXT")
+        except sqlite3.OperationalError:
+            pass  # The column already exists.
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS frames (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                compressed INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            ) WITHOUT ROWID
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS worker_metrics (
+                pid INTEGER PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at)")
+
+    def submit(self, sources, options=None):
+        """Queues a scrape of `sources` with the given run_scraper options. Returns the job ID."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, sources, options, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, json.dumps(sources), json.dumps(options or {}), QUEUED, time.time()),
+            )
+        return job_id
+
+    def status(self, job_id):
+        """The job's status, or None if there is no such job."""
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def cancel(self, job_id):
+        """Cancels a queued job right away, and asks the worker running a started job to stop it."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                             (CANCELLED, time.time(), job_id, QUEUED))
+            self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def frames(self, job_id, after=0, limit=50):
+        """Returns up to `limit` (seq, compressed, data) frames the job produced after sequence number `after`."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, compressed, data FROM frames WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit),
+            ).fetchall()
+
+    def claim(self, worker_pid):
+        """Marks the oldest queued job as running on this worker. Returns (job_id, sources, options) or None."""
+        with self._lock:
+            row = self._db.execute("""
+                UPDATE jobs SET status = ?, worker_pid = ?, started_at = ?
+                WHERE id = (SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1) AND status = ?
+                RETURNING id, sources, options
+            """, (RUNNING, worker_pid, time.time(), QUEUED, QUEUED)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), json.loads(row[2])
+
+    def append_frame(self, job_id, last_seq, frame):
+        """Stores a (data, compressed) frame after sequence number `last_seq`. Returns the new last seq."""
+        if frame is None:
+            return last_seq
+        data, compressed = frame
+        with self._lock:
+            self._db.execute("INSERT INTO frames (job_id, seq, compressed, data) VALUES (?, ?, ?, ?)",
+                             (job_id, last_seq + 1, int(compressed), data))
+        return last_seq + 1
+
+    def finish(self, job_id, status, error=None, job_metrics=None):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, metrics = ? WHERE id = ?",
+                             (status, error, time.time(), json.dumps(job_metrics) if job_metrics else None, job_id))
+
+    def job_metrics(self, job_id):
+        """The metrics snapshot a finished job recorded, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT metrics FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def store_metrics(self, pid, snapshot):
+        """Publishes a worker's cumulative metrics snapshot."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO worker_metrics (pid, snapshot, updated_at) VALUES (?, ?, ?)",
+                             (pid, json.dumps(snapshot), time.time()))
+
+    def worker_metrics(self):
+        """The latest metrics snapshot of every worker."""
+        with self._lock:
+            rows = self._db.execute("SELECT snapshot FROM worker_metrics").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def clear_worker_metrics(self):
+        with self._lock:
+            self._db.execute("DELETE FROM worker_metrics")
+
+    def requeue_orphans(self):
+        """Puts jobs left running by workers that no longer exist back in the queue, dropping their partial output."""
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "DELETE FROM frames WHERE job_id IN (SELECT id FROM jobs WHERE status = ? AND cancel_requested = 0)",
+                    (RUNNING,),
+                )
+                self._db.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND cancel_requested = 1",
+                                 (CANCELLED, time.time(), RUNNING))
+                self._db.execute("UPDATE jobs SET status = ?, worker_pid = NULL, started_at = NULL WHERE status = ?",
+                                 (QUEUED, RUNNING))
+
+    def purge(self, max_age=JOB_RETENTION):
+        """Deletes finished jobs, and their frames, that ended more than `max_age` seconds ago."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "DELETE FROM frames WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,)
+                )
+                self._db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# Returned by EventPump.get when no event arrived in time, and once the generator is exhausted.
+TICK, END = object(), object()
+
+class EventPump:
+    """Runs an event generator on its own thread, so its consumer can wake up on a timer.
+
+    A scraper step can go minutes without an event (a slow Selenium page load, a long PDF
+    section), and run_job still has to send the events it holds and notice cancellation
+    in the meantime. The generator is only ever resumed and closed on the pump's thread.
+    """
+
+    def __init__(self, generator, max_pending=PUMP_MAX_PENDING):
+        self._generator = generator
+        self._events = Queue(max_pending)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for event in self._generator:
+                if not self._put((event, None)):
+                    return
+            self._put((END, None))
+        except Exception as e:
+            self._put((None, e))
+        finally:
+            self._generator.close()
+
+    def _put(self, entry):
+        while not self._stop.is_set():
+            try:
+                self._events.put(entry, timeout=CANCEL_CHECK_INTERVAL)
+                return True
+            except Full:
+                continue
+        return False
+
+    def get(self, timeout=None):
+        """Returns the next event, TICK if none arrived within `timeout` seconds, or END.
+        Raises the exception the generator raised."""
+        try:
+            event, error = self._events.get(timeout=timeout)
+        except Empty:
+            return TICK
+        if error is not None:
+            raise error
+        return event
+
+    def close(self):
+        """Stops the generator at its next event and waits for it to be closed."""
+        self._stop.set()
+        self._thread.join()
+
+def run_job(queue, job_id, sources, options, session, results_dir=DEFAULT_RESULTS_DIR):
+    """Runs one claimed job to completion, storing its events as frames while they are produced,
+    and its items in the job's JSONL result file under `results_dir`.
+    Frames are sent when full or FRAME_MAX_AGE old, even while the scraper is between events,
+    and cancellation is checked every CANCEL_CHECK_INTERVAL seconds.
+
+    Besides run_scraper's keyword arguments, `options` may hold 'log_level' (the least
+    severe log level kept) and 'compress' (whether frames are zlib-compressed).
+    The metrics the job recorded are stored with it when it finishes.
+    """
+    options = dict(options)
+    batcher = FrameBatcher(options.pop('log_level', DEFAULT_LOG_LEVEL), options.pop('compress', True))
+    last_seq = 0
+    writer = ResultWriter(result_path(results_dir, job_id))
+    metrics_before = metrics.snapshot()
+    next_publish = time.monotonic() + METRICS_INTERVAL
+    next_cancel_check = time.monotonic() + CANCEL_CHECK_INTERVAL
+
+    def finish(status, error=None):
+        current = metrics.snapshot()
+        queue.finish(job_id, status, error, metrics.diff_snapshots(current, metrics_before))
+        queue.store_metrics(os.getpid(), current)
+
+    # Incremental state is committed only once the job's items are all stored, so a cancelled
+    # or crashed job is scraped in full next time.
+    state = StateStore(options.pop('state_path', DEFAULT_STATE_PATH)) if options.pop('incremental', False) else None
+    pump = EventPump(scraper.run_scraper(sources, session=session, state=state, structured=True, **options))
+    try:
+        while True:
+            deadlines = [next_cancel_check - time.monotonic()]
+            if batcher.time_left() is not None:
+                deadlines.append(batcher.time_left())
+            message = pump.get(timeout=max(0.0, min(deadlines)))
+            if message is END:
+                break
+            if message is not TICK:
+                if isinstance(message, dict):
+                    writer.write(message)
+                batcher.add(message)
+            if batcher.ready():
+                # Items reach the result file no later than they reach the client.
+                writer.flush()
+                last_seq = queue.append_frame(job_id, last_seq, batcher.flush())
+            if time.monotonic() >= next_cancel_check:
+                if queue.cancel_requested(job_id):
+                    batcher.add("Scrape cancelled.")
+                    last_seq = queue.append_frame(job_id, last_seq, batcher.flush())
+                    finish(CANCELLED)
+                    return
+                next_cancel_check = time.monotonic() + CANCEL_CHECK_INTERVAL
+            if time.monotonic() >= next_publish:
+                queue.store_metrics(os.getpid(), metrics.snapshot())
+                next_publish = time.monotonic() + METRICS_INTERVAL
+        writer.flush()
+        last_seq = queue.append_frame(job_id, last_seq, batcher.flush())
+        if state:
+            state.commit()
+        finish(DONE)
+    except Exception as e:
+        batcher.add(f"FATAL: A server error occurred in the background task: {e}")
+        queue.append_frame(job_id, last_seq, batcher.flush())
+        finish(FAILED, str(e))
+    finally:
+        # The scraper stops at its next event; the worker takes no new job until it has.
+        pump.close()
+        writer.close()
+        if state:
+            state.close()
+
+def worker_main(path, parent_pid=None, session_options=None, pool_options=None, results_dir=DEFAULT_RESULTS_DIR):
+    """Runs queued jobs one at a time, until the parent process (if given) exits."""
+    session_options = dict(session_options or {})
+    pool_options = pool_options or {}
+    # Exit normally on terminate, so atexit handlers close the browsers and extraction processes.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    scraper.configure_extraction_pool(pool_options.get('extract_workers', scraper.DEFAULT_EXTRACT_WORKERS))
+    scraper.configure_browser_pool(pool_options.get('max_browsers', scraper.DEFAULT_MAX_BROWSERS),
+                                   pool_options.get('browser_max_pages', scraper.DEFAULT_MAX_PAGES_PER_BROWSER),
+                                   slots_dir=pool_options.get('browser_slots_dir'))
+    cache_dir = session_options.pop('cache_dir', None)
+    cache_ttl = session_options.pop('cache_ttl', scraper.DEFAULT_CACHE_TTL)
+    cache = scraper.ResponseCache(cache_dir, ttl=cache_ttl) if cache_dir else None
+    # One pooled session per worker, reused by every job it runs.
+    session = scraper.SessionManager(cache=cache, **session_options)
+    queue = JobQueue(path)
+    while parent_pid is None or os.getppid() == parent_pid:
+        job = queue.claim(os.getpid())
+        if job is None:
+            time.sleep(JOB_POLL_INTERVAL)
+            continue
+        run_job(queue, *job, session, results_dir=results_dir)
+
+def start_workers(count=DEFAULT_JOB_WORKERS, path=DEFAULT_JOBS_PATH, session_options=None, pool_options=None,
+                  results_dir=DEFAULT_RESULTS_DIR):
+    """Starts `count` worker processes that run queued jobs, and returns them.
+
+    Jobs a previous server left running are queued again first, so this must only be
+    called by the one process that owns the queue. Workers are separate `python jobs.py`
+    processes, so they don't inherit the web server's gevent patching, and they exit on
+    their own when this process goes away. `max_browsers` in `pool_options` is shared by
+    all the workers, through lock files next to the queue (see browser_pool.BrowserSlots).
+    """
+    pool_options = dict(pool_options or {}, browser_slots_dir=path + '.browsers')
+    queue = JobQueue(path)
+    queue.requeue_orphans()
+    queue.purge()
+    # Counters start over with the new workers.
+    queue.clear_worker_metrics()
+    queue.close()
+    purge_results(results_dir, JOB_RETENTION)
+
+    command = [
+        sys.executable, os.path.abspath(__file__), '--db', path, '--parent-pid', str(os.getpid()),
+        '--session-options', json.dumps(session_options or {}), '--pool-options', json.dumps(pool_options or {}),
+        '--results-dir', results_dir,
+    ]
+    workers = [subprocess.Popen(command) for _ in range(max(1, count))]
+
+    def stop_workers():
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            try:
+                worker.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+    atexit.register(stop_workers)
+    return workers
+
+def main():
+    """Runs one job worker. Started by start_workers, or by hand to add capacity to a queue."""
+    parser = argparse.ArgumentParser(description="Run queued scrape jobs.")
+    parser.add_argument("--db", default=DEFAULT_JOBS_PATH, help="SQLite file holding the job queue.")
+    parser.add_argument("--parent-pid", type=int, help="Exit when this process is no longer our parent.")
+    parser.add_argument("--session-options", default='{}', help="JSON keyword arguments for the worker's SessionManager, plus cache_dir and cache_ttl.")
+    parser.add_argument("--pool-options", default='{}', help="JSON with extract_workers, max_browsers, browser_max_pages and browser_slots_dir.")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR, help="Directory for each job's JSONL result file.")
+    args = parser.parse_args()
+    scraper.configure_logging()
+    worker_main(args.db, args.parent_pid, json.loads(args.session_options), json.loads(args.pool_options),
+                args.results_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets; the last bucket is unbounded.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = 'scraper_'
+
+class Metrics:
+    """Counters and latency histograms for one process.
+
+    Spans time a block of work into the histogram of the same name and count the
+    exceptions that escape it as `<name>_errors`. Spans around generator stages
+    (sitemap, static crawl, a whole source) measure wall-clock time, including time
+    their consumer spends between items. Snapshots are plain dicts, so worker
+    processes can store them and the web process can merge them.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+            histogram['buckets'][index] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.count(f"{name}_errors")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed_iter(self, name, iterable):
+        """Yields from `iterable`, timing how long each value takes to produce."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                value = next(iterator)
+            except StopIteration:
+                return
+            except Exception:
+                self.count(f"{name}_errors")
+                self.observe(name, time.perf_counter() - start)
+                raise
+            self.observe(name, time.perf_counter() - start)
+            yield value
+
+    def snapshot(self):
+        """Returns {'counters': {...}, 'histograms': {name: {'buckets', 'sum', 'count'}}}."""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'histograms': {name: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                               for name, h in self._histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+def merge_snapshots(snapshots, sign=1):
+    """Adds snapshots together (or, with sign=-1, subtracts every later one from the first)."""
+    merged = {'counters': {}, 'histograms': {}}
+    for index, snapshot in enumerate(snapshots):
+        factor = 1 if index == 0 else sign
+        for name, value in snapshot.get('counters', {}).items():
+            merged['counters'][name] = merged['counters'].get(name, 0) + factor * value
+        for name, histogram in snapshot.get('histograms', {}).items():
+            target = merged['histograms'].setdefault(
+                name, {'buckets': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0})
+            target['buckets'] = [a + factor * b for a, b in zip(target['buckets'], histogram['buckets'])]
+            target['sum'] += factor * histogram['sum']
+            target['count'] += factor * histogram['count']
+    merged['counters'] = {name: value for name, value in merged['counters'].items() if value}
+    merged['histograms'] = {name: h for name, h in merged['histograms'].items() if h['count']}
+    return merged
+
+def diff_snapshots(after, before):
+    """What was recorded between two snapshots of the same registry."""
+    return merge_snapshots([after, before], sign=-1)
+
+def histogram_quantile(histogram, quantile, buckets=LATENCY_BUCKETS):
+    """Estimates a quantile from bucket counts: the upper bound of the bucket it falls in."""
+    rank = quantile * histogram['count']
+    seen = 0
+    for bound, count in zip(list(buckets) + [float('inf')], histogram['buckets']):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float('inf')
+
+def render_prometheus(snapshot, buckets=LATENCY_BUCKETS):
+    """Formats a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, value in sorted(snapshot['counters'].items()):
+        metric = f"{METRIC_PREFIX}{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, histogram in sorted(snapshot['histograms'].items()):
+        metric = f"{METRIC_PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(list(buckets) + ['+Inf'], histogram['buckets']):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{metric}_sum {histogram['sum']:.6f}", f"{metric}_count {histogram['count']}"]
+    return "\n".join(lines) + "\n"
+
+def format_summary(snapshot, buckets=LATENCY_BUCKETS):
+    """Formats a snapshot as a human-readable table of spans and counters."""
+    lines = [f"{'span':<18}{'count':>8}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}"]
+    for name, histogram in sorted(snapshot['histograms'].items(), key=lambda item: -item[1]['sum']):
+        p50, p95 = (histogram_quantile(histogram, q, buckets) * 1000 for q in (0.5, 0.95))
+        lines.append(f"{name:<18}{histogram['count']:>8}{histogram['sum']:>10.2f}"
+                     f"{histogram['sum'] / histogram['count'] * 1000:>10.1f}{'<=' + format(p50, 'g'):>10}{'<=' + format(p95, 'g'):>10}")
+    lines.append("")
+    lines += [f"{name:<26}{value:>12}" for name, value in sorted(snapshot['counters'].items())]
+    return lines
+
+# The registry every module of this process records into.
+METRICS = Metrics()
+count = METRICS.count
+observe = METRICS.observe
+span = METRICS.span
+timed_iter = METRICS.timed_iter
+snapshot = METRICS.snapshot
+reset = METRICS.reset
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from extraction import submit_extraction, extraction_worker_count
+
+# Pages extracted per worker task. Large enough to amortize opening the document,
+# small enough that a 1,000-page book spreads across every core.
+DEFAULT_PDF_CHUNK_PAGES = 25
+
+# How a PDF is turned into items: one item for the whole file, one per outline
+# chapter (falls back to page chunks without an outline), or one per page chunk.
+PDF_SPLIT_MODES = ('none', 'chapter', 'pages')
+
+# Per thread: with extraction inline, several sources' threads read different PDFs at once.
+_open_document = threading.local()
+
+def _load_document(file_path):
+    """Keeps the last opened document per worker thread, since consecutive tasks usually hit the same file."""
+    cached = getattr(_open_document, 'entry', None)
+    if cached is None or cached[0] != file_path:
+        if cached is not None:
+            _open_document.entry = None
+            cached[1].close()
+        import fitz  # PyMuPDF
+
+        cached = _open_document.entry = (file_path, fitz.open(file_path))
+    return cached[1]
+
+def extract_page_range(file_path, start, stop):
+    """Returns the text of pages [start, stop) of a PDF. Runs inside an extraction worker."""
+    doc = _load_document(file_path)
+    return "".join(doc.load_page(page_num).get_text() for page_num in range(start, stop))
+
+def plan_sections(doc, split, chunk_pages):
+    """Splits a document into (title, start, stop) page ranges according to the split mode."""
+    page_count = doc.page_count
+    if split == 'chapter':
+        # Top-level outline entries mark chapter starts; toc pages are 1-based.
+        chapters = [(title.strip(), page - 1) for level, title, page in doc.get_toc(simple=True)
+                    if level == 1 and 0 < page <= page_count]
+        chapters.sort(key=lambda chapter: chapter[1])
+        if chapters:
+            sections = []
+            if chapters[0][1] > 0:
+                sections.append(("Front matter", 0, chapters[0][1]))
+            for i, (title, start) in enumerate(chapters):
+                stop = chapters[i + 1][1] if i + 1 < len(chapters) else page_count
+                if stop > start:
+                    sections.append((title, start, stop))
+            return sections
+        split = 'pages'
+    if split == 'pages':
+        return [(f"Pages {start + 1}-{min(start + chunk_pages, page_count)}", start, min(start + chunk_pages, page_count))
+                for start in range(0, page_count, chunk_pages)]
+    return [(None, 0, page_count)]
+
+def iter_pdf_sections(file_path, split='none', chunk_pages=DEFAULT_PDF_CHUNK_PAGES):
+    """Extracts a PDF on the extraction pool, page ranges in parallel.
+
+    Yields (title, text) per section in document order as soon as each section is
+    complete. Only a bounded window of page ranges is in flight, so a streamed book
+    never holds all of its text in memory at once.
+    """
+    chunk_pages = max(1, chunk_pages)
+    import fitz  # PyMuPDF
+
+    with fitz.open(file_path) as doc:
+        sections = plan_sections(doc, split, chunk_pages)
+
+    # Break every section into page ranges small enough to spread across workers.
+    tasks = [(index, start, min(start + chunk_pages, stop))
+             for index, (_, section_start, stop) in enumerate(sections)
+             for start in range(section_start, stop, chunk_pages)]
+    window = max(2, 2 * extraction_worker_count())
+
+    results = {}
+    pending = {}
+    next_task = 0
+    next_emit = 0
+    parts = []
+    current_section = 0
+    try:
+        while next_emit < len(tasks):
+            while next_task < len(tasks) and len(pending) < window:
+                _, start, stop = tasks[next_task]
+                pending[submit_extraction(extract_page_range, file_path, start, stop)] = next_task
+                next_task += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+
+            # Emit in document order: collect the contiguous prefix of finished ranges.
+            while next_emit in results:
+                section_index = tasks[next_emit][0]
+                if section_index != current_section:
+                    yield sections[current_section][0], "".join(parts)
+                    parts = []
+                    current_section = section_index
+                parts.append(results.pop(next_emit))
+                next_emit += 1
+        if sections:
+            yield sections[current_section][0], "".join(parts)
+    finally:
+        for future in pending:
+            future.cancel()
+
+def file_digest(file_path):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_cached_pdf_sections(file_path, split='none', chunk_pages=DEFAULT_PDF_CHUNK_PAGES, cache_dir=None):
+    """iter_pdf_sections, reusing the sections of an identical PDF extracted before.
+
+    Sections are cached under `cache_dir` by the file's content hash and the split
+    settings, as one JSON [title, text] line each. A cache file only appears once a
+    whole document has been extracted, so an interrupted run never leaves a partial one.
+    """
+    if not cache_dir:
+        yield from iter_pdf_sections(file_path, split=split, chunk_pages=chunk_pages)
+        return
+    cache_path = os.path.join(cache_dir, f"{file_digest(file_path)}-{split}-{max(1, chunk_pages)}.jsonl")
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            os.utime(cache_path)
+            for line in f:
+                title, text = json.loads(line)
+                yield title, text
+        return
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for section in iter_pdf_sections(file_path, split=split, chunk_pages=chunk_pages):
+                f.write(json.dumps(section, ensure_ascii=False) + '\n')
+                yield section
+        os.replace(temp_path, cache_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = '.scrape_cache'
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_CACHE_TTL = 60 * 60
+# Least recently used entries are read this many at a time while evicting.
+EVICT_BATCH = 100
+
+class CacheEntry:
+    """A cached response: the body plus the validators needed to revalidate it."""
+
+    def __init__(self, url, body_hash, etag, last_modified, encoding, fetched_at, path):
+        self.url = url
+        self.body_hash = body_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoding = encoding
+        self.fetched_at = fetched_at
+        self.path = path
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self):
+        """Headers that let the server answer 304 Not Modified if the page hasn't changed."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def iter_chunks(self, chunk_size):
+        """Reads the cached body in chunks, so large bodies (sitemaps) never sit in memory whole."""
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+class CacheWriter:
+    """Writes a response body into the cache incrementally, hashing it as it goes.
+    Nothing is visible in the cache until `commit` is called."""
+
+    def __init__(self, cache, url, response):
+        self.cache = cache
+        self.url = url
+        self.response = response
+        self._digest = hashlib.sha256()
+        self._size = 0
+        os.makedirs(os.path.join(cache.directory, 'objects'), exist_ok=True)
+        self._tmp_path = os.path.join(cache.directory, 'objects', f"incoming.{os.getpid()}.{threading.get_ident()}.{id(self)}.tmp")
+        self._file = open(self._tmp_path, 'wb')
+
+    def write(self, chunk):
+        self._digest.update(chunk)
+        self._size += len(chunk)
+        self._file.write(chunk)
+
+    def commit(self):
+        """Moves the body into content-addressed storage and indexes it. Returns the new CacheEntry."""
+        self._file.close()
+        body_hash = self._digest.hexdigest()
+        path = self.cache._object_path(body_hash)
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return self.cache._index(self.url, body_hash, self._size, self.response)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+class ResponseCache:
+    """Content-addressed on-disk cache for fetched pages and sitemaps.
+
+    Bodies are stored once per content hash under `objects/`, and a SQLite index maps
+    each URL to its body, its ETag/Last-Modified validators and, optionally, the
+    article already extracted from it. Entries are evicted least-recently-used first
+    once the bodies exceed `max_bytes`. The total size of the stored bodies is kept up to
+    date as bodies are added and removed, so a store doesn't have to scan the index.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MAX_BYTES, ttl=DEFAULT_CACHE_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), timeout=30, check_same_thread=False)
+        # Every job worker reads and stores pages here at once; WAL lets lookups go on while one of them writes.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                encoding TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                extracted TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_by_body_hash ON entries (body_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_by_access ON entries (accessed_at)")
+        # One row per stored body, and the running total of their sizes.
+        self._db.execute("CREATE TABLE IF NOT EXISTS objects (body_hash TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'total_bytes'").fetchone() is None:
+            # A cache written before sizes were tracked: count its bodies once.
+            self._db.execute("INSERT OR IGNORE INTO objects SELECT DISTINCT body_hash, size FROM entries")
+            self._db.execute("INSERT OR IGNORE INTO meta SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM objects")
+        self._db.commit()
+
+    def _object_path(self, body_hash):
+        return os.path.join(self.directory, 'objects', body_hash[:2], body_hash)
+
+    def lookup(self, url):
+        """Returns the CacheEntry for a URL, or None if it isn't cached."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body_hash, etag, last_modified, encoding, fetched_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            path = self._object_path(row[0])
+            if not os.path.exists(path):
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._remove_orphan(row[0])
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        return CacheEntry(url, row[0], row[1], row[2], row[3], row[4], path)
+
+    def store(self, url, response):
+        """Caches a successful response's body and validators. Returns the new CacheEntry."""
+        with self.open_writer(url, response) as writer:
+            writer.write(response.content)
+            return writer.commit()
+
+    def open_writer(self, url, response):
+        """Returns a CacheWriter for streaming a large response body into the cache."""
+        return CacheWriter(self, url, response)
+
+    def _index(self, url, body_hash, size, response):
+        now = time.time()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            previous = self._db.execute("SELECT body_hash, extracted FROM entries WHERE url = ?", (url,)).fetchone()
+            # Keep the extracted article only if the body is byte-for-byte the same.
+            extracted = previous[1] if previous and previous[0] == body_hash else None
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, size, etag, last_modified, response.encoding, now, now, extracted),
+            )
+            if self._db.execute("INSERT OR IGNORE INTO objects VALUES (?, ?)", (body_hash, size)).rowcount:
+                self._add_total(size)
+            if previous and previous[0] != body_hash:
+                self._remove_orphan(previous[0])
+            self._db.commit()
+            self._evict()
+        return CacheEntry(url, body_hash, etag, last_modified, response.encoding, now, self._object_path(body_hash))
+
+    def refresh(self, url):
+        """Marks a cached entry as just revalidated (the server answered 304)."""
+        with self._lock:
+            now = time.time()
+            self._db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._db.commit()
+
+    def load_extracted(self, url):
+        """Returns the article previously extracted from this URL's cached body, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT extracted FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def store_extracted(self, url, extracted):
+        """Remembers the article extracted from this URL's cached body."""
+        with self._lock:
+            self._db.execute("UPDATE entries SET extracted = ? WHERE url = ?", (json.dumps(extracted), url))
+            self._db.commit()
+
+    def _add_total(self, delta):
+        # Relative, so worker processes sharing the index never overwrite each other's updates.
+        self._db.execute("UPDATE meta SET value = value + ? WHERE key = 'total_bytes'", (delta,))
+
+    def total_bytes(self):
+        """Size of the stored bodies. Identical pages share one body, so it is counted once."""
+        return self._db.execute("SELECT value FROM meta WHERE key = 'total_bytes'").fetchone()[0]
+
+    def _remove_orphan(self, body_hash):
+        """Deletes a body no entry points at any more. Returns True if it was removed."""
+        in_use = self._db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+        if in_use:
+            return False
+        row = self._db.execute("SELECT size FROM objects WHERE body_hash = ?", (body_hash,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM objects WHERE body_hash = ?", (body_hash,))
+            self._add_total(-row[0])
+        try:
+            os.remove(self._object_path(body_hash))
+        except OSError:
+            pass
+        return True
+
+    def _evict(self):
+        """Removes least recently used entries, a batch at a time, until the bodies fit in `max_bytes`."""
+        while self.total_bytes() > self.max_bytes:
+            batch = self._db.execute(
+                "SELECT url, body_hash FROM entries ORDER BY accessed_at LIMIT ?", (EVICT_BATCH,)
+            ).fetchall()
+            if not batch:
+                break
+            for url, body_hash in batch:
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._remove_orphan(body_hash)
+                if self.total_bytes() <= self.max_bytes:
+                    break
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
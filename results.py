@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import time
+
+DEFAULT_RESULTS_DIR = 'results'
+
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+def result_path(directory, job_id):
+    """Path of a job's JSONL result file. Raises ValueError for anything but a job ID, so it can't escape `directory`."""
+    if not JOB_ID_PATTERN.fullmatch(job_id or ''):
+        raise ValueError(f"Invalid job ID: {job_id}")
+    return os.path.join(directory, f"{job_id}.jsonl")
+
+class ResultWriter:
+    """Writes items to a file as they arrive, one at a time, so memory use doesn't grow with the crawl.
+
+    A path ending in .json gets the knowledgebase format, {"team_id": ..., "items": [...]},
+    written incrementally; any other path gets one JSON object per line (JSONL).
+    The file is replaced if it already exists.
+    """
+
+    def __init__(self, path, team_id=None):
+        self.path = path
+        self.count = 0
+        self._wrapped = path.lower().endswith('.json')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+        if self._wrapped:
+            self._file.write('{"team_id": ' + json.dumps(team_id) + ', "items": [')
+
+    def write(self, item):
+        line = json.dumps(item, ensure_ascii=False)
+        if self._wrapped:
+            self._file.write(('\n' if not self.count else ',\n') + line)
+        else:
+            self._file.write(line + '\n')
+        self.count += 1
+
+    def flush(self):
+        """Makes everything written so far visible to readers of the file."""
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._wrapped:
+            self._file.write('\n]}\n')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def iter_json_document(path, team_id):
+    """Streams a JSONL result file as a {"team_id": ..., "items": [...]} document, one chunk per item line."""
+    yield '{"team_id": ' + json.dumps(team_id) + ', "items": ['
+    first = True
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            # A line still being written by the worker has no newline yet; stop before it.
+            if not line.endswith('\n'):
+                break
+            yield ('\n' if first else ',\n') + line[:-1]
+            first = False
+    yield '\n]}\n'
+
+def purge_results(directory, max_age):
+    """Deletes result files that haven't been written to for `max_age` seconds."""
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith('.jsonl') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
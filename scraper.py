@@ -1,27 +1,36 @@
 import argparse
-import cloudscraper
-from bs4 import BeautifulSoup
-import trafilatura
-from markdownify import markdownify as md
-import fitz  # PyMuPDF
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import json
 import os
-from urllib.parse import urljoin, urlparse, urlunparse
+from urllib.parse import urljoin, urlparse
 import logging
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
 import re
 import csv
-
-# Silence the webdriver-manager logger
-logging.getLogger('webdriver_manager').setLevel(logging.WARNING)
-
-logging.basicConfig(filename='log.txt', level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s', filemode='w')
+import threading
+import queue
+from http_client import SessionManager, DEFAULT_POOL_SIZE, DEFAULT_PER_HOST_CONCURRENCY, DEFAULT_HOST_RATE, DEFAULT_RETRIES
+from response_cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_TTL
+from state_store import StateStore, DEFAULT_STATE_PATH
+from extraction import extract_article, run_extraction, configure_extraction_pool, DEFAULT_EXTRACT_WORKERS
+from browser_pool import configure_browser_pool, DEFAULT_MAX_BROWSERS, DEFAULT_MAX_PAGES_PER_BROWSER
+from sitemaps import iter_site_entries
+from dedup import Deduplicator, DEDUP_BACKENDS, DEFAULT_DEDUP_PATH
+from frontier import iter_listing_pages, DEFAULT_CRAWL_DEPTH, DEFAULT_CRAWL_PAGES
+from results import ResultWriter
+import metrics
+from pdf_extraction import iter_cached_pdf_sections, DEFAULT_PDF_CHUNK_PAGES, PDF_SPLIT_MODES
+
+DEFAULT_LOG_PATH = 'log.txt'
+
+def configure_logging(path=DEFAULT_LOG_PATH, filemode='a'):
+    """Logs to `path`. Called by each entry point, not on import, so importing scraper leaves log.txt alone."""
+    # Silence the webdriver-manager logger
+    logging.getLogger('webdriver_manager').setLevel(logging.WARNING)
+    logging.basicConfig(filename=path, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', filemode=filemode)
+
+# Global cap on in-flight article fetches.
+DEFAULT_CONCURRENCY = 8
 
 def truncate_content(text, max_length=200):
     """Truncates text to a max length, adding an ellipsis. Used to limit size of output displayed in UI."""
@@ -29,285 +38,305 @@ def truncate_content(text, max_length=200):
         return text[:max_length] + "..."
     return text
 
-def get_driver(url):
-    """Gets a selenium driver for a given URL using modern Selenium Manager.
-    This is used to scrape JavaScript-driven websites that don't return static HTML."""
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--log-level=3')
-    options.add_experimental_option('excludeSwitches', ['enable-logging'])
-
-    # On Heroku, the buildpack sets the Chrome binary location. Selenium Manager
-    # will automatically detect this and download the matching chromedriver.
-    if "GOOGLE_CHROME_BIN" in os.environ:
-        options.binary_location = os.environ.get("GOOGLE_CHROME_BIN")
-
-    # This simple initialization lets Selenium Manager handle the driver.
-    service = ChromeService(log_output=os.devnull)
-    
-    driver = webdriver.Chrome(service=service, options=options)
-    driver.get(url)
+def make_blog_item(title, content, source_url, author=""):
+    """Builds a knowledgebase item for a scraped blog article."""
+    return {
+        "title": title,
+        "content": content,
+        "content_type": "blog",
+        "source_url": source_url,
+        "author": author,
+        "user_id": ""
+    }
+
+def fetch_article(session, url, timeout, min_length):
+    """Downloads and extracts a single article.
+    Returns the item and the page's canonical URL (or ''), or (None, '') if the page isn't an article."""
+    page = session.fetch(url, timeout=timeout)
+    # An unchanged cached page can reuse the article extracted from it last time.
+    extracted = session.cache.load_extracted(url) if page.from_cache else None
+    if extracted is None:
+        # Parsing, main-content extraction and markdown happen in one pass, in an extraction process.
+        with metrics.span('extract'):
+            extracted = run_extraction(extract_article, page.text, url)
+        if session.cache:
+            session.cache.store_extracted(url, extracted)
+    else:
+        metrics.count('extract_cache_hits')
+    if not extracted or extracted["text_length"] <= min_length:
+        return None, ''
+    canonical = extracted.get("canonical")
+    item = make_blog_item(extracted["title"], extracted["content"], url, extracted.get("author", ""))
+    return item, urljoin(url, canonical) if canonical else ''
+
+def fetch_articles(session, urls, min_length, timeout=2, start_log=None, found_log=None,
+                   error_log="Could not process link {url}. Reason: {error}",
+                   concurrency=DEFAULT_CONCURRENCY, state=None, lastmods=None, dedup=None, executor=None):
+    """Fetches article URLs on a bounded worker pool.
+    Yields logs and items as each fetch finishes, so results stream out in completion order.
+    Pass the run's shared `executor` so `concurrency` caps fetches across every source at once;
+    without one, this call gets its own pool of `concurrency` threads.
+    Per-host limits are enforced by the session. With a deduplicator, articles whose canonical
+    URL or content was already found earlier in the run are dropped. With a state store, only new or changed
+    articles are yielded. Returns the number of articles found, including unchanged ones."""
+    found = 0
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    pending = {}
+    url_iter = iter(urls)
     try:
-        # Wait for body to be present, max 2 seconds.
-        WebDriverWait(driver, 2).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-    except Exception:
-        # If it times out, just continue. The page might be very slow or simple.
-        pass
-    return driver
-
-def scrape_sitemap(url):
-    """Finds and scrapes URLs from a sitemap. Yields logs, returns items."""
-    items = []
-    parsed_url = urlparse(url)
-    sitemap_url = urlunparse((parsed_url.scheme, parsed_url.netloc, 'sitemap.xml', '', '', ''))
-    
-    yield f"Trying to find sitemap at: {sitemap_url}"
+        exhausted = False
+        while pending or not exhausted:
+            # Keep the pool full without queueing the whole URL list up front.
+            while not exhausted and len(pending) < max(1, concurrency):
+                try:
+                    url = next(url_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if start_log:
+                    yield start_log.format(url=url)
+                future = executor.submit(fetch_article, session, url, timeout, min_length)
+                pending[future] = url
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                # Lastmods are dropped as soon as their URL is done, so a 50k-URL sitemap doesn't accumulate them.
+                lastmod = (lastmods or {}).pop(url, None)
+                try:
+                    item, canonical = future.result()
+                except Exception as e:
+                    metrics.count('article_errors')
+                    yield error_log.format(url=url, error=e)
+                    continue
+                if not item:
+                    metrics.count('not_articles')
+                    continue
+                if dedup and not dedup.claim_article(item, canonical):
+                    metrics.count('duplicates')
+                    yield f"Duplicate of an article already found: {url}"
+                    continue
+                found += 1
+                metrics.count('articles')
+                if state and not state.record(item, lastmod):
+                    metrics.count('unchanged')
+                    yield f"Unchanged since last run: {url}"
+                    continue
+                if found_log:
+                    yield found_log.format(url=url)
+                yield item
+    finally:
+        if owns_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in pending:
+                future.cancel()
+    return found
+
+def clean_link(base_url, link):
+    """Resolves a link against the page it was found on and strips the query string and fragment."""
+    return urlparse(urljoin(base_url, link))._replace(query="", fragment="").geturl()
+
+def article_candidate(base_url, link, dedup):
+    """Normalizes a discovered link and returns it if it looks like an article on the same site
+    that no source has claimed yet in this run."""
+    clean_url = clean_link(base_url, link)
+    parsed_url = urlparse(clean_url)
+
+    if urlparse(base_url).netloc != parsed_url.netloc or clean_url == base_url:
+        return None
+
+    # Looser path segment check: check for at least 1 segment and a dash, OR just /articles/
+    path_segments = parsed_url.path.strip('/').split('/')
+    if not ( (len(path_segments) >= 1 and '-' in path_segments[-1]) or 'articles' in path_segments ):
+        return None
+
+    if not dedup.claim_url(clean_url):
+        return None
+    return clean_url
+
+def is_blog_url(url):
+    """Filter for blog-like URLs from a sitemap."""
+    return '/blog/' in url or '/post/' in url or '/article/' in url or re.search(r'/\d{4}/\d{2}/', url)
+
+def with_pending_logs(generator, logs):
+    """Runs a fetch generator whose URL source logs into `logs` as it is pulled.
+    Emits those logs in order with the generator's own events and returns its return value."""
+    while True:
+        try:
+            event = next(generator)
+        except StopIteration as e:
+            yield from logs
+            logs.clear()
+            return e.value
+        except Exception:
+            # Keep the logs leading up to a failure.
+            yield from logs
+            logs.clear()
+            raise
+        yield from logs
+        logs.clear()
+        yield event
+
+def scrape_sitemap(url, session, concurrency=DEFAULT_CONCURRENCY, state=None, dedup=None, executor=None):
+    """Finds and scrapes URLs from a site's sitemaps. Yields logs and items, returns the number of articles found.
+    Sitemaps come from robots.txt or the usual locations, including nested sitemap indexes and gzipped files.
+    URLs are handed to the fetch stage as soon as they are parsed. With a state store, URLs whose
+    <lastmod> hasn't changed since the last run are skipped without fetching."""
+    yield "Looking for sitemaps in robots.txt and at the usual locations..."
     yield "(This may take up to 2 seconds if the sitemap doesn't exist...)"
-    try:
-        scraper = cloudscraper.create_scraper()
-        response = scraper.get(sitemap_url, timeout=2)
-        response.raise_for_status()
-        
-        sitemap_soup = BeautifulSoup(response.content, 'xml')
-        urls = [loc.text for loc in sitemap_soup.find_all('loc')]
-        
-        yield f"Found {len(urls)} URLs in sitemap."
-        
-        # Filter for blog-like URLs from the sitemap
-        blog_urls = [u for u in urls if '/blog/' in u or '/post/' in u or '/article/' in u or re.search(r'/\\d{4}/\\d{2}/', u)]
-
-        for blog_url in blog_urls:
-            try:
-                yield f"Scraping from sitemap URL: {blog_url}"
-                page_content = scraper.get(blog_url, timeout=2).text
-                content = trafilatura.extract(page_content)
-                if content and len(content) > 300:
-                    title_soup = BeautifulSoup(page_content, 'html.parser')
-                    title = title_soup.title.string if title_soup.title else "No Title Found"
-                    items.append({
-                        "title": title,
-                        "content": md(content, heading_style="ATX"),
-                        "content_type": "blog",
-                        "source_url": blog_url,
-                        "author": "",
-                        "user_id": ""
-                    })
-            except Exception as e:
-                yield f"Could not process sitemap URL {blog_url}. Reason: {e}"
+    logs = []
+    lastmods = {}
+    counts = {'listed': 0, 'skipped': 0}
 
+    dedup = dedup or Deduplicator()
+
+    def blog_urls():
+        for loc, lastmod in iter_site_entries(session, url, logs.append):
+            counts['listed'] += 1
+            if not is_blog_url(loc) or not dedup.claim_url(loc):
+                continue
+            if state and state.is_unchanged_since(loc, lastmod):
+                counts['skipped'] += 1
+                continue
+            lastmods[loc] = lastmod
+            yield loc
+
+    fetcher = fetch_articles(
+        session, blog_urls(), min_length=300, timeout=2,
+        start_log="Scraping from sitemap URL: {url}",
+        error_log="Could not process sitemap URL {url}. Reason: {error}",
+        concurrency=concurrency, state=state, lastmods=lastmods, dedup=dedup, executor=executor,
+    )
+    found = 0
+    try:
+        with metrics.span('sitemap'):
+            found = yield from with_pending_logs(fetcher, logs)
     except Exception as e:
-        yield f"Could not find or process sitemap.xml. Reason: {e}"
+        yield f"Could not find or process sitemaps. Reason: {e}"
 
-    return items
+    metrics.count('sitemap_urls', counts['listed'])
+    yield f"Found {counts['listed']} URLs in sitemaps."
+    if counts['skipped']:
+        yield f"Skipped {counts['skipped']} sitemap URLs unchanged since the last run."
+    return found + counts['skipped']
 
 
-def scrape_url(url):
+def scrape_url(url, session=None, concurrency=DEFAULT_CONCURRENCY, state=None,
+               crawl_depth=DEFAULT_CRAWL_DEPTH, crawl_pages=DEFAULT_CRAWL_PAGES, dedup=None, executor=None):
     """
     Scrapes a single URL. 
     First attempts a static scrape. If no articles are found, 
     falls back to Selenium.
-    Yields logs, returns items.
+    The static scrape follows pagination and section links for up to `crawl_depth`
+    section hops and `crawl_pages` listing pages.
+    Pass a shared `dedup` to skip articles other sources of the run already found, and a shared
+    `executor` to hold article fetches across sources to its thread count (see fetch_articles).
+    Yields logs and items as they are found.
     """
-    items = []
+    found = 0
+    session = session or SessionManager()
+    dedup = dedup or Deduplicator()
+    fetch_options = {'concurrency': concurrency, 'state': state, 'dedup': dedup, 'executor': executor}
+
+    # Posts often declare the start page as their canonical; that doesn't make them copies of each other.
+    dedup.add_source(url)
 
     # --- Step 1: Try Sitemap ---
     yield "Try 1: Attempting to scrape sitemap..."
-    sitemap_scraper = scrape_sitemap(url)
-    sitemap_items = []
     try:
-        while True:
-            log = next(sitemap_scraper)
-            if log: yield log
-    except StopIteration as e:
-        sitemap_items = e.value
+        found = yield from scrape_sitemap(url, session, **fetch_options)
     except Exception as e:
         yield f"An error occurred during sitemap scrape: {e}"
 
-    if sitemap_items:
-        items.extend(sitemap_items)
+    if found:
         # If sitemap is found and has content, we can often just stop here.
         yield "Sitemap found and processed. Assuming it's comprehensive."
-        unique_items = {item['source_url']: item for item in items}.values()
-        return list(unique_items)
+        return
     
     yield "Sitemap not found or empty."
 
     # --- Step 2: Static Scrape (No Selenium) ---
     yield "Try 2: Attempting static scrape..."
-    processed_urls = set()
-    try:
-        scraper = cloudscraper.create_scraper()
-        response = scraper.get(url, timeout=2)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        a_tags = [{'href': a.get('href')} for a in soup.find_all('a') if a.get('href')]
-        
-        yield f"Found {len(a_tags)} links via static scrape. Processing..."
-
-        for a_tag in a_tags:
-            link = a_tag['href']
-            full_url = urljoin(url, link)
-            parsed_url = urlparse(full_url)
-            clean_url = parsed_url._replace(query="", fragment="").geturl()
-
-            yield f"Processing link: {clean_url}"
-
-            if clean_url in processed_urls or urlparse(url).netloc != parsed_url.netloc or clean_url == url:
-                continue
-
-            # Looser path segment check: check for at least 1 segment and a dash, OR just /articles/
-            path_segments = parsed_url.path.strip('/').split('/')
-            if not ( (len(path_segments) >= 1 and '-' in path_segments[-1]) or 'articles' in path_segments ):
-                continue
-            
-            processed_urls.add(clean_url)
-            try:
-                page_content = scraper.get(clean_url, timeout=2).text
-                content = trafilatura.extract(page_content)
-                if content and len(content) > 200:
-                    yield f"Found article (static): {clean_url}"
-                    title_soup = BeautifulSoup(page_content, 'html.parser')
-                    title = title_soup.title.string if title_soup.title else "No Title Found"
-                    items.append({
-                        "title": title,
-                        "content": md(content, heading_style="ATX"),
-                        "content_type": "blog", "source_url": clean_url,
-                        "author": "", "user_id": ""
-                    })
-            except Exception as e:
-                yield f"Could not process static link {clean_url}. Reason: {e}"
+    logs = []
+
+    def static_article_urls():
+        # Listing pages are crawled lazily, as the fetch stage asks for more article URLs.
+        for page_url, soup in iter_listing_pages(session, url, logs.append, max_depth=crawl_depth, max_pages=crawl_pages):
+            metrics.count('listing_pages')
+            dedup.add_listing_url(page_url)
+            hrefs = [a.get('href') for a in soup.find_all('a') if a.get('href')]
+            logs.append(f"Found {len(hrefs)} links on {page_url}. Processing...")
+            for href in hrefs:
+                logs.append(f"Processing link: {clean_link(page_url, href)}")
+                clean_url = article_candidate(url, urljoin(page_url, href), dedup)
+                if clean_url:
+                    yield clean_url
 
+    try:
+        with metrics.span('static_crawl'):
+            found += yield from with_pending_logs(fetch_articles(
+                session, static_article_urls(), min_length=200, timeout=2,
+                found_log="Found article (static): {url}",
+                error_log="Could not process static link {url}. Reason: {error}",
+                **fetch_options,
+            ), logs)
     except Exception as e:
         yield f"Static scrape failed for base URL {url}. Reason: {e}"
 
     # --- Step 3: Fallback to Selenium ---
-    if not items:
+    if not found:
         yield "Try 3: Static scrape yielded no results. Falling back to Selenium..."
-        driver = None
         try:
             yield "Initializing web driver..."
-            driver = get_driver(url)
-            yield "Web driver initialized successfully."
-
-            article_urls_from_selenium = set()
-            
-            # Get standard <a> tag links first
-            initial_links = driver.find_elements(By.TAG_NAME, 'a')
-            for link in initial_links:
-                href = link.get_attribute('href')
-                if href:
-                    article_urls_from_selenium.add(href)
-            
-            # New logic for SPAs (specifically quill.co): find clickable elements, click them, get URL
-            try:
-                article_elements_selector = "div[style*='cursor:pointer']"
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, article_elements_selector))
-                )
-                
-                num_articles = len(driver.find_elements(By.CSS_SELECTOR, article_elements_selector))
-                yield f"Found {num_articles} potential JavaScript-driven article links. Discovering URLs..."
-
-                for i in range(num_articles):
-                    # Re-find elements each time to avoid staleness
-                    current_elements = driver.find_elements(By.CSS_SELECTOR, article_elements_selector)
-                    if i >= len(current_elements):
-                        break 
-                    
-                    element_to_click = current_elements[i]
-                    
-                    try:
-                        driver.execute_script("arguments[0].scrollIntoView(true);", element_to_click)
-                        time.sleep(0.5)
-                        element_to_click.click()
-                    except Exception:
-                        try:
-                            driver.execute_script("arguments[0].click();", element_to_click)
-                        except Exception as js_click_error:
-                            yield f"Could not click element {i}. Skipping. Error: {js_click_error}"
-                            continue
-
-                    WebDriverWait(driver, 10).until(lambda d: d.current_url != url)
-                    discovered_url = driver.current_url
-                    if discovered_url not in article_urls_from_selenium:
-                        yield f"Discovered URL: {discovered_url}"
-                        article_urls_from_selenium.add(discovered_url)
-                    
-                    driver.back()
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, article_elements_selector))
-                    )
-            except Exception as e:
-                yield f"Could not execute JavaScript link discovery. Proceeding with standard links. Reason: {e}"
+            # Selenium is only imported when a source actually needs a browser.
+            from selenium_discovery import get_driver, discover_links_with_selenium
+            # The browser goes back to the pool as soon as discovery is done;
+            # articles are fetched over plain HTTP.
+            with metrics.span('selenium_discovery'), get_driver(url) as driver:
+                yield "Web driver initialized successfully."
+                article_urls_from_selenium = yield from discover_links_with_selenium(driver, url)
 
             a_tags = [{'href': u} for u in article_urls_from_selenium]
-            driver.quit() 
-            driver = None 
 
             yield f"Found {len(a_tags)} links via Selenium. Processing..."
-            scraper = cloudscraper.create_scraper() # Reuse fast scraper for processing
 
+            article_urls = []
             for a_tag in a_tags:
-                try:
-                    link = a_tag.get('href')
-
-                    if not link:
-                        continue
-                    
-                    yield f"Processing Selenium link: {link}"
-
-                    full_url = urljoin(url, link)
-                    parsed_url = urlparse(full_url)
-                    clean_url = parsed_url._replace(query="", fragment="").geturl()
-
-                    if clean_url in processed_urls or urlparse(url).netloc != parsed_url.netloc or clean_url == url:
-                        continue
-
-                    # Looser path segment check: check for at least 1 segment and a dash, OR just /articles/
-                    path_segments = parsed_url.path.strip('/').split('/')
-                    if not ( (len(path_segments) >= 1 and '-' in path_segments[-1]) or 'articles' in path_segments ):
-                        continue
-
-                    processed_urls.add(clean_url)
-                    
-                    page_content = scraper.get(clean_url, timeout=15).text
-                    content = trafilatura.extract(page_content)
-                    if content and len(content) > 200:
-                        yield f"Found article (Selenium): {clean_url}"
-                        title_soup = BeautifulSoup(page_content, 'html.parser')
-                        title = title_soup.title.string if title_soup.title else "No Title Found"
-                        items.append({
-                            "title": title, "content": md(content, heading_style="ATX"),
-                            "content_type": "blog", "source_url": clean_url,
-                            "author": "", "user_id": ""
-                        })
-                except Exception as e:
-                    yield f"Error processing link {link}. Reason: {e}"
+                link = a_tag.get('href')
+                if not link:
                     continue
+                yield f"Processing Selenium link: {link}"
+                clean_url = article_candidate(url, link, dedup)
+                if clean_url:
+                    article_urls.append(clean_url)
+
+            with metrics.span('selenium_fetch'):
+                found += yield from fetch_articles(
+                    session, article_urls, min_length=200, timeout=15,
+                    found_log="Found article (Selenium): {url}",
+                    error_log="Error processing link {url}. Reason: {error}",
+                    **fetch_options,
+                )
         except Exception as e:
             yield f"Could not scrape {url} with Selenium. Reason: {e}"
-        finally:
-            if driver:
-                driver.quit()
-
-    # --- Final Step: Deduplicate and Return ---
-    yield "Scraping for this source complete. Deduplicating results..."
-    unique_items = {item['source_url']: item for item in items}.values()
-    return list(unique_items)
 
+    yield "Scraping for this source complete."
 
-def scrape_pdf(file_path):
-    """Scrapes a PDF file. Yields logs, returns items."""
-    items = []
 
+def scrape_pdf(file_path, split='none', chunk_pages=DEFAULT_PDF_CHUNK_PAGES, cache_dir=None):
+    """Scrapes a PDF file. Yields logs and items.
+    Page ranges are extracted in parallel; with split='chapter' or 'pages' each section is
+    streamed out as its own item as soon as it is ready. With `cache_dir`, a PDF whose
+    content was extracted before is read back from there instead."""
     basename = os.path.basename(file_path)
     display_name = basename
-    # Try to extract the original filename from the UUID-prefixed version
+    # Uploads are stored as <content hash>__<original filename>
     if '__' in basename:
         parts = basename.split('__', 1)
         if len(parts) == 2:
@@ -315,57 +344,165 @@ def scrape_pdf(file_path):
 
     yield f"Scraping PDF: {display_name}"
     try:
-        doc = fitz.open(file_path)
-        content = ""
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            content += page.get_text()
-        
-        if content:
-            items.append({
-                "title": display_name,
-                "content": content, # PDF content is already text
-                "content_type": "book",
-                "source_url": "",
-                "author": "",
-                "user_id": ""
-            })
+        # Counted once the file has opened, so a missing PDF fails as a PDF error below.
+        with open(file_path, 'rb') as f:
+            metrics.count('pdf_bytes', os.fstat(f.fileno()).st_size)
+        sections = iter_cached_pdf_sections(file_path, split=split, chunk_pages=chunk_pages, cache_dir=cache_dir)
+        with metrics.span('pdf'):
+            # The wait for each section is its extraction time, as seen by the scrape.
+            for section_title, content in metrics.timed_iter('pdf_section', sections):
+                if not content:
+                    continue
+                if section_title:
+                    yield f"Extracted section: {section_title}"
+                yield {
+                    "title": f"{display_name} - {section_title}" if section_title else display_name,
+                    "content": content, # PDF content is already text
+                    "content_type": "book",
+                    "source_url": "",
+                    "author": "",
+                    "user_id": ""
+                }
     except Exception as e:
         yield f"Could not process PDF {file_path}. Reason: {e}"
-    return items
 
-def run_scraper(sources, team_id="aline123"):
-    """Main scraping logic. Yields logs and individual JSON items."""
-    total_items_found = 0
-    for s in sources:
-        yield f"Scraping {s}..."
-        scraper_gen = None
-        if s.startswith('http://') or s.startswith('https://'):
-            scraper_gen = scrape_url(s)
-        elif os.path.isfile(s) and s.lower().endswith('.pdf'):
-            scraper_gen = scrape_pdf(s)
-        else:
-            yield f"Unsupported source type for {s}. Skipping."
-            continue
+def scrape_source(source, url_options=None, pdf_options=None):
+    """Scrapes one source of any supported type. Yields logs and items."""
+    yield f"Scraping {source}..."
+    if source.startswith('http://') or source.startswith('https://'):
+        scraper_gen = scrape_url(source, **(url_options or {}))
+    elif os.path.isfile(source) and source.lower().endswith('.pdf'):
+        scraper_gen = scrape_pdf(source, **(pdf_options or {}))
+    else:
+        yield f"Unsupported source type for {source}. Skipping."
+        return
 
-        if scraper_gen:
-            items = []
+    try:
+        with metrics.span('source'):
+            yield from scraper_gen
+    except Exception as e:
+        yield f"A critical error occurred while processing {source}: {e}"
+
+def scrape_sources_in_parallel(sources, max_workers, url_options=None, pdf_options=None):
+    """Scrapes several sources at once, each on its own worker thread.
+    Yields (source, event) pairs from all workers, merged in arrival order."""
+    events = queue.Queue(maxsize=1000)
+    stop = threading.Event()
+    done_marker = object()
+
+    def put(entry):
+        # Give up if the consumer went away, rather than blocking on a full queue forever.
+        while not stop.is_set():
             try:
-                while True:
-                    # This will yield logs from the sub-scraper
-                    yield next(scraper_gen)
-            except StopIteration as e:
-                # The generator returns the items when it's done.
-                items = e.value
-            except Exception as e:
-                yield f"A critical error occurred while processing {s}: {e}"
+                events.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
                 continue
-            
-            if items:
-                for item in items:
-                    # Yield each found item as its own JSON message
-                    yield f"___JSON_ITEM___{json.dumps(item)}"
-                    total_items_found += 1
+        return False
+
+    def worker(source):
+        source_gen = scrape_source(source, url_options, pdf_options)
+        try:
+            for event in source_gen:
+                if not put((source, event)):
+                    break
+        except Exception as e:
+            put((source, f"A critical error occurred while processing {source}: {e}"))
+        finally:
+            source_gen.close()
+            put((source, done_marker))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        for source in sources:
+            executor.submit(worker, source)
+        remaining = len(sources)
+        while remaining:
+            source, event = events.get()
+            if event is done_marker:
+                remaining -= 1
+                continue
+            yield source, event
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def run_scraper(sources, team_id="aline123", concurrency=DEFAULT_CONCURRENCY,
+                per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY, parallel_sources=1,
+                session=None, pool_size=DEFAULT_POOL_SIZE, cache_dir=DEFAULT_CACHE_DIR, cache_ttl=DEFAULT_CACHE_TTL,
+                host_rate=DEFAULT_HOST_RATE, retries=DEFAULT_RETRIES,
+                incremental=False, state_path=DEFAULT_STATE_PATH, state=None,
+                pdf_split='none', pdf_chunk_pages=DEFAULT_PDF_CHUNK_PAGES, pdf_cache_dir=None,
+                crawl_depth=DEFAULT_CRAWL_DEPTH, crawl_pages=DEFAULT_CRAWL_PAGES,
+                dedup_backend='memory', dedup_path=DEFAULT_DEDUP_PATH, structured=False):
+    """Main scraping logic. Yields logs and individual JSON items.
+    With structured=True, items are yielded as dicts instead of ___JSON_ITEM___ strings.
+    With parallel_sources > 1, that many sources are scraped at once and every log line is tagged with its source.
+    At most `concurrency` articles are fetched at once across all sources.
+    All sources share one pooled HTTP session; pass `session` to share it beyond this run.
+    Pages are cached under `cache_dir` (None disables the cache). Each host gets at most `host_rate`
+    requests per second (slower if its robots.txt or 429s ask for it), and failed requests are retried
+    up to `retries` times with backoff.
+    In incremental mode, only articles that are new or changed since the last run are yielded. They are
+    remembered once the consumer has taken every event, so stop early and the next run yields them again.
+    A consumer that stores items after taking them passes its own `state` store and commits it itself.
+    `pdf_split` streams PDFs as one item per 'chapter' or per chunk of 'pages' instead of one item per file;
+    with `pdf_cache_dir`, the sections of a PDF already extracted there are reused.
+    `crawl_depth` and `crawl_pages` bound the static crawl of each site's listing pages.
+    Articles are deduplicated across all sources by canonical URL and content; `dedup_backend`
+    'bloom' or 'disk' (stored at `dedup_path`) keeps memory flat on very large crawls."""
+    owns_session = session is None
+    if owns_session:
+        cache = ResponseCache(cache_dir, ttl=cache_ttl) if cache_dir else None
+        session = SessionManager(pool_size=pool_size, per_host_concurrency=per_host_concurrency, cache=cache,
+                                 host_rate=host_rate, retries=retries)
+    owns_state = state is None and incremental
+    if owns_state:
+        state = StateStore(state_path)
+    dedup = Deduplicator(dedup_backend, path=dedup_path)
+    for source in sources:
+        # Up front, so a syndicated copy is recognized whichever source gets to it first.
+        if source.startswith('http://') or source.startswith('https://'):
+            dedup.add_source(source)
+    # One fetch pool for the whole run, so `concurrency` caps article fetches however many sources run at once.
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        url_options = {'session': session, 'concurrency': concurrency, 'state': state,
+                       'crawl_depth': crawl_depth, 'crawl_pages': crawl_pages, 'dedup': dedup, 'executor': executor}
+        pdf_options = {'split': pdf_split, 'chunk_pages': pdf_chunk_pages, 'cache_dir': pdf_cache_dir}
+        with metrics.span('run'):
+            yield from _run_sources(sources, parallel_sources, url_options, pdf_options, structured)
+        if owns_state:
+            # Only reached once the consumer has asked for the event after the last one.
+            state.commit()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        dedup.close()
+        if owns_state:
+            state.close()
+        if owns_session:
+            session.close()
+            if session.cache:
+                session.cache.close()
+
+def _run_sources(sources, parallel_sources, url_options, pdf_options, structured=False):
+    """Scrapes every source and turns the resulting events into log lines and JSON item messages."""
+    if parallel_sources > 1 and len(sources) > 1:
+        tagged_events = scrape_sources_in_parallel(sources, parallel_sources, url_options, pdf_options)
+    else:
+        tagged_events = ((s, event) for s in sources for event in scrape_source(s, url_options, pdf_options))
+
+    total_items_found = 0
+    for source, event in tagged_events:
+        if isinstance(event, dict):
+            # Yield each found item as its own JSON message
+            yield event if structured else f"___JSON_ITEM___{json.dumps(event)}"
+            total_items_found += 1
+            metrics.count('items')
+        elif parallel_sources > 1:
+            yield f"[{source}] {event}"
+        else:
+            yield event
     
     yield f"Scraping complete. Found {total_items_found} total items. You can now download the results."
 
@@ -374,8 +511,36 @@ def main():
     parser = argparse.ArgumentParser(description="Scrape content from websites and PDFs into a knowledgebase format.")
     parser.add_argument("source", help="The URL of the website, path to a PDF file, or path to a CSV file of sources.")
     parser.add_argument("--team_id", default="aline123", help="The team ID for the knowledgebase.")
+    parser.add_argument("--output", help="Write items to this file as they are found: the knowledgebase JSON format for a .json path, JSON Lines otherwise.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum number of articles fetched at once.")
+    parser.add_argument("--per-host-concurrency", type=int, default=DEFAULT_PER_HOST_CONCURRENCY, help="Maximum number of articles fetched at once from a single host.")
+    parser.add_argument("--host-rate", type=float, default=DEFAULT_HOST_RATE, help="Maximum requests per second to a single host (0 for unlimited). robots.txt Crawl-delay and 429 responses slow it further.")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries for timeouts, connection errors and 429/5xx responses, with exponential backoff.")
+    parser.add_argument("--parallel-sources", type=int, default=1, help="Number of sources scraped at the same time.")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="Keep-alive HTTP connections kept open per host.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for the on-disk page cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the page cache.")
+    parser.add_argument("--cache-ttl", type=int, default=DEFAULT_CACHE_TTL, help="Seconds a cached page is used without revalidating it.")
+    parser.add_argument("--extract-workers", type=int, default=DEFAULT_EXTRACT_WORKERS, help="Processes used to extract article text (0 extracts on the fetching threads).")
+    parser.add_argument("--pdf-split", choices=PDF_SPLIT_MODES, default='none', help="Output a PDF as one item, one item per outline chapter, or one item per chunk of pages.")
+    parser.add_argument("--pdf-chunk-pages", type=int, default=DEFAULT_PDF_CHUNK_PAGES, help="Pages per parallel extraction task, and per item with --pdf-split pages.")
+    parser.add_argument("--max-browsers", type=int, default=DEFAULT_MAX_BROWSERS, help="Maximum number of headless Chrome instances running at once.")
+    parser.add_argument("--browser-max-pages", type=int, default=DEFAULT_MAX_PAGES_PER_BROWSER, help="Pages a browser serves before it is restarted.")
+    parser.add_argument("--crawl-depth", type=int, default=DEFAULT_CRAWL_DEPTH, help="Section links (category, tag, archive pages) followed from each site's start page. Pagination doesn't count.")
+    parser.add_argument("--crawl-pages", type=int, default=DEFAULT_CRAWL_PAGES, help="Maximum listing pages crawled per site, pagination included.")
+    parser.add_argument("--dedup", choices=DEDUP_BACKENDS, default='memory', help="How articles already found in this run are remembered: an exact in-memory set, a fixed-size bloom filter, or an on-disk set.")
+    parser.add_argument("--dedup-db", default=DEFAULT_DEDUP_PATH, help="SQLite file used by --dedup disk (default: a temporary file).")
+    parser.add_argument("--incremental", action="store_true", help="Only output articles that are new or changed since the last run. Needs --output.")
+    parser.add_argument("--state-db", default=DEFAULT_STATE_PATH, help="SQLite file that remembers articles between incremental runs.")
+    parser.add_argument("--profile", action="store_true", help="Print where the time went when the run ends: per-stage latency histograms and counters.")
     
     args = parser.parse_args()
+    if args.incremental and not args.output:
+        # The run's articles would be remembered as seen without having been kept anywhere.
+        parser.error("--incremental needs --output, or the articles found are skipped by later runs without ever being saved")
+    configure_logging(filemode='w')
+    configure_extraction_pool(args.extract_workers)
+    configure_browser_pool(args.max_browsers, args.browser_max_pages)
     source = args.source
     team_id = args.team_id
 
@@ -390,11 +555,34 @@ def main():
     else:
         sources_to_scrape.append(source)
     
-    # To see logs in console when running from command line
-    for log in run_scraper(sources_to_scrape, team_id=team_id):
-        # Don't print the JSON payload to the console, just the logs.
-        if not log.startswith('___JSON_ITEM___'):
-            print(log)
+    cache_dir = None if args.no_cache else args.cache_dir
+    # Items go straight to the output file, so memory stays flat however many are found.
+    writer = ResultWriter(args.output, team_id) if args.output else None
+    try:
+        for event in run_scraper(sources_to_scrape, team_id=team_id, concurrency=args.concurrency,
+                                 per_host_concurrency=args.per_host_concurrency, host_rate=args.host_rate, retries=args.retries,
+                                 parallel_sources=args.parallel_sources, pool_size=args.pool_size,
+                                 cache_dir=cache_dir, cache_ttl=args.cache_ttl,
+                                 incremental=args.incremental, state_path=args.state_db,
+                                 pdf_split=args.pdf_split, pdf_chunk_pages=args.pdf_chunk_pages,
+                                 pdf_cache_dir=os.path.join(cache_dir, 'pdf') if cache_dir else None,
+                                 crawl_depth=args.crawl_depth, crawl_pages=args.crawl_pages,
+                                 dedup_backend=args.dedup, dedup_path=args.dedup_db, structured=True):
+            if isinstance(event, dict):
+                if writer:
+                    writer.write(event)
+                    writer.flush()
+                continue
+            # To see logs in console when running from command line
+            print(event)
+    finally:
+        if writer:
+            writer.close()
+            print(f"Wrote {writer.count} items to {args.output}")
+        if args.profile:
+            print("\nProfile:")
+            for line in metrics.format_summary(metrics.snapshot()):
+                print(line)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,194 @@
+import json
+import re
+from contextlib import ExitStack, contextmanager
+from urllib.parse import urljoin, urlparse
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrics
+from browser_pool import get_browser_pool
+
+@contextmanager
+def get_driver(url):
+    """Leases a warm selenium driver from the shared browser pool and opens the given URL.
+    This is used to scrape JavaScript-driven websites that don't return static HTML."""
+    with ExitStack() as stack:
+        # Covers waiting for a free browser and starting Chrome when none is warm.
+        with metrics.span('browser_start'):
+            driver = stack.enter_context(get_browser_pool().lease())
+        with metrics.span('browser_load'):
+            try:
+                # Drop network events left over from the browser's previous lease.
+                driver.get_log('performance')
+            except Exception:
+                pass
+            driver.get(url)
+            try:
+                # Wait for body to be present, max 2 seconds.
+                WebDriverWait(driver, 2).until(
+                    EC.presence_of_element_located((By.TAG_NAME, "body"))
+                )
+            except Exception:
+                # If it times out, just continue. The page might be very slow or simple.
+                pass
+        yield driver
+
+# Collects every link-like value the rendered page knows about in one round trip:
+# href/data-* attributes, URLs inside onclick handlers, and embedded router/JSON state.
+HARVEST_LINKS_SCRIPT = r"""
+const links = [];
+for (const el of document.querySelectorAll('[href], [data-href], [data-url], [data-link], [onclick]')) {
+    for (const attr of ['href', 'data-href', 'data-url', 'data-link']) {
+        const value = el.getAttribute(attr);
+        if (value) links.push(value);
+    }
+    const onclick = el.getAttribute('onclick') || '';
+    for (const match of onclick.matchAll(/['"]((?:https?:\/\/|\/)[^'"\s]+)['"]/g)) links.push(match[1]);
+}
+const payloads = [];
+for (const script of document.querySelectorAll('script[type="application/json"], script[type="application/ld+json"]')) {
+    payloads.push(script.textContent);
+}
+for (const name of ['__NEXT_DATA__', '__NUXT__', '__APOLLO_STATE__', '__INITIAL_STATE__', '__remixContext']) {
+    try { if (window[name]) payloads.push(JSON.stringify(window[name])); } catch (e) {}
+}
+return {links: links, payloads: payloads};
+"""
+
+# Describes each clickable card: a link inside or around it, and its heading text for slug matching.
+DESCRIBE_CLICKABLES_SCRIPT = """
+return Array.from(document.querySelectorAll(arguments[0])).map(el => {
+    const anchor = el.closest('a[href]') || el.querySelector('a[href]');
+    const heading = el.querySelector('h1, h2, h3, h4');
+    const text = (heading ? heading.innerText : el.innerText || '').trim().split('\\n')[0];
+    return {href: anchor ? anchor.href : (el.getAttribute('data-href') || ''), text: text};
+});
+"""
+
+NON_ARTICLE_EXTENSIONS = ('.js', '.css', '.json', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.woff', '.woff2', '.xml', '.txt')
+
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+def urls_from_json(data, base_url, found):
+    """Walks a decoded JSON payload and collects anything that looks like a page URL or article slug."""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == 'slug' and isinstance(value, str) and value and '/' not in value.strip('/'):
+                found.add(urljoin(base_url.rstrip('/') + '/', value.strip('/')))
+            else:
+                urls_from_json(value, base_url, found)
+    elif isinstance(data, list):
+        for value in data:
+            urls_from_json(value, base_url, found)
+    elif isinstance(data, str) and len(data) < 500 and ' ' not in data:
+        if data.startswith(('http://', 'https://', '/')) and not data.startswith('//'):
+            if not urlparse(data).path.lower().endswith(NON_ARTICLE_EXTENSIONS):
+                found.add(urljoin(base_url, data))
+
+def json_payloads_from_network(driver):
+    """Returns the bodies of JSON responses the page fetched, read from Chrome's performance log."""
+    payloads = []
+    try:
+        entries = driver.get_log('performance')
+    except Exception:
+        return payloads
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+            if message.get('method') != 'Network.responseReceived':
+                continue
+            params = message['params']
+            if 'json' not in params['response'].get('mimeType', ''):
+                continue
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+            payloads.append(body.get('body', ''))
+        except Exception:
+            continue
+    return payloads
+
+def harvest_links(driver, url):
+    """Collects candidate URLs from the rendered DOM, embedded router state and captured JSON responses in one pass."""
+    harvested = driver.execute_script(HARVEST_LINKS_SCRIPT) or {}
+    found = set()
+    for link in harvested.get('links', []):
+        if not link.startswith(('javascript:', 'mailto:', 'tel:', '#')):
+            found.add(urljoin(url, link))
+    for payload in harvested.get('payloads', []) + json_payloads_from_network(driver):
+        try:
+            urls_from_json(json.loads(payload), url, found)
+        except (ValueError, TypeError):
+            continue
+    return found
+
+def discover_links_with_selenium(driver, url):
+    """Collects candidate article links from a rendered page, including JavaScript-driven ones.
+    Links are harvested in one pass from the DOM, router data and network JSON; clickable cards are
+    only clicked when none of those reveal their URL. Yields logs, returns the set of discovered URLs."""
+    article_urls_from_selenium = harvest_links(driver, url)
+    yield f"Harvested {len(article_urls_from_selenium)} links from the page, its router data and network responses."
+    
+    # SPAs (specifically quill.co) render article cards as clickable divs instead of links.
+    try:
+        article_elements_selector = "div[style*='cursor:pointer']"
+        WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, article_elements_selector))
+        )
+        
+        cards = driver.execute_script(DESCRIBE_CLICKABLES_SCRIPT, article_elements_selector)
+        yield f"Found {len(cards)} potential JavaScript-driven article links. Resolving URLs..."
+
+        # Resolve each card from a link it contains, or by matching its heading to a harvested slug.
+        # Empty slugs (the root URL, a card without text) would match each other, so they are left out.
+        harvested_by_slug = {}
+        for harvested_url in article_urls_from_selenium:
+            slug = urlparse(harvested_url).path.rstrip('/').rsplit('/', 1)[-1]
+            if slug:
+                harvested_by_slug[slug] = harvested_url
+        unresolved = []
+        for i, card in enumerate(cards):
+            slug = slugify(card.get('text', ''))
+            if card.get('href'):
+                article_urls_from_selenium.add(urljoin(url, card['href']))
+            elif slug and slug in harvested_by_slug:
+                continue
+            else:
+                unresolved.append(i)
+
+        if unresolved:
+            yield f"{len(unresolved)} cards could not be resolved without clicking. Discovering URLs..."
+
+        for i in unresolved:
+            # Re-find elements each time to avoid staleness
+            current_elements = driver.find_elements(By.CSS_SELECTOR, article_elements_selector)
+            if i >= len(current_elements):
+                break 
+            
+            element_to_click = current_elements[i]
+            
+            try:
+                driver.execute_script("arguments[0].scrollIntoView(true);", element_to_click)
+                element_to_click.click()
+            except Exception:
+                try:
+                    driver.execute_script("arguments[0].click();", element_to_click)
+                except Exception as js_click_error:
+                    yield f"Could not click element {i}. Skipping. Error: {js_click_error}"
+                    continue
+
+            WebDriverWait(driver, 10).until(lambda d: d.current_url != url)
+            discovered_url = driver.current_url
+            if discovered_url not in article_urls_from_selenium:
+                yield f"Discovered URL: {discovered_url}"
+                article_urls_from_selenium.add(discovered_url)
+            
+            driver.back()
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, article_elements_selector))
+            )
+    except Exception as e:
+        yield f"Could not execute JavaScript link discovery. Proceeding with harvested links. Reason: {e}"
+
+    return article_urls_from_selenium
@@ -0,0 +1,143 @@
+import xml.etree.ElementTree as ET
+import zlib
+from urllib.parse import urlparse, urlunparse
+
+# How deep nested <sitemapindex> files are followed.
+MAX_SITEMAP_DEPTH = 3
+
+# Tried, in order, when robots.txt doesn't list any sitemaps.
+DEFAULT_SITEMAP_PATHS = ('sitemap.xml', 'sitemap_index.xml')
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _child_text(element, name):
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip() or None
+    return None
+
+def sitemap_urls_from_robots(robots_txt):
+    """Returns the URLs listed on `Sitemap:` lines of a robots.txt file."""
+    urls = []
+    for line in robots_txt.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            urls.append(value.strip())
+    return urls
+
+def sitemaps_from_robots(session, url, log, timeout=2):
+    """Returns the sitemaps a site declares in its robots.txt, or [] if there are none.
+    The session reads robots.txt once per host and also takes its Crawl-delay from it."""
+    try:
+        sitemaps = sitemap_urls_from_robots(session.robots_txt(url, timeout=timeout))
+    except Exception as e:
+        log(f"Could not read robots.txt. Reason: {e}")
+        return []
+    if sitemaps:
+        log(f"Found {len(sitemaps)} sitemaps in robots.txt.")
+    return sitemaps
+
+def _decoded_chunks(chunks):
+    """Transparently gunzips .xml.gz sitemaps, detected by the gzip magic bytes."""
+    decompressor = None
+    head = b''
+    for chunk in chunks:
+        if decompressor is None:
+            # The magic number can be split across chunks; wait until both bytes are in.
+            head += chunk
+            if len(head) < 2:
+                continue
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if head[:2] == b'\x1f\x8b' else False
+            chunk, head = head, b''
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        if chunk:
+            yield chunk
+    if head:
+        yield head
+    if decompressor:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+def iter_sitemap_file(chunks):
+    """Incrementally parses one sitemap file.
+
+    Yields ('url', loc, lastmod) for <urlset> entries and ('sitemap', loc, lastmod) for
+    <sitemapindex> entries as soon as each element closes. Finished elements are
+    discarded, so memory stays constant no matter how many URLs the file lists.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in _decoded_chunks(chunks):
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            kind = _local_name(element.tag)
+            if kind in ('url', 'sitemap'):
+                loc = _child_text(element, 'loc')
+                if loc:
+                    yield kind, loc, _child_text(element, 'lastmod')
+                root.clear()
+    parser.close()
+
+def iter_sitemap_entries(session, sitemap_urls, log, timeout=2, max_depth=MAX_SITEMAP_DEPTH):
+    """Yields (loc, lastmod) for every page listed by the given sitemaps, following sitemap indexes.
+
+    Each file is downloaded whole to disk first (see SessionManager.stream), then parsed
+    incrementally from there, so page URLs are yielded at the caller's pace without a
+    connection waiting on it. Child sitemaps of an index are read after the index itself.
+    """
+    seen = set()
+    pending = [(sitemap_url, 0) for sitemap_url in sitemap_urls]
+    while pending:
+        sitemap_url, depth = pending.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        log(f"Reading sitemap: {sitemap_url}")
+        children = []
+        count = 0
+        try:
+            for kind, loc, lastmod in iter_sitemap_file(session.stream(sitemap_url, timeout=timeout)):
+                if kind == 'sitemap':
+                    children.append(loc)
+                else:
+                    count += 1
+                    yield loc, lastmod
+        except Exception as e:
+            log(f"Could not read sitemap {sitemap_url}. Reason: {e}")
+            continue
+        if children:
+            if depth + 1 > max_depth:
+                log(f"Sitemap index {sitemap_url} is nested too deeply. Skipping {len(children)} child sitemaps.")
+            else:
+                log(f"Sitemap index {sitemap_url} lists {len(children)} sitemaps.")
+                pending[:0] = [(child, depth + 1) for child in children]
+        else:
+            log(f"Sitemap {sitemap_url} listed {count} URLs.")
+
+def iter_site_entries(session, url, log, timeout=2):
+    """Yields (loc, lastmod) for a site's pages.
+
+    Uses the sitemaps declared in robots.txt; without any, tries the conventional
+    locations in order and stops at the first one that lists pages.
+    """
+    sitemap_urls = sitemaps_from_robots(session, url, log, timeout)
+    if sitemap_urls:
+        yield from iter_sitemap_entries(session, sitemap_urls, log, timeout)
+        return
+
+    parsed_url = urlparse(url)
+    for path in DEFAULT_SITEMAP_PATHS:
+        count = 0
+        candidate = urlunparse((parsed_url.scheme, parsed_url.netloc, path, '', '', ''))
+        for entry in iter_sitemap_entries(session, [candidate], log, timeout):
+            count += 1
+            yield entry
+        if count:
+            return
@@ -0,0 +1,88 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+DEFAULT_STATE_PATH = 'scrape_state.sqlite'
+
+def content_hash(item):
+    """Hashes the parts of an item that matter downstream, so re-scrapes can tell if it changed."""
+    digest = hashlib.sha256()
+    digest.update((item.get('title') or '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((item.get('content') or '').encode('utf-8'))
+    return digest.hexdigest()
+
+class StateStore:
+    """Remembers every article emitted by earlier runs, keyed by source_url.
+
+    Used by incremental mode: a sitemap <lastmod> that hasn't moved lets us skip
+    the fetch entirely, and an unchanged content hash keeps the item from being
+    emitted again.
+
+    Articles recorded during a run are only staged. Call `commit` once the run's items
+    are safely stored; a run that stops before that (cancelled, crashed, or whose
+    output was thrown away) leaves the remembered state as it was, so the next run
+    emits those articles again.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # Incremental jobs on different workers check and commit articles in this one file; WAL keeps
+        # their lookups from waiting on each other's commits.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                source_url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                lastmod TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            )
+        """)
+        # Per connection, so a worker that dies takes its uncommitted records with it.
+        self._db.execute("""
+            CREATE TEMP TABLE staged (
+                source_url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                lastmod TEXT,
+                seen REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def is_unchanged_since(self, source_url, lastmod):
+        """True if the article was already emitted and the sitemap reports the same <lastmod>."""
+        if not lastmod:
+            return False
+        with self._lock:
+            row = self._db.execute("SELECT lastmod FROM articles WHERE source_url = ?", (source_url,)).fetchone()
+        return row is not None and row[0] == lastmod
+
+    def record(self, item, lastmod=None):
+        """Stages the item's content hash until `commit`. Returns True if it is new or changed since the last run."""
+        source_url = item['source_url']
+        new_hash = content_hash(item)
+        with self._lock:
+            row = self._db.execute("SELECT content_hash FROM articles WHERE source_url = ?", (source_url,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO staged VALUES (?, ?, ?, ?)", (source_url, new_hash, lastmod, time.time()))
+            self._db.commit()
+        return row is None or row[0] != new_hash
+
+    def commit(self):
+        """Remembers every article staged since the last commit."""
+        with self._lock:
+            self._db.execute("""
+                INSERT OR REPLACE INTO articles
+                SELECT s.source_url, s.content_hash, COALESCE(s.lastmod, a.lastmod), COALESCE(a.first_seen, s.seen), s.seen
+                FROM staged s LEFT JOIN articles a ON a.source_url = s.source_url
+            """)
+            self._db.execute("DELETE FROM staged")
+            self._db.commit()
+
+    def close(self):
+        """Closes the store. Records not yet committed are dropped."""
+        with self._lock:
+            self._db.close()
@@ -1,103 +1,267 @@
-document.getElementById('scrape-form').addEventListener('submit', function(event) {
-    event.preventDefault();
+// The running scrape is remembered per tab, so a reload or a dropped connection reattaches to it.
+const JOB_STORAGE_KEY = 'scrapeJobId';
+// Only the newest lines stay in the page, so the log stays fast on crawls with tens of thousands of lines.
+const MAX_LOG_LINES = 5000;
+// Items are stored on the server; the page only keeps the first few to preview them.
+const PREVIEW_ITEMS = 20;
+// Consecutive failed chunks before an upload gives up; each retry resumes from the server's offset.
+const UPLOAD_RETRIES = 5;
 
-    const logs = document.getElementById('logs');
-    const outputContainer = document.getElementById('output-container');
-    const downloadLink = document.getElementById('download-link');
-    
-    logs.innerHTML = '';
-    outputContainer.style.display = 'none';
+// Appends log lines in batches, at most once per animation frame, instead of rewriting innerHTML per line.
+function createLogView(element) {
+    let pending = [];
+    let scheduled = false;
 
-    const urls = document.getElementById('urls').value.trim();
-    const pdfFile = document.getElementById('pdf_file').files[0];
+    function render() {
+        scheduled = false;
+        const atBottom = element.scrollTop + element.clientHeight >= element.scrollHeight - 20;
+        const fragment = document.createDocumentFragment();
+        for (const [level, text] of pending.slice(-MAX_LOG_LINES)) {
+            const line = document.createElement('div');
+            line.textContent = text;
+            if (level === 'warning' || level === 'error') {
+                line.className = 'log-' + level;
+            }
+            fragment.appendChild(line);
+        }
+        pending = [];
+        element.appendChild(fragment);
+        for (let excess = element.childNodes.length - MAX_LOG_LINES; excess > 0; excess--) {
+            element.removeChild(element.firstChild);
+        }
+        if (atBottom) {
+            element.scrollTop = element.scrollHeight;
+        }
+    }
 
-    if (!urls && !pdfFile) {
-        logs.innerHTML = 'Please enter URLs or select a PDF file.';
-        return;
+    return {
+        append: function(text, level) {
+            pending.push([level || 'info', text]);
+            // Background tabs don't get animation frames; don't let the backlog grow without bound.
+            if (pending.length > 2 * MAX_LOG_LINES) {
+                pending = pending.slice(-MAX_LOG_LINES);
+            }
+            if (!scheduled) {
+                scheduled = true;
+                requestAnimationFrame(render);
+            }
+        },
+        clear: function() {
+            pending = [];
+            element.textContent = '';
+        }
+    };
+}
+
+const logView = createLogView(document.getElementById('logs'));
+const supportsCompression = typeof DecompressionStream !== 'undefined';
+
+// A frame holds a batch of ['log', level, text] and ['item', {...}] events, optionally deflate-compressed.
+async function decodeFrame(frame) {
+    if (frame.compressed) {
+        const stream = new Blob([frame.data]).stream().pipeThrough(new DecompressionStream('deflate'));
+        return JSON.parse(await new Response(stream).text());
     }
+    return JSON.parse(new TextDecoder().decode(frame.data));
+}
 
-    if (pdfFile && urls) {
-        logs.innerHTML = 'Please provide either URLs or a PDF, not both.';
-        return;
+// Uploads a PDF in chunks and resolves with its pdf_id. A dropped chunk costs only that chunk:
+// the server reports how much it has, and the upload continues from there.
+async function uploadPdf(file) {
+    const response = await fetch('/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    const upload = await response.json();
+    if (!response.ok) {
+        throw new Error(upload.error);
     }
 
-    logs.innerHTML = 'Connecting to server...<br>';
-    const socket = io();
+    const uploadUrl = `/uploads/${upload.upload_id}`;
+    let offset = 0;
+    let failures = 0;
+    while (true) {
+        let status;
+        try {
+            const chunk = await fetch(`${uploadUrl}?offset=${offset}`, {
+                method: 'PUT',
+                body: file.slice(offset, offset + upload.chunk_size)
+            });
+            status = await chunk.json();
+            if (chunk.status === 409) {
+                // A response went missing and the server is elsewhere; continue from its offset.
+                status = await (await fetch(uploadUrl)).json();
+            } else if (!chunk.ok) {
+                const rejected = new Error(status.error);
+                rejected.final = true;
+                throw rejected;
+            }
+            failures = 0;
+        } catch (err) {
+            if (err.final || ++failures > UPLOAD_RETRIES) {
+                throw err;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            continue;
+        }
+        if (status.pdf_id) {
+            return status.pdf_id;
+        }
+        offset = status.received;
+    }
+}
 
-    socket.on('connect', function() {
-        logs.innerHTML += 'Connection established. Starting scrape...<br>';
-        
-        const scrapeParams = {
-            urls: urls
-        };
+function followScrape(socket, startScrape) {
+    const outputContainer = document.getElementById('output-container');
+    const downloadLink = document.getElementById('download-link');
 
-        if (pdfFile) {
-            // If we have a PDF, we must upload it first to get an ID
-            const fileFormData = new FormData();
-            fileFormData.append('pdf_file', pdfFile);
-            
-            fetch('/scrape_pdf', {
-                method: 'POST',
-                body: fileFormData
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.pdf_id) {
-                    scrapeParams.pdf_id = data.pdf_id;
-                    socket.emit('scrape_request', scrapeParams);
-                } else {
-                    logs.innerHTML += 'Error uploading PDF.<br>';
-                    socket.disconnect();
-                }
-            });
+    let jobId = sessionStorage.getItem(JOB_STORAGE_KEY);
+    let itemCount = 0;
+    let previewItems = [];
+    // Frames are decoded asynchronously; chaining keeps them in order. A reconnect starts a new
+    // generation, so frames still decoding from before it are dropped instead of duplicated.
+    let frames = Promise.resolve();
+    let generation = 0;
+
+    socket.on('connect', function() {
+        generation++;
+        jobId = sessionStorage.getItem(JOB_STORAGE_KEY);
+        if (jobId) {
+            // The server replays the job from the start, so begin from a clean slate.
+            logView.clear();
+            logView.append('Reattaching to running scrape...');
+            itemCount = 0;
+            previewItems = [];
+            socket.emit('attach_job', { job_id: jobId });
         } else {
-            socket.emit('scrape_request', scrapeParams);
+            logView.append('Connection established. Starting scrape...');
+            startScrape(socket);
         }
     });
 
-    let collectedItems = [];
+    socket.on('job_started', function(msg) {
+        jobId = msg.job_id;
+        sessionStorage.setItem(JOB_STORAGE_KEY, jobId);
+    });
 
-    socket.on('log_message', function(msg) {
-        logs.innerHTML += msg.data + '<br>';
-        logs.scrollTop = logs.scrollHeight;
+    socket.on('job_not_found', function() {
+        sessionStorage.removeItem(JOB_STORAGE_KEY);
+        logView.append('The previous scrape is no longer available.', 'warning');
+        socket.disconnect();
     });
 
-    socket.on('json_item', function(item) {
-        collectedItems.push(item);
+    socket.on('events', function(frame) {
+        const frameGeneration = generation;
+        frames = frames.then(() => decodeFrame(frame)).then(function(events) {
+            if (frameGeneration !== generation) {
+                return;
+            }
+            for (const event of events) {
+                if (event[0] === 'item') {
+                    itemCount++;
+                    if (previewItems.length < PREVIEW_ITEMS) {
+                        previewItems.push(event[1]);
+                    }
+                } else {
+                    logView.append(event[2], event[1]);
+                }
+            }
+        }).catch(function(err) {
+            logView.append(`Could not read results from the server: ${err.message}`, 'error');
+        });
+    });
+
+    socket.on('log_message', function(msg) {
+        logView.append(msg.data);
     });
 
     socket.on('scrape_complete', function(msg) {
-        logs.innerHTML += msg.data + '<br>';
-        logs.scrollTop = logs.scrollHeight;
-
-        // Assemble the final JSON and create the download link
-        if (collectedItems.length > 0) {
-            const finalJson = {
-                team_id: "aline123",
-                items: collectedItems
-            };
-            const jsonString = JSON.stringify(finalJson, null, 2);
-            
-            // Display the JSON
-            const jsonOutput = document.getElementById('json-output');
-            jsonOutput.textContent = jsonString;
-
-            // Create download link
-            const blob = new Blob([jsonString], { type: 'application/json' });
-            const url = window.URL.createObjectURL(blob);
-            downloadLink.href = url;
-            outputContainer.style.display = 'block';
-        } else {
-            logs.innerHTML += 'No items were found to download.<br>';
-        }
-        socket.disconnect();
+        frames.then(function() {
+            sessionStorage.removeItem(JOB_STORAGE_KEY);
+            logView.append(msg.data);
+
+            // The full output is streamed from the server's result store; show a preview here.
+            if (itemCount > 0) {
+                let preview = JSON.stringify(previewItems, null, 2);
+                if (itemCount > previewItems.length) {
+                    preview += `\n\n... and ${itemCount - previewItems.length} more items in the download.`;
+                }
+                const jsonOutput = document.getElementById('json-output');
+                jsonOutput.textContent = preview;
+
+                downloadLink.href = `/results/${jobId}.json`;
+                downloadLink.textContent = `Download output.json (${itemCount} items)`;
+                outputContainer.style.display = 'block';
+            } else {
+                logView.append('No items were found to download.');
+            }
+            socket.disconnect();
+        });
     });
 
     socket.on('disconnect', function() {
-        logs.innerHTML += 'Disconnected from server.<br>';
+        logView.append('Disconnected from server.');
     });
 
     socket.on('connect_error', (err) => {
-        logs.innerHTML += `Connection failed: ${err.message}. Please check the server and refresh the page.`;
+        logView.append(`Connection failed: ${err.message}. Please check the server and refresh the page.`, 'error');
     });
-}); 
\ No newline at end of file
+}
+
+document.getElementById('scrape-form').addEventListener('submit', function(event) {
+    event.preventDefault();
+
+    const outputContainer = document.getElementById('output-container');
+
+    logView.clear();
+    outputContainer.style.display = 'none';
+
+    const urls = document.getElementById('urls').value.trim();
+    const pdfFiles = Array.from(document.getElementById('pdf_file').files);
+    const logLevel = document.getElementById('log_level').value;
+
+    if (!urls && !pdfFiles.length) {
+        logView.append('Please enter URLs or select a PDF file.');
+        return;
+    }
+
+    if (pdfFiles.length && urls) {
+        logView.append('Please provide either URLs or a PDF, not both.');
+        return;
+    }
+
+    // A new scrape replaces any earlier one this tab was following.
+    sessionStorage.removeItem(JOB_STORAGE_KEY);
+    logView.append('Connecting to server...');
+    const socket = io();
+
+    followScrape(socket, function(socket) {
+        const scrapeParams = {
+            urls: urls,
+            log_level: logLevel,
+            compress: supportsCompression
+        };
+
+        if (pdfFiles.length) {
+            // PDFs are uploaded first, side by side, to get their IDs
+            logView.append(`Uploading ${pdfFiles.length} PDF file(s)...`);
+            Promise.all(pdfFiles.map(uploadPdf))
+            .then(pdfIds => {
+                scrapeParams.pdf_ids = pdfIds;
+                socket.emit('scrape_request', scrapeParams);
+            })
+            .catch(err => {
+                logView.append(`Error uploading PDF: ${err.message}`, 'error');
+                socket.disconnect();
+            });
+        } else {
+            socket.emit('scrape_request', scrapeParams);
+        }
+    });
+});
+
+// Pick a scrape back up after a page reload.
+if (sessionStorage.getItem(JOB_STORAGE_KEY)) {
+    followScrape(io(), function() {});
+}
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from browser_pool import BrowserPool, BrowserSlots
+
+class FakeDriver:
+    launched = 0
+
+    def __init__(self):
+        FakeDriver.launched += 1
+        self.quit_called = False
+
+    def execute_script(self, script):
+        return 1
+
+    def delete_all_cookies(self):
+        pass
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+def test_idle_browser_is_reused():
+    pool = BrowserPool(max_size=1, factory=FakeDriver)
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        pass
+    assert first is second
+    pool.close()
+    assert first.quit_called
+
+def test_shared_slots_cap_browsers_across_pools(tmp_path):
+    slots = BrowserSlots(str(tmp_path), count=1)
+    # Two pools stand in for two job workers sharing one browser.
+    first_pool = BrowserPool(max_size=1, factory=FakeDriver, shared_slots=slots, idle_timeout=0.2)
+    second_pool = BrowserPool(max_size=1, factory=FakeDriver, shared_slots=BrowserSlots(str(tmp_path), count=1))
+    leased = threading.Event()
+
+    with first_pool.lease() as first:
+        def lease_second():
+            with second_pool.lease():
+                leased.set()
+        thread = threading.Thread(target=lease_second)
+        thread.start()
+        time.sleep(0.3)
+        assert not leased.is_set()
+    # The first browser is idle now, and still holds the slot until it is quit.
+    assert leased.wait(5)
+    thread.join()
+    assert first.quit_called
+    first_pool.close()
+    second_pool.close()
+
+def test_failed_launch_releases_its_slot(tmp_path):
+    def broken_factory():
+        raise RuntimeError("no chrome")
+
+    slots = BrowserSlots(str(tmp_path), count=1)
+    pool = BrowserPool(factory=broken_factory, shared_slots=slots)
+    for _ in range(2):
+        try:
+            with pool.lease():
+                pass
+        except RuntimeError:
+            pass
+    slots.release(slots.acquire())
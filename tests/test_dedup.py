@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from dedup import Deduplicator, canonical_url, DEDUP_BACKENDS
+from fixture_site import FixtureServer, index_site
+
+def item(url, content="Body", title="Title"):
+    return {"title": title, "content": content, "source_url": url}
+
+@pytest.mark.parametrize("url,expected", [
+    ("http://www.Example.com/post/", "https://example.com/post"),
+    ("https://example.com:443//a//b/#top", "https://example.com/a/b"),
+    ("https://example.com:8080/a", "https://example.com:8080/a"),
+    ("https://example.com/a?utm_source=x&b=2&a=1&fbclid=y", "https://example.com/a?a=1&b=2"),
+    ("https://example.com", "https://example.com/"),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+@pytest.mark.parametrize("backend", DEDUP_BACKENDS)
+def test_claim_url_once(backend):
+    dedup = Deduplicator(backend)
+    assert dedup.claim_url("https://example.com/post-a")
+    assert not dedup.claim_url("http://www.example.com/post-a/")
+    dedup.close()
+
+def test_same_content_is_a_duplicate():
+    dedup = Deduplicator()
+    assert dedup.claim_article(item("https://example.com/a"))
+    assert not dedup.claim_article(item("https://mirror.example.org/a"))
+
+def test_canonical_alias_of_claimed_page_is_a_duplicate():
+    dedup = Deduplicator()
+    # Article URLs are claimed when they are discovered, before they are fetched.
+    assert dedup.claim_url("https://example.com/post-a")
+    assert dedup.claim_article(item("https://example.com/post-a", "Original"))
+    # An AMP copy with different markup points back at the original.
+    assert not dedup.claim_article(item("https://example.com/amp/post-a", "Original, AMP"),
+                                   "https://example.com/post-a")
+
+@pytest.mark.parametrize("canonical", [
+    "/",
+    "https://example.com/",
+    "https://example.com/blog/",
+    "https://example.com/category/news/",
+    "https://example.com/blog/page/2/",
+    "https://other.example.org/post-a",
+])
+def test_shared_canonical_is_not_an_alias(canonical):
+    dedup = Deduplicator()
+    for number in range(5):
+        url = f"https://example.com/post-{number}"
+        target = canonical if canonical.startswith('http') else "https://example.com" + canonical
+        assert dedup.claim_article(item(url, f"Body {number}"), target)
+
+def test_syndicated_copy_of_another_source_is_a_duplicate():
+    dedup = Deduplicator()
+    dedup.add_source("https://original.example.org/blog/")
+    assert dedup.claim_article(item("https://example.com/reposted", "Reposted with an intro"),
+                               "https://www.original.example.org/2024/post-a/")
+    # The original, found later by its own source, is the same article.
+    assert not dedup.claim_url("https://original.example.org/2024/post-a")
+    # Its start page and home page are still shared canonicals, not aliases.
+    for number, canonical in enumerate(("https://original.example.org/blog/", "https://original.example.org/")):
+        assert dedup.claim_article(item(f"https://example.com/post-{number}", f"Body {number}"), canonical)
+
+def test_canonical_at_listing_page_is_not_an_alias():
+    dedup = Deduplicator()
+    dedup.add_listing_url("https://example.com/latest")
+    for number in range(3):
+        assert dedup.claim_article(item(f"https://example.com/post-{number}", f"Body {number}"),
+                                   "https://example.com/latest/")
+
+def test_articles_sharing_the_home_page_canonical_are_all_found():
+    import scraper
+
+    pages = index_site(5)
+    for path, (content_type, body) in pages.items():
+        pages[path] = (content_type, body.replace(f'<link rel="canonical" href="{path}">', '<link rel="canonical" href="/">'))
+    server = FixtureServer(pages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        events = list(scraper.run_scraper([server.base_url + '/'], cache_dir=None, host_rate=0, structured=True))
+    finally:
+        server.shutdown()
+    items = [event for event in events if isinstance(event, dict)]
+    assert len(items) == 5
+    assert not [event for event in events if isinstance(event, str) and event.startswith("Duplicate")]
@@ -0,0 +1,46 @@
+import time
+
+from events import FrameBatcher, decode_frame, log_level
+
+def test_log_level():
+    assert log_level("FATAL: boom") == 'error'
+    assert log_level("[https://example.com] Processing link: https://example.com/a") == 'debug'
+    assert log_level("Could not process link https://example.com/a") == 'warning'
+    assert log_level("Found 3 links") == 'info'
+
+def test_frame_round_trip():
+    for compress in (True, False):
+        batcher = FrameBatcher(compress=compress)
+        batcher.add("Found 3 links")
+        batcher.add({"title": "A"})
+        data, compressed = batcher.flush()
+        assert compressed == compress
+        assert decode_frame(data, compressed) == [['log', 'info', "Found 3 links"], ['item', {"title": "A"}]]
+        assert batcher.flush() is None
+
+def test_logs_below_min_level_are_dropped():
+    batcher = FrameBatcher(min_level='warning', compress=False)
+    batcher.add("Processing link: https://example.com/a")
+    batcher.add("Found 3 links")
+    assert batcher.flush() is None
+    batcher.add("Could not process link https://example.com/a")
+    assert len(decode_frame(*batcher.flush())) == 1
+
+def test_flushes_at_event_and_byte_bounds():
+    batcher = FrameBatcher(max_events=3, max_age=60)
+    assert not batcher.add("one")
+    assert not batcher.add("two")
+    assert batcher.add("three")
+    batcher.flush()
+    batcher = FrameBatcher(max_bytes=100, max_age=60)
+    assert batcher.add("x" * 100)
+
+def test_frame_is_due_by_age_without_new_events():
+    batcher = FrameBatcher(max_age=0.05)
+    assert batcher.time_left() is None
+    batcher.add("Initializing web driver...")
+    assert 0 < batcher.time_left() <= 0.05
+    assert not batcher.ready()
+    time.sleep(0.06)
+    assert batcher.time_left() == 0
+    assert batcher.ready()
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+import trafilatura
+
+from extraction import extract_article
+
+BLOG_PAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures', 'blog_pages')
+
+def read_page(name):
+    with open(os.path.join(BLOG_PAGES, name), encoding='utf-8') as f:
+        return f.read()
+
+@pytest.mark.parametrize("name", sorted(os.listdir(BLOG_PAGES)))
+def test_extracts_as_much_text_as_trafilatura_extract(name):
+    page = read_page(name)
+    article = extract_article(page)
+    # Markdown and comment formatting may differ by a few characters, not by whole comment threads.
+    assert abs(article["text_length"] - len(trafilatura.extract(page))) <= 0.01 * article["text_length"]
+
+def test_comments_follow_the_body():
+    page = read_page('substack_post.html')
+    document = trafilatura.bare_extraction(trafilatura.load_html(page), include_formatting=True)
+    assert document.comments
+    assert extract_article(page)["content"].endswith(document.comments)
+
+def test_page_without_content():
+    assert extract_article("<html><head><title>Empty</title></head><body></body></html>") == {}
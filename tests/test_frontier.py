@@ -0,0 +1,37 @@
+from bs4 import BeautifulSoup
+
+from frontier import is_pagination_url, is_section_url, listing_links
+
+def test_is_pagination_url():
+    assert is_pagination_url("https://example.com/blog/page/2")
+    assert is_pagination_url("https://example.com/blog/page/2/")
+    assert is_pagination_url("https://example.com/blog/?page=3")
+    assert is_pagination_url("https://example.com/?cat=1&paged=4")
+    assert not is_pagination_url("https://example.com/blog/page-two")
+    assert not is_pagination_url("https://example.com/blog/?pages=3")
+    assert not is_pagination_url("https://blog.example.com/?p=1234")
+    assert not is_pagination_url("https://example.com/blog/2024/how-we-paged-the-team")
+
+def test_is_section_url():
+    assert is_section_url("https://example.com/blog/")
+    assert is_section_url("https://example.com/category/engineering")
+    assert is_section_url("https://example.com/tags/python/")
+    assert not is_section_url("https://example.com/")
+    assert not is_section_url("https://example.com/blog/my-first-post")
+    assert not is_section_url("https://example.com/category")
+
+def test_listing_links():
+    soup = BeautifulSoup("""
+        <html><head><link rel="next" href="/blog/page/2"><link rel="stylesheet" href="/style.css"></head><body>
+        <a href="/blog/my-first-post">My first post</a>
+        <a href="/category/engineering#top">Engineering</a>
+        <a href="?page=3">3</a>
+        <a href="/archive/older-stuff">Older posts</a>
+        <a href="https://example.com/about">About</a>
+        </body></html>""", 'html.parser')
+    assert list(listing_links(soup, "https://example.com/blog/")) == [
+        ("https://example.com/blog/page/2", True),
+        ("https://example.com/category/engineering", False),
+        ("https://example.com/blog/?page=3", True),
+        ("https://example.com/archive/older-stuff", True),
+    ]
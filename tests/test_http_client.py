@@ -0,0 +1,137 @@
+from email.utils import formatdate
+
+import pytest
+import requests
+
+import http_client
+from http_client import (BACKOFF_CAP, HostScheduler, SessionManager, backoff_delay, crawl_delay_from_robots,
+                         retry_after_seconds)
+
+class FakeClock:
+    """Stands in for the time module, so pacing and backoff can be checked without sleeping."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1_700_000_000 + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_client, 'time', clock)
+    return clock
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+def test_retry_after_seconds(clock):
+    assert retry_after_seconds(FakeResponse(429, {'Retry-After': '12'})) == 12
+    assert retry_after_seconds(FakeResponse(429, {'Retry-After': '-3'})) == 0
+    date = formatdate(clock.time() + 30, usegmt=True)
+    assert retry_after_seconds(FakeResponse(503, {'Retry-After': date})) == pytest.approx(30)
+    past = formatdate(clock.time() - 30, usegmt=True)
+    assert retry_after_seconds(FakeResponse(503, {'Retry-After': past})) == 0
+    assert retry_after_seconds(FakeResponse(503, {'Retry-After': 'soon'})) is None
+    assert retry_after_seconds(FakeResponse(503)) is None
+    assert retry_after_seconds(None) is None
+
+def test_crawl_delay_applies_to_the_wildcard_group_only():
+    robots = "User-agent: Googlebot\nCrawl-delay: 10\n\nUser-agent: *\nDisallow: /admin\nCrawl-delay: 2.5\n"
+    assert crawl_delay_from_robots(robots) == 2.5
+    # Consecutive User-agent lines share one group.
+    assert crawl_delay_from_robots("User-agent: bingbot\nUser-agent: *\nCrawl-delay: 4 # be nice\n") == 4
+    assert crawl_delay_from_robots("User-agent: *\nDisallow:\nUser-agent: bingbot\nCrawl-delay: 9\n") == 0
+    assert crawl_delay_from_robots("User-agent: *\nCrawl-delay: 3600\n") == http_client.MAX_CRAWL_DELAY
+    assert crawl_delay_from_robots("User-agent: *\nCrawl-delay: slow\n") == 0
+    assert crawl_delay_from_robots("") == 0
+
+def test_backoff_grows_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: high)
+    assert [backoff_delay(attempt) for attempt in range(8)] == [0.5, 1, 2, 4, 8, 16, BACKOFF_CAP, BACKOFF_CAP]
+    monkeypatch.undo()
+    assert all(0 <= backoff_delay(10) <= BACKOFF_CAP for _ in range(100))
+
+def test_requests_to_a_host_are_spaced_out(clock):
+    scheduler = HostScheduler(limit=4, rate=2)
+    starts = []
+    for url in ('https://a.example/1', 'https://a.example/2', 'https://b.example/1', 'https://a.example/3'):
+        with scheduler.slot(url):
+            starts.append(clock.now - 1000)
+    # b.example has its own schedule.
+    assert starts == [0, 0.5, 0.5, 1.0]
+
+def test_throttling_slows_a_host_and_success_speeds_it_back_up(clock):
+    scheduler = HostScheduler(limit=1, rate=10)
+    url = 'https://a.example/'
+    scheduler.throttled(url, 5)
+    assert scheduler.host(url).interval == http_client.BACKOFF_BASE
+    with scheduler.slot(url):
+        assert clock.now == 1005
+    for _ in range(50):
+        scheduler.observe(url, 0.1)
+    assert scheduler.host(url).interval == pytest.approx(0.1)
+    scheduler.set_crawl_delay(url, 2)
+    for _ in range(50):
+        scheduler.observe(url, 0.1)
+    assert scheduler.host(url).interval == 2
+
+class FakeHTTP:
+    """Answers GETs from a script of responses and exceptions."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def get(self, url, timeout, **kwargs):
+        self.calls += 1
+        outcome = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+def session_with(clock, script, retries=3):
+    manager = SessionManager(host_rate=0, retries=retries)
+    manager._session = FakeHTTP(script)
+    # robots.txt already read, so only the scripted requests are sent.
+    manager._robots['a.example'] = ('', clock.monotonic())
+    return manager
+
+def test_retries_until_success(clock, monkeypatch):
+    monkeypatch.setattr(http_client.random, 'uniform', lambda low, high: high)
+    manager = session_with(clock, [requests.ConnectionError("reset"), FakeResponse(500), FakeResponse(200)])
+    assert manager.get('https://a.example/post', timeout=2).status_code == 200
+    assert manager.session.calls == 3
+    assert clock.sleeps == [0.5, 1]
+
+def test_gives_up_after_max_retries(clock):
+    manager = session_with(clock, [FakeResponse(502)], retries=2)
+    assert manager.get('https://a.example/post', timeout=2).status_code == 502
+    assert manager.session.calls == 3
+    manager = session_with(clock, [requests.Timeout("slow")], retries=2)
+    with pytest.raises(requests.Timeout):
+        manager.get('https://a.example/post', timeout=2)
+    assert manager.session.calls == 3
+
+def test_retry_after_pauses_the_host(clock):
+    manager = session_with(clock, [FakeResponse(429, {'Retry-After': '7'}), FakeResponse(200)])
+    started = clock.now
+    assert manager.get('https://a.example/post', timeout=2).status_code == 200
+    assert clock.now - started == 7
+    # A Retry-After longer than we are willing to wait ends the request at once.
+    manager = session_with(clock, [FakeResponse(503, {'Retry-After': str(http_client.MAX_RETRY_AFTER + 1)})])
+    assert manager.get('https://a.example/post', timeout=2).status_code == 503
+    assert manager.session.calls == 1
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import jobs
+import scraper
+from events import decode_frame
+
+def stalled_scraper(release):
+    def run_scraper(sources, **options):
+        yield "Initializing web driver..."
+        # A Selenium page load that takes a long time.
+        release.wait(10)
+        yield {"title": "Late", "content": "Body", "source_url": sources[0]}
+    return run_scraper
+
+def frame_events(queue, job_id):
+    return [event for _, compressed, data in queue.frames(job_id) for event in decode_frame(data, bool(compressed))]
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+def start_job(tmp_path, monkeypatch, release):
+    monkeypatch.setattr(scraper, 'run_scraper', stalled_scraper(release))
+    queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite'))
+    job_id = queue.submit(["https://example.com"])
+    job = queue.claim(1)
+    thread = threading.Thread(target=jobs.run_job, args=(queue, *job, None), kwargs={'results_dir': str(tmp_path)})
+    thread.start()
+    return queue, job_id, thread
+
+def test_pending_events_are_sent_while_the_scraper_is_stalled(tmp_path, monkeypatch):
+    release = threading.Event()
+    queue, job_id, thread = start_job(tmp_path, monkeypatch, release)
+    try:
+        wait_for(lambda: frame_events(queue, job_id), timeout=1)
+        assert frame_events(queue, job_id) == [['log', 'info', "Initializing web driver..."]]
+    finally:
+        release.set()
+        thread.join()
+    assert queue.status(job_id) == jobs.DONE
+    assert frame_events(queue, job_id)[-1][0] == 'item'
+
+def test_cancellation_is_noticed_while_the_scraper_is_stalled(tmp_path, monkeypatch):
+    release = threading.Event()
+    queue, job_id, thread = start_job(tmp_path, monkeypatch, release)
+    try:
+        queue.cancel(job_id)
+        wait_for(lambda: queue.status(job_id) == jobs.CANCELLED, timeout=jobs.CANCEL_CHECK_INTERVAL + 2)
+        assert frame_events(queue, job_id)[-1] == ['log', 'info', "Scrape cancelled."]
+    finally:
+        release.set()
+        thread.join()
+    assert not [event for event in frame_events(queue, job_id) if event[0] == 'item']
+
+def test_purge_deletes_expired_jobs_and_results(tmp_path):
+    from results import ResultWriter, purge_results, result_path
+
+    queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite'))
+    finished, queued = queue.submit(["https://example.com/a"]), queue.submit(["https://example.com/b"])
+    queue.claim(1)
+    queue.append_frame(finished, 0, (b'[]', False))
+    queue.finish(finished, jobs.DONE)
+    ResultWriter(result_path(str(tmp_path), finished)).close()
+
+    queue.purge(max_age=-1)
+    purge_results(str(tmp_path), max_age=-1)
+    assert queue.status(finished) is None
+    assert queue.frames(finished) == []
+    assert queue.status(queued) == jobs.QUEUED
+    assert not (tmp_path / f"{finished}.jsonl").exists()
+
+def test_incremental_state_is_committed_only_when_the_job_is_done(tmp_path, monkeypatch):
+    from state_store import StateStore
+
+    item = {"title": "A", "content": "Body", "source_url": "https://example.com/a"}
+    release = threading.Event()
+
+    def run_scraper(sources, state=None, **options):
+        state.record(item)
+        yield item
+        release.wait(10)
+        yield "Scraping complete."
+
+    monkeypatch.setattr(scraper, 'run_scraper', run_scraper)
+    state_path = str(tmp_path / 'state.sqlite')
+    queue = jobs.JobQueue(str(tmp_path / 'jobs.sqlite'))
+    for cancel in (True, False):
+        job_id = queue.submit(["https://example.com"], {'incremental': True, 'state_path': state_path})
+        thread = threading.Thread(target=jobs.run_job, args=(queue, *queue.claim(1), None),
+                                  kwargs={'results_dir': str(tmp_path)})
+        thread.start()
+        if cancel:
+            queue.cancel(job_id)
+            wait_for(lambda: queue.status(job_id) == jobs.CANCELLED, timeout=jobs.CANCEL_CHECK_INTERVAL + 2)
+        release.set()
+        thread.join()
+        release.clear()
+        state = StateStore(state_path)
+        # A cancelled job's article is still new to the next run; a finished job's isn't.
+        assert state.record(item) == cancel
+        state.close()
@@ -0,0 +1,54 @@
+import fitz
+
+from fixture_site import write_pdf
+from pdf_extraction import iter_cached_pdf_sections, plan_sections
+
+class FakeDocument:
+    def __init__(self, page_count, toc):
+        self.page_count = page_count
+        self.toc = toc
+
+    def get_toc(self, simple=True):
+        return self.toc
+
+def test_plan_sections_by_chapter(tmp_path):
+    with fitz.open(write_pdf(str(tmp_path / 'book.pdf'), 45)) as doc:
+        assert plan_sections(doc, 'chapter', 25) == [("Chapter 1", 0, 20), ("Chapter 2", 20, 40), ("Chapter 3", 40, 45)]
+        assert plan_sections(doc, 'pages', 25) == [("Pages 1-25", 0, 25), ("Pages 26-45", 25, 45)]
+        assert plan_sections(doc, 'none', 25) == [(None, 0, 45)]
+
+def test_plan_sections_outline_edge_cases():
+    # Unsorted chapters, front matter, nested entries, an entry past the end and two chapters on one page.
+    doc = FakeDocument(30, [[1, " Two ", 20], [1, "One", 5], [2, "One.1", 8], [1, "Ghost", 99], [1, "Empty", 20]])
+    assert plan_sections(doc, 'chapter', 10) == [("Front matter", 0, 4), ("One", 4, 19), ("Empty", 19, 30)]
+
+def test_plan_sections_without_outline_falls_back_to_pages():
+    assert plan_sections(FakeDocument(7, []), 'chapter', 3) == [("Pages 1-3", 0, 3), ("Pages 4-6", 3, 6), ("Pages 7-7", 6, 7)]
+
+def test_cached_sections_are_read_back(tmp_path, monkeypatch):
+    import pdf_extraction
+
+    path = write_pdf(str(tmp_path / 'book.pdf'), 3)
+    calls = []
+    monkeypatch.setattr(pdf_extraction, 'iter_pdf_sections',
+                        lambda file_path, **options: calls.append(file_path) or iter([("Pages 1-3", "text")]))
+    cache_dir = str(tmp_path / 'sections')
+    first = list(iter_cached_pdf_sections(path, split='pages', cache_dir=cache_dir))
+    second = list(iter_cached_pdf_sections(path, split='pages', cache_dir=cache_dir))
+    assert first == second == [("Pages 1-3", "text")]
+    assert calls == [path]
+
+def test_two_pdfs_at_once_with_extraction_inline(tmp_path):
+    import extraction
+    import scraper
+
+    paths = [write_pdf(str(tmp_path / f'book{seed}.pdf'), 60, seed=seed) for seed in range(2)]
+    workers = extraction.extraction_worker_count()
+    extraction.configure_extraction_pool(0)
+    try:
+        events = list(scraper.run_scraper(paths, parallel_sources=2, cache_dir=None, pdf_split='pages',
+                                          pdf_chunk_pages=5, structured=True))
+    finally:
+        extraction.configure_extraction_pool(workers)
+    assert not [event for event in events if isinstance(event, str) and "Could not process PDF" in event]
+    assert len([event for event in events if isinstance(event, dict)]) == 24
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+
+import response_cache
+from response_cache import ResponseCache
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+        self.headers = {'ETag': '"v1"'}
+        self.encoding = 'utf-8'
+
+def distinct_size(cache):
+    return cache._db.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)"
+    ).fetchone()[0]
+
+def test_total_counts_shared_bodies_once(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    cache.store('https://example.com/a', FakeResponse(b'x' * 100))
+    cache.store('https://example.com/b', FakeResponse(b'x' * 100))
+    cache.store('https://example.com/c', FakeResponse(b'y' * 50))
+    assert cache.total_bytes() == 150 == distinct_size(cache)
+    # Replacing a body drops the old one once nothing points at it.
+    cache.store('https://example.com/c', FakeResponse(b'z' * 70))
+    assert cache.total_bytes() == 170 == distinct_size(cache)
+    cache.store('https://example.com/a', FakeResponse(b'w' * 10))
+    assert cache.total_bytes() == 180 == distinct_size(cache)
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=300)
+    for name in 'abc':
+        cache.store(f'https://example.com/{name}', FakeResponse(name.encode() * 100))
+    assert cache.lookup('https://example.com/a') is not None
+    cache.store('https://example.com/d', FakeResponse(b'd' * 100))
+    assert cache.lookup('https://example.com/b') is None
+    for name in 'acd':
+        assert cache.lookup(f'https://example.com/{name}').read() == name.encode() * 100
+    assert cache.total_bytes() == 300 == distinct_size(cache)
+    assert len([path for path in (tmp_path / 'objects').rglob('*') if path.is_file()]) == 3
+
+def test_evicts_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, 'EVICT_BATCH', 2)
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    for i in range(10):
+        cache.store(f'https://example.com/{i}', FakeResponse(bytes([i]) * 100))
+    cache.max_bytes = 250
+    cache.store('https://example.com/new', FakeResponse(b'n' * 100))
+    remaining = [url for (url,) in cache._db.execute("SELECT url FROM entries ORDER BY accessed_at")]
+    assert remaining == ['https://example.com/9', 'https://example.com/new']
+    assert cache.total_bytes() == 200 == distinct_size(cache)
+
+def test_total_is_rebuilt_for_an_existing_index(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    cache.store('https://example.com/a', FakeResponse(b'a' * 40))
+    cache.store('https://example.com/b', FakeResponse(b'a' * 40))
+    cache.store('https://example.com/c', FakeResponse(b'c' * 60))
+    cache.close()
+    db = sqlite3.connect(str(tmp_path / 'index.sqlite'))
+    db.execute("DROP TABLE meta")
+    db.execute("DROP TABLE objects")
+    db.commit()
+    db.close()
+    reopened = ResponseCache(str(tmp_path), max_bytes=10_000)
+    assert reopened.total_bytes() == 100
+
+def test_missing_body_is_forgotten(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    entry = cache.store('https://example.com/a', FakeResponse(b'a' * 40))
+    os.remove(entry.path)
+    assert cache.lookup('https://example.com/a') is None
+    assert cache.total_bytes() == 0
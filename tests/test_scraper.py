@@ -0,0 +1,42 @@
+import threading
+import time
+
+import scraper
+from fixture_site import FixtureServer, index_site, paginated_site
+
+def serve(pages):
+    server = FixtureServer(pages)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def test_concurrency_caps_fetches_across_parallel_sources(monkeypatch):
+    servers = [serve(index_site(6)), serve(paginated_site(6))]
+    lock = threading.Lock()
+    in_flight = {'now': 0, 'max': 0}
+    fetch_article = scraper.fetch_article
+
+    def counting_fetch_article(*args):
+        with lock:
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        try:
+            time.sleep(0.02)
+            return fetch_article(*args)
+        finally:
+            with lock:
+                in_flight['now'] -= 1
+
+    monkeypatch.setattr(scraper, 'fetch_article', counting_fetch_article)
+    try:
+        events = list(scraper.run_scraper([servers[0].base_url + '/', servers[1].base_url + '/blog/'], concurrency=2,
+                                          parallel_sources=2, cache_dir=None, host_rate=0, structured=True))
+    finally:
+        for server in servers:
+            server.shutdown()
+    assert len([event for event in events if isinstance(event, dict)]) == 12
+    assert in_flight['max'] == 2
+
+def test_missing_pdf_is_reported_as_a_pdf_error(tmp_path):
+    events = list(scraper.scrape_pdf(str(tmp_path / 'gone.pdf')))
+    assert events[0] == "Scraping PDF: gone.pdf"
+    assert events[1].startswith(f"Could not process PDF {tmp_path / 'gone.pdf'}. Reason:")
@@ -0,0 +1,87 @@
+import json
+
+from selenium_discovery import (DESCRIBE_CLICKABLES_SCRIPT, HARVEST_LINKS_SCRIPT, discover_links_with_selenium,
+                                harvest_links, urls_from_json)
+
+BASE = "https://spa.example/"
+
+def test_urls_from_json():
+    found = set()
+    urls_from_json({
+        "props": {"posts": [{"slug": "hello-world", "title": "Hello world"}, {"slug": "a/b"}, {"slug": ""}]},
+        "links": ["/posts/second", "https://cdn.example/app.js", "//cdn.example/x", "/static/logo.png",
+                  "not a url", "https://other.example/page"],
+    }, BASE + "blog/", found)
+    assert found == {BASE + "blog/hello-world", BASE + "posts/second", "https://other.example/page"}
+
+def network_entry(request_id, mime_type):
+    message = {"message": {"method": "Network.responseReceived",
+                           "params": {"requestId": request_id, "response": {"mimeType": mime_type}}}}
+    return {"message": json.dumps(message)}
+
+class FakeElement:
+    def __init__(self, driver, target):
+        self.driver = driver
+        self.target = target
+
+    def click(self):
+        self.driver.current_url = self.target
+
+class FakeDriver:
+    """Plays a rendered SPA: the link harvest, clickable cards and the click-and-back navigation."""
+
+    def __init__(self, harvested, cards=(), targets=(), network=None):
+        self.current_url = BASE
+        self.harvested = harvested
+        self.cards = list(cards)
+        self.targets = list(targets)
+        self.network = network or {}
+
+    def execute_script(self, script, *args):
+        if script == HARVEST_LINKS_SCRIPT:
+            return self.harvested
+        if script == DESCRIBE_CLICKABLES_SCRIPT:
+            return self.cards
+        if script == "arguments[0].click();":
+            args[0].click()
+
+    def get_log(self, kind):
+        return [network_entry(request_id, "application/json") for request_id in self.network] + [
+            network_entry("css", "text/css")]
+
+    def execute_cdp_cmd(self, command, params):
+        return {"body": self.network[params["requestId"]]}
+
+    def find_element(self, by, value):
+        return FakeElement(self, None)
+
+    def find_elements(self, by, value):
+        return [FakeElement(self, target) for target in self.targets]
+
+    def back(self):
+        self.current_url = BASE
+
+def test_harvest_links():
+    driver = FakeDriver({
+        "links": ["/posts/one", "javascript:void(0)", "mailto:hi@spa.example", "#top", "https://spa.example/posts/two"],
+        "payloads": ['{"slug": "three"}', "not json"],
+    }, network={"r1": '{"items": [{"url": "/posts/four"}]}'})
+    assert harvest_links(driver, BASE) == {BASE + "posts/one", BASE + "posts/two", BASE + "three", BASE + "posts/four"}
+
+def discover(driver):
+    events = discover_links_with_selenium(driver, BASE)
+    try:
+        while True:
+            next(events)
+    except StopIteration as stop:
+        return stop.value
+
+def test_card_without_text_is_clicked_not_matched_to_the_root_url():
+    driver = FakeDriver(
+        {"links": [BASE, BASE + "posts/hello-world"], "payloads": []},
+        cards=[{"href": "", "text": "Hello World"}, {"href": "", "text": ""}, {"href": "/posts/linked", "text": ""}],
+        targets=[BASE + "posts/hello-world", BASE + "posts/untitled", BASE + "posts/linked"],
+    )
+    found = discover(driver)
+    # The first card matched a harvested slug and the third had a link; only the second needed a click.
+    assert found == {BASE, BASE + "posts/hello-world", BASE + "posts/untitled", BASE + "posts/linked"}
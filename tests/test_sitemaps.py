@@ -0,0 +1,129 @@
+import gzip
+import threading
+
+import pytest
+
+from fixture_site import FixtureServer, sitemap_site
+from http_client import SessionManager
+from response_cache import ResponseCache
+from sitemaps import iter_site_entries, iter_sitemap_entries, iter_sitemap_file, sitemap_urls_from_robots
+
+URLSET = ('<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+          '<url><loc>https://example.com/a</loc><lastmod>2024-01-01</lastmod></url>'
+          '<url><loc> https://example.com/b </loc></url><url><lastmod>2024-01-02</lastmod></url></urlset>').encode()
+INDEX = ('<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+         '<sitemap><loc>https://example.com/posts.xml.gz</loc></sitemap>'
+         '<sitemap><loc>https://example.com/posts.xml.gz</loc></sitemap></sitemapindex>').encode()
+
+def chunked(data, *sizes):
+    """Splits `data` into chunks of the given sizes, then the rest."""
+    chunks = []
+    for size in sizes:
+        chunks.append(data[:size])
+        data = data[size:]
+    return chunks + [data]
+
+class FakeSession:
+    def __init__(self, files, robots=''):
+        self.files = files
+        self.robots = robots
+        self.streamed = []
+
+    def robots_txt(self, url, timeout=2):
+        return self.robots
+
+    def stream(self, url, timeout):
+        self.streamed.append(url)
+        if url not in self.files:
+            raise OSError(f"404 for {url}")
+        return iter(chunked(self.files[url], 1, 7))
+
+def test_plain_sitemap():
+    expected = [('url', 'https://example.com/a', '2024-01-01'), ('url', 'https://example.com/b', None)]
+    assert list(iter_sitemap_file([URLSET])) == expected
+    assert list(iter_sitemap_file(chunked(URLSET, 1, 1, 5))) == expected
+
+def test_gzipped_sitemap_split_inside_the_magic_number():
+    data = gzip.compress(URLSET)
+    for sizes in ((1,), (1, 1), (2, 3)):
+        assert len(list(iter_sitemap_file(chunked(data, *sizes)))) == 2
+
+def test_sitemap_index_is_followed_once():
+    session = FakeSession({'https://example.com/index.xml': INDEX,
+                           'https://example.com/posts.xml.gz': gzip.compress(URLSET)})
+    logs = []
+    entries = list(iter_sitemap_entries(session, ['https://example.com/index.xml'], logs.append))
+    assert entries == [('https://example.com/a', '2024-01-01'), ('https://example.com/b', None)]
+    assert session.streamed == ['https://example.com/index.xml', 'https://example.com/posts.xml.gz']
+    assert "Sitemap index https://example.com/index.xml lists 2 sitemaps." in logs
+
+def test_nesting_is_bounded():
+    session = FakeSession({'https://example.com/index.xml': INDEX, 'https://example.com/posts.xml.gz': URLSET})
+    logs = []
+    assert list(iter_sitemap_entries(session, ['https://example.com/index.xml'], logs.append, max_depth=0)) == []
+    assert any("nested too deeply" in line for line in logs)
+
+def test_sitemaps_from_robots_txt():
+    robots = "User-agent: *\nDisallow: /admin\nSitemap: https://example.com/index.xml\nsitemap:https://example.com/extra.xml\n"
+    assert sitemap_urls_from_robots(robots) == ['https://example.com/index.xml', 'https://example.com/extra.xml']
+    session = FakeSession({'https://example.com/index.xml': INDEX,
+                           'https://example.com/posts.xml.gz': gzip.compress(URLSET)}, robots)
+    entries = list(iter_site_entries(session, 'https://example.com/blog/', lambda line: None))
+    assert [loc for loc, _ in entries] == ['https://example.com/a', 'https://example.com/b']
+    # The sitemap robots.txt lists but the site doesn't serve is logged and skipped.
+    assert session.streamed[-1] == 'https://example.com/extra.xml'
+
+def test_conventional_locations_without_robots_txt():
+    session = FakeSession({'https://example.com/sitemap_index.xml': URLSET})
+    entries = list(iter_site_entries(session, 'https://example.com/blog/', lambda line: None))
+    assert len(entries) == 2
+    assert session.streamed == ['https://example.com/sitemap.xml', 'https://example.com/sitemap_index.xml']
+
+def test_discovery_from_a_served_site(tmp_path):
+    server = FixtureServer(sitemap_site(10))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = SessionManager(host_rate=0, cache=ResponseCache(str(tmp_path)))
+    try:
+        for _ in range(2):
+            entries = list(iter_site_entries(session, server.base_url + '/', lambda line: None))
+            assert len(entries) == 10
+            assert entries[0] == (server.base_url + '/blog/fixture-post-0/', '2024-01-01')
+    finally:
+        session.close()
+        session.cache.close()
+        server.shutdown()
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+    encoding = None
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_stream_downloads_the_whole_body_before_yielding(tmp_path, monkeypatch, cached):
+    session = SessionManager(host_rate=0, cache=ResponseCache(str(tmp_path)) if cached else None)
+    response = FakeResponse(chunked(URLSET, 10, 20))
+    monkeypatch.setattr(session, 'get', lambda url, timeout, **kwargs: response)
+    chunks = session.stream('https://example.com/sitemap.xml', timeout=2, chunk_size=16)
+    first = next(chunks)
+    # The connection is done with before the caller has read anything.
+    assert response.sent == 3 and response.closed
+    assert first + b''.join(chunks) == URLSET
+    if cached:
+        assert session.cache.lookup('https://example.com/sitemap.xml').read() == URLSET
+        session.cache.close()
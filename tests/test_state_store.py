@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+import scraper
+from fixture_site import FixtureServer, index_site
+from state_store import StateStore
+
+ITEM = {"title": "A", "content": "Body", "source_url": "https://example.com/a"}
+
+def test_records_are_kept_only_once_committed(tmp_path):
+    path = str(tmp_path / 'state.sqlite')
+    state = StateStore(path)
+    assert state.record(ITEM, '2024-01-01')
+    state.close()
+    # Closed without a commit: the next run has never seen the article.
+    state = StateStore(path)
+    assert not state.is_unchanged_since(ITEM['source_url'], '2024-01-01')
+    assert state.record(ITEM, '2024-01-01')
+    state.commit()
+    state.close()
+
+    state = StateStore(path)
+    assert state.is_unchanged_since(ITEM['source_url'], '2024-01-01')
+    assert not state.record(ITEM)
+    assert state.record(dict(ITEM, content="Edited"))
+    state.commit()
+    # A record without a lastmod keeps the one already known.
+    assert state.is_unchanged_since(ITEM['source_url'], '2024-01-01')
+    assert state.record(dict(ITEM, content="Body"))
+    state.close()
+
+def incremental_items(base_url, state_path, stop_after=None):
+    events = scraper.run_scraper([base_url + '/'], cache_dir=None, host_rate=0, incremental=True,
+                                 state_path=state_path, structured=True)
+    items = []
+    for event in events:
+        if isinstance(event, dict):
+            items.append(event)
+            if len(items) == stop_after:
+                events.close()
+                break
+    return items
+
+def test_incremental_run_that_stops_early_remembers_nothing(tmp_path):
+    server = FixtureServer(index_site(4))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state_path = str(tmp_path / 'state.sqlite')
+    try:
+        assert len(incremental_items(server.base_url, state_path, stop_after=2)) == 2
+        assert len(incremental_items(server.base_url, state_path)) == 4
+        assert incremental_items(server.base_url, state_path) == []
+    finally:
+        server.shutdown()
+
+def test_incremental_needs_an_output_file(monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['scraper.py', 'https://example.com/', '--incremental'])
+    with pytest.raises(SystemExit):
+        scraper.main()
+    assert "--incremental needs --output" in capsys.readouterr().err
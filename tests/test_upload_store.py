@@ -0,0 +1,65 @@
+import io
+import os
+
+import pytest
+
+from upload_store import UploadError, UploadStore
+
+BODY = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+def test_chunks_are_appended_at_the_received_offset(tmp_path):
+    store = UploadStore(str(tmp_path))
+    upload_id = store.create('report.pdf', len(BODY))
+    status = store.append(upload_id, 0, io.BytesIO(BODY[:4000]))
+    assert status['received'] == 4000 and 'pdf_id' not in status
+    # A retried chunk, or one sent from a stale offset, is refused with the offset to resume from.
+    for offset in (0, 5000):
+        with pytest.raises(UploadError) as error:
+            store.append(upload_id, offset, io.BytesIO(BODY[offset:]))
+        assert error.value.status == 409 and 'offset 4000' in str(error.value)
+    assert store.status(upload_id)['received'] == 4000
+    status = store.append(upload_id, 4000, io.BytesIO(BODY[4000:]))
+    with open(store.path(status['pdf_id']), 'rb') as f:
+        assert f.read() == BODY
+    # Once finished, the upload keeps answering with its pdf_id.
+    assert store.append(upload_id, 0, io.BytesIO(b''))['pdf_id'] == status['pdf_id']
+    assert store.status(upload_id)['received'] == len(BODY)
+
+def test_chunk_past_the_declared_size_is_rolled_back(tmp_path):
+    store = UploadStore(str(tmp_path))
+    upload_id = store.create('report.pdf', 100)
+    store.append(upload_id, 0, io.BytesIO(BODY[:60]))
+    with pytest.raises(UploadError):
+        store.append(upload_id, 60, io.BytesIO(BODY[60:200]))
+    assert store.status(upload_id)['received'] == 60
+    assert 'pdf_id' in store.append(upload_id, 60, io.BytesIO(BODY[60:100]))
+
+def test_size_limits(tmp_path):
+    store = UploadStore(str(tmp_path), max_bytes=1000)
+    with pytest.raises(UploadError) as error:
+        store.create('big.pdf', 1001)
+    assert error.value.status == 413
+    with pytest.raises(UploadError) as error:
+        store.save(io.BytesIO(BODY), 'big.pdf')
+    assert error.value.status == 413
+    assert os.listdir(tmp_path / 'partial') == []
+    with pytest.raises(UploadError):
+        store.create('notes.txt', 10)
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first = store.save(io.BytesIO(BODY), 'a.pdf')
+    upload_id = store.create('b.pdf', len(BODY))
+    second = store.append(upload_id, 0, io.BytesIO(BODY))['pdf_id']
+    assert first.split('__')[0] == second.split('__')[0]
+    assert second.endswith('__b.pdf')
+    assert os.path.samefile(store.path(first), store.path(second))
+    assert store.save(io.BytesIO(BODY), 'a.pdf') == first
+
+def test_unknown_upload_ids(tmp_path):
+    store = UploadStore(str(tmp_path))
+    for upload_id in ('../../etc/passwd', '0' * 32):
+        with pytest.raises(UploadError) as error:
+            store.status(upload_id)
+        assert error.value.status == 404
+    assert store.path('../secret.pdf') is None
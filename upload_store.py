@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+import metrics
+from pdf_extraction import file_digest
+
+DEFAULT_UPLOAD_DIR = 'uploads'
+DEFAULT_MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+# Uploads, unfinished uploads and cached PDF sections are deleted after this many idle seconds.
+DEFAULT_UPLOAD_TTL = 24 * 3600
+# Chunk size the browser is told to use; small enough to retry cheaply on a flaky connection.
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+COPY_BUFFER_SIZE = 64 * 1024
+
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+PDF_ID_PATTERN = re.compile(r'[0-9a-f]{64}__[^/\\]+\.pdf')
+
+class UploadError(Exception):
+    """An upload request that can't be accepted. `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def pdf_filename(filename):
+    """The name an upload is stored under, or raises UploadError if it isn't a PDF."""
+    name = secure_filename(filename or '')
+    if not name.lower().endswith('.pdf') or name.lower() == '.pdf':
+        raise UploadError('No PDF file found or file is not a PDF')
+    return name
+
+class UploadStore:
+    """PDF uploads, stored once per distinct content.
+
+    An upload is started with its name and size, then sent in chunks at increasing
+    offsets; the received offset is kept on disk, so an interrupted upload resumes
+    where it stopped. Finished files are stored as `<sha256>__<name>.pdf` (the pdf_id);
+    a file whose content is already stored becomes a hard link to it, so identical
+    PDFs share storage and the PDF section cache (see pdf_extraction).
+    """
+
+    def __init__(self, directory=DEFAULT_UPLOAD_DIR, max_bytes=DEFAULT_MAX_UPLOAD_BYTES, ttl=DEFAULT_UPLOAD_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.partial_dir = os.path.join(directory, 'partial')
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._upload_locks = {}
+
+    def _partial_paths(self, upload_id):
+        if not UPLOAD_ID_PATTERN.fullmatch(upload_id or ''):
+            raise UploadError(f"Unknown upload: {upload_id}", 404)
+        base = os.path.join(self.partial_dir, upload_id)
+        return base + '.json', base + '.part'
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def too_large(self):
+        return UploadError(f"PDF is larger than the {self.max_bytes / (1024 * 1024):.3g} MB limit", 413)
+
+    def _check_size(self, size):
+        if size > self.max_bytes:
+            raise self.too_large()
+
+    def create(self, filename, size):
+        """Starts an upload of `size` bytes. Returns its upload ID."""
+        name = pdf_filename(filename)
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError('Upload size must be a positive number of bytes')
+        self._check_size(size)
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._partial_paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'filename': name, 'size': size}, f)
+        return upload_id
+
+    def status(self, upload_id):
+        """Returns {'upload_id', 'filename', 'size', 'received'}: how far an upload got.
+        A finished upload also has its 'pdf_id', so a client that missed the last response can still get it."""
+        meta_path, part_path = self._partial_paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            received = meta['size'] if 'pdf_id' in meta else os.path.getsize(part_path)
+        except (OSError, ValueError):
+            raise UploadError(f"Unknown upload: {upload_id}", 404)
+        return dict(meta, upload_id=upload_id, received=received)
+
+    def append(self, upload_id, offset, stream):
+        """Writes the chunk read from `stream` at `offset`. Returns the upload's status,
+        with its 'pdf_id' once the last byte has arrived.
+
+        A chunk must start where the previous one ended; anything else is answered with
+        409 and the current offset, which is how a client resumes after a lost response.
+        """
+        with self._upload_lock(upload_id):
+            status = self.status(upload_id)
+            if 'pdf_id' in status:
+                return status
+            if offset != status['received']:
+                raise UploadError(f"Upload is at offset {status['received']}, not {offset}", 409)
+            _, part_path = self._partial_paths(upload_id)
+            received = status['received']
+            with open(part_path, 'ab') as f:
+                for block in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+                    received += len(block)
+                    if received > status['size']:
+                        f.truncate(status['received'])
+                        raise UploadError('Chunk runs past the declared upload size')
+                    f.write(block)
+            metrics.count('upload_bytes', received - status['received'])
+            status['received'] = received
+            os.utime(self._partial_paths(upload_id)[0])
+            if received == status['size']:
+                status['pdf_id'] = self._complete(upload_id, status['filename'])
+                self._upload_locks.pop(upload_id, None)
+            return status
+
+    def save(self, stream, filename):
+        """Stores a whole file read from `stream` in one go. Returns its pdf_id."""
+        name = pdf_filename(filename)
+        upload_id = uuid.uuid4().hex
+        _, part_path = self._partial_paths(upload_id)
+        size = 0
+        try:
+            with open(part_path, 'wb') as f:
+                for block in iter(lambda: stream.read(COPY_BUFFER_SIZE), b''):
+                    size += len(block)
+                    self._check_size(size)
+                    f.write(block)
+        except Exception:
+            os.remove(part_path)
+            raise
+        return self._complete(upload_id, name)
+
+    def _complete(self, upload_id, name):
+        meta_path, part_path = self._partial_paths(upload_id)
+        digest = file_digest(part_path)
+        pdf_id = f"{digest}__{name}"
+        target = os.path.join(self.directory, pdf_id)
+        with self._lock:
+            existing = [entry for entry in os.listdir(self.directory) if entry.startswith(digest + '__')]
+            if existing:
+                metrics.count('upload_duplicates')
+            if pdf_id in existing:
+                os.remove(part_path)
+            elif existing:
+                try:
+                    os.link(os.path.join(self.directory, existing[0]), target)
+                    os.remove(part_path)
+                except OSError:
+                    os.replace(part_path, target)
+            else:
+                os.replace(part_path, target)
+            # Reuse counts as use, so a PDF uploaded again isn't cleaned up from under its job.
+            os.utime(target)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'filename': name, 'size': os.path.getsize(target), 'pdf_id': pdf_id}, f)
+        return pdf_id
+
+    def path(self, pdf_id):
+        """Path of a finished upload, or None if `pdf_id` doesn't name one."""
+        if not isinstance(pdf_id, str) or not PDF_ID_PATTERN.fullmatch(pdf_id):
+            return None
+        path = os.path.join(self.directory, pdf_id)
+        return path if os.path.isfile(path) else None
+
+    def cleanup(self):
+        """Deletes uploads, unfinished uploads and cached sections idle for longer than the TTL."""
+        cutoff = time.time() - self.ttl
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    continue